@@ -28,6 +28,8 @@ del get_versions
 from .api import *  # NOQA
 import bluepyopt.optimisations
 import bluepyopt.deapext.optimisations
+import bluepyopt.deapext.cache  # NOQA
+import bluepyopt.deapext.checkpoints  # NOQA
 
 # Add some backward compatibility for the time when DEAPoptimisation not in
 # deapext yet
@@ -42,6 +44,5 @@ import bluepyopt.parameters  # NOQA
 # TODO let objects read / write themselves using json
 # TODO create 'Variables' class
 # TODO use 'locations' instead of 'location'
-# TODO add island functionality to optimiser
 # TODO add plotting functionality
 # TODO show progress bar during optimisation
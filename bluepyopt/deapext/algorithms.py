@@ -22,26 +22,61 @@ Copyright (c) 2016, EPFL/Blue Brain Project
 # pylint: disable=R0914, R0912
 
 
+import time
 import random
 import logging
+import contextlib
+import collections
 
 import deap.algorithms
 import deap.tools
-import pickle
+
+from . import checkpoints
 
 logger = logging.getLogger('__main__')
 
 
-def _evaluate_invalid_fitness(toolbox, population):
+def _evaluate_invalid_fitness(toolbox, population, cache=None):
     '''Evaluate the individuals with an invalid fitness
 
-    Returns the count of individuals with invalid fitness
+    If a cache is provided, individuals that are found in the cache, or that
+    have the same parameters as another individual in the population, are
+    not evaluated again
+
+    Returns the count of individuals that were evaluated
     '''
     invalid_ind = [ind for ind in population if not ind.fitness.valid]
-    fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+
+    if cache is not None:
+        # Group the individuals with the same parameter values
+        duplicates = collections.OrderedDict()
+        for ind in invalid_ind:
+            key = cache.key(ind)
+            if key in duplicates:
+                # Will get the fitness of the first individual with this key
+                duplicates[key].append(ind)
+                cache.hits += 1
+                continue
+            fit = cache.get(ind)
+            if fit is not None:
+                ind.fitness.values = fit
+            else:
+                duplicates[key] = [ind]
+        invalid_ind = [inds[0] for inds in duplicates.values()]
+
+    if hasattr(toolbox, 'evaluate_population'):
+        fitnesses = toolbox.evaluate_population(invalid_ind)
+    else:
+        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
     for ind, fit in zip(invalid_ind, fitnesses):
         ind.fitness.values = fit
 
+    if cache is not None:
+        for ind in invalid_ind:
+            cache.put(ind, ind.fitness.values)
+            for duplicate in duplicates[cache.key(ind)][1:]:
+                duplicate.fitness.values = ind.fitness.values
+
     return len(invalid_ind)
 
 
@@ -56,12 +91,72 @@ def _update_history_and_hof(halloffame, history, population):
     history.update(population)
 
 
-def _record_stats(stats, logbook, gen, population, invalid_count):
-    '''Update the statistics with the new population'''
+def _record_stats(stats, logbook, gen, population, invalid_count,
+                  cache=None, toolbox=None):
+    '''Update the statistics with the new population
+
+    The statistics of the evaluator (e.g. the number of timeouts) are
+    recorded if the toolbox has an evaluation_statistics function
+    '''
     record = stats.compile(population) if stats is not None else {}
+    if cache is not None:
+        record.update(cache_hits=cache.hits, cache_misses=cache.misses)
+        cache.reset_statistics()
+    if hasattr(toolbox, 'evaluation_statistics'):
+        record.update(toolbox.evaluation_statistics())
     logbook.record(gen=gen, nevals=invalid_count, **record)
 
 
+def _create_logbook(stats, cache=None, toolbox=None):
+    '''Create a new logbook'''
+    logbook = deap.tools.Logbook()
+    logbook.header = ['gen', 'nevals'] + \
+        (['cache_hits', 'cache_misses'] if cache is not None else []) + \
+        (sorted(toolbox.evaluation_statistics(reset=False).keys())
+         if hasattr(toolbox, 'evaluation_statistics') else []) + \
+        (stats.fields if stats else [])
+    return logbook
+
+
+class _PhaseTimer(object):
+
+    '''Wall clock time spent in the phases of a generation'''
+
+    def __init__(self):
+        self.timings = collections.OrderedDict()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        '''Context manager that adds the time spent in it to phase name'''
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.timings[name] = \
+                self.timings.get(name, 0.0) + time.time() - start
+
+
+def _report_generation(callback, timer, logbook, population, parents,
+                       halloffame):
+    '''Pass the information about the last generation to the callback
+
+    The callback receives a dict with keys generation, record (the last
+    entry of the logbook, with e.g. nevals and the cache statistics),
+    timings (wall clock time in s of every phase of the generation),
+    population, parents and halloffame
+    '''
+    if callback is None:
+        return
+
+    record = logbook[-1]
+    callback(dict(generation=record['gen'],
+                  record=record,
+                  timings=timer.timings,
+                  population=population,
+                  parents=parents,
+                  halloffame=halloffame))
+
+
 def _get_offspring(parents, toolbox, cxpb, mutpb):
     '''return the offsprint, use toolbox.variate if possible'''
     if hasattr(toolbox, 'variate'):
@@ -69,6 +164,49 @@ def _get_offspring(parents, toolbox, cxpb, mutpb):
     return deap.algorithms.varAnd(parents, toolbox, cxpb, mutpb)
 
 
+def _load_checkpoint(cp_filename):
+    '''Load the state of an optimisation from a checkpoint file
+
+    Returns population, parents, generation, halloffame, logbook and history,
+    and restores the state of the random number generator
+    '''
+    cp = checkpoints.load(cp_filename)
+    random.setstate(cp["rndstate"])
+
+    return (cp["population"], cp["parents"], cp["generation"],
+            cp["halloffame"], cp["logbook"], cp["history"])
+
+
+def _create_checkpoint_writer(cp_filename, cp_incremental, continue_cp):
+    '''Create a writer for incremental checkpoints if requested'''
+    if not cp_filename or not cp_incremental:
+        return None
+
+    cp_writer = checkpoints.IncrementalCheckpointWriter(cp_filename)
+    if continue_cp:
+        cp_writer.resume()
+
+    return cp_writer
+
+
+def _save_checkpoint(cp_filename, population, generation, parents,
+                     halloffame, history, logbook, cp_writer=None):
+    '''Write the state of an optimisation to a checkpoint file'''
+    if cp_writer is not None:
+        cp_writer.write(population, generation, parents, halloffame,
+                        history, logbook)
+    else:
+        cp = dict(population=population,
+                  generation=generation,
+                  parents=parents,
+                  halloffame=halloffame,
+                  history=history,
+                  logbook=logbook,
+                  rndstate=random.getstate())
+        checkpoints.save(cp_filename, cp)
+    logger.debug('Wrote checkpoint to %s', cp_filename)
+
+
 def eaAlphaMuPlusLambdaCheckpoint(
         population,
         toolbox,
@@ -80,7 +218,10 @@ def eaAlphaMuPlusLambdaCheckpoint(
         halloffame=None,
         cp_frequency=1,
         cp_filename=None,
-        continue_cp=False):
+        continue_cp=False,
+        cache=None,
+        cp_incremental=False,
+        callback=None):
     r"""This is the :math:`(~\alpha,\mu~,~\lambda)` evolutionary algorithm
 
     Args:
@@ -95,56 +236,493 @@ def eaAlphaMuPlusLambdaCheckpoint(
         cp_frequency(int): generations between checkpoints
         cp_filename(string): path to checkpoint filename
         continue_cp(bool): whether to continue
+        cache(EvaluationCache): cache of fitness values, used to avoid
+            re-evaluating individuals with the same parameters
+        cp_incremental(bool): append a record to the checkpoint file at every
+            checkpoint, instead of rewriting the entire state
+        callback(callable): function called at the end of every generation
+            with a dict containing the logbook record and the time spent in
+            the variation, evaluation, history_update, selection and
+            checkpoint phases (see _report_generation)
     """
 
     if continue_cp:
         # A file name has been given, then load the data from the file
-        cp = pickle.load(open(cp_filename, "r"))
-        population = cp["population"]
-        parents = cp["parents"]
-        start_gen = cp["generation"]
-        halloffame = cp["halloffame"]
-        logbook = cp["logbook"]
-        history = cp["history"]
-        random.setstate(cp["rndstate"])
+        population, parents, start_gen, halloffame, logbook, history = \
+            _load_checkpoint(cp_filename)
+        if cache is not None:
+            cache.update(history.genealogy_history.values())
     else:
         # Start a new evolution
         start_gen = 1
         parents = population[:]
-        logbook = deap.tools.Logbook()
-        logbook.header = ['gen', 'nevals'] + (stats.fields if stats else [])
+        logbook = _create_logbook(stats, cache=cache, toolbox=toolbox)
         history = deap.tools.History()
 
+        timer = _PhaseTimer()
+
         # TODO this first loop should be not be repeated !
-        invalid_count = _evaluate_invalid_fitness(toolbox, population)
-        _update_history_and_hof(halloffame, history, population)
-        _record_stats(stats, logbook, start_gen, population, invalid_count)
+        with timer.phase('evaluation'):
+            invalid_count = _evaluate_invalid_fitness(
+                toolbox, population, cache=cache)
+        with timer.phase('history_update'):
+            _update_history_and_hof(halloffame, history, population)
+        _record_stats(stats, logbook, start_gen, population, invalid_count,
+                      cache=cache, toolbox=toolbox)
+        _report_generation(callback, timer, logbook, population, parents,
+                           halloffame)
+
+    cp_writer = _create_checkpoint_writer(
+        cp_filename, cp_incremental, continue_cp)
 
     # Begin the generational process
     for gen in range(start_gen + 1, ngen + 1):
-        offspring = _get_offspring(parents, toolbox, cxpb, mutpb)
+        timer = _PhaseTimer()
+
+        with timer.phase('variation'):
+            offspring = _get_offspring(parents, toolbox, cxpb, mutpb)
 
         population = parents + offspring
 
-        invalid_count = _evaluate_invalid_fitness(toolbox, offspring)
-        _update_history_and_hof(halloffame, history, population)
-        _record_stats(stats, logbook, gen, population, invalid_count)
+        with timer.phase('evaluation'):
+            invalid_count = _evaluate_invalid_fitness(
+                toolbox, offspring, cache=cache)
+        with timer.phase('history_update'):
+            _update_history_and_hof(halloffame, history, population)
+        _record_stats(stats, logbook, gen, population, invalid_count,
+                      cache=cache, toolbox=toolbox)
 
         # Select the next generation parents
-        parents = toolbox.select(population, mu)
+        with timer.phase('selection'):
+            parents = toolbox.select(population, mu)
+
+        logger.info(logbook.stream)
+
+        if(cp_filename and cp_frequency and
+           gen % cp_frequency == 0):
+            with timer.phase('checkpoint'):
+                _save_checkpoint(cp_filename, population, gen, parents,
+                                 halloffame, history, logbook,
+                                 cp_writer=cp_writer)
+
+        _report_generation(callback, timer, logbook, population, parents,
+                           halloffame)
+
+    return population, logbook, history
+
+
+class _EvaluatedFuture(object):
+
+    '''Future of an evaluation that has already been performed'''
+
+    def __init__(self, result):
+        self._result = result
+
+    @staticmethod
+    def done():
+        '''The evaluation is always done'''
+        return True
+
+    @staticmethod
+    def cancel():
+        '''The evaluation can not be cancelled anymore'''
+        return False
+
+    def result(self):
+        '''Result of the evaluation'''
+        return self._result
+
+
+def _submit_evaluation(toolbox, individual):
+    '''Submit the evaluation of an individual, use toolbox.submit if possible
+
+    If the toolbox has evaluate_chunk, the individual is evaluated as a
+    chunk of one individual, as by evaluate_population, so that the
+    statistics of the evaluator are kept (see _evaluation_result)
+
+    Returns a future of the result of the evaluation
+    '''
+    if hasattr(toolbox, 'evaluate_chunk'):
+        func, args = toolbox.evaluate_chunk, [list(individual)]
+    else:
+        func, args = toolbox.evaluate, individual
+
+    if hasattr(toolbox, 'submit'):
+        return toolbox.submit(func, args)
+    return _EvaluatedFuture(func(args))
+
+
+def _evaluation_result(toolbox, future):
+    '''Fitness values of an evaluation submitted with _submit_evaluation'''
+    if hasattr(toolbox, 'evaluate_chunk'):
+        return toolbox.collect_chunk_results([future.result()])[0]
+    return future.result()
+
+
+def _wait_first_completed(toolbox, futures):
+    '''Return the futures that are done, use toolbox.wait_first if possible'''
+    if hasattr(toolbox, 'wait_first'):
+        return list(toolbox.wait_first(futures)[0])
+    return [future for future in futures if future.done()]
+
+
+def eaAlphaMuPlusLambdaAsyncCheckpoint(
+        population,
+        toolbox,
+        mu,
+        cxpb,
+        mutpb,
+        ngen,
+        stats=None,
+        halloffame=None,
+        cp_frequency=1,
+        cp_filename=None,
+        continue_cp=False,
+        selection_batch=None,
+        cache=None,
+        cp_incremental=False,
+        callback=None):
+    r"""Asynchronous version of the :math:`(~\alpha,\mu~,~\lambda)` algorithm
+
+    Instead of waiting for all the offspring of a generation before selecting
+    the new parents, the evaluations are consumed as soon as they complete,
+    and a new offspring is submitted as soon as a worker becomes free.
+    Evaluations are submitted with toolbox.submit (e.g. scoop.futures.submit)
+    and collected with toolbox.wait_first; when these are not registered the
+    individuals are evaluated serially.
+
+    Selection of the parents happens every time selection_batch evaluations
+    have completed, this also marks the end of a generation for the logbook
+    and the checkpoints (which are compatible with
+    eaAlphaMuPlusLambdaCheckpoint).
+
+    Args:
+        population(list of deap Individuals)
+        toolbox(deap Toolbox)
+        mu(int): Total parent population size of EA, this is also the number
+            of evaluations that are kept running
+        cxpb(float): Crossover probability
+        mutpb(float): Mutation probability
+        ngen(int): Total number of generation to run
+        stats(deap.tools.Statistics): generation of statistics
+        halloffame(deap.tools.HallOfFame): hall of fame
+        cp_frequency(int): generations between checkpoints
+        cp_filename(string): path to checkpoint filename
+        continue_cp(bool): whether to continue
+        selection_batch(int): number of completed evaluations between
+            selections (default mu)
+        cache(EvaluationCache): cache of fitness values, used to avoid
+            re-evaluating individuals with the same parameters
+        cp_incremental(bool): append a record to the checkpoint file at every
+            checkpoint, instead of rewriting the entire state
+        callback(callable): function called at the end of every generation,
+            see eaAlphaMuPlusLambdaCheckpoint (the evaluation phase is the
+            time spent submitting evaluations and waiting for them to
+            complete, with serial evaluation it contains the evaluations)
+    """
+
+    if selection_batch is None:
+        selection_batch = mu
+
+    if continue_cp:
+        # A file name has been given, then load the data from the file
+        population, parents, start_gen, halloffame, logbook, history = \
+            _load_checkpoint(cp_filename)
+        if cache is not None:
+            cache.update(history.genealogy_history.values())
+    else:
+        # Start a new evolution
+        start_gen = 1
+        parents = population[:]
+        logbook = _create_logbook(stats, cache=cache, toolbox=toolbox)
+        history = deap.tools.History()
+
+        timer = _PhaseTimer()
+
+        with timer.phase('evaluation'):
+            invalid_count = _evaluate_invalid_fitness(
+                toolbox, population, cache=cache)
+        with timer.phase('history_update'):
+            _update_history_and_hof(halloffame, history, population)
+        _record_stats(stats, logbook, start_gen, population, invalid_count,
+                      cache=cache, toolbox=toolbox)
+        _report_generation(callback, timer, logbook, population, parents,
+                           halloffame)
+
+    cp_writer = _create_checkpoint_writer(
+        cp_filename, cp_incremental, continue_cp)
+
+    timer = _PhaseTimer()
+    gen = start_gen
+    # future -> individuals with the parameters that are evaluated, the
+    # first one was submitted, the others are duplicates found in the cache
+    pending = {}
+    # cache key -> future of the evaluations that are running
+    pending_keys = {}
+    offspring = []
+    completed = []
+    evaluated_count = 0
+
+    while gen < ngen:
+        # Keep mu evaluations running, until enough individuals completed
+        # (offspring can complete without evaluation, e.g. from the cache)
+        while len(pending) < mu and len(completed) < selection_batch:
+            if not offspring:
+                with timer.phase('variation'):
+                    offspring = _get_offspring(parents, toolbox, cxpb, mutpb)
+            individual = offspring.pop(0)
+            if individual.fitness.valid:
+                completed.append(individual)
+                continue
+
+            if cache is not None:
+                key = cache.key(individual)
+                if key in pending_keys:
+                    # Gets the fitness of the individual being evaluated
+                    pending[pending_keys[key]].append(individual)
+                    cache.hits += 1
+                    continue
+                fitness_values = cache.get(individual)
+                if fitness_values is not None:
+                    individual.fitness.values = fitness_values
+                    completed.append(individual)
+                    continue
+
+            with timer.phase('evaluation'):
+                future = _submit_evaluation(toolbox, individual)
+            pending[future] = [individual]
+            if cache is not None:
+                pending_keys[key] = future
+
+        if pending and len(completed) < selection_batch:
+            with timer.phase('evaluation'):
+                done = _wait_first_completed(toolbox, list(pending.keys()))
+        else:
+            done = []
+
+        for future in done:
+            individuals = pending.pop(future)
+            fitness_values = _evaluation_result(toolbox, future)
+            for individual in individuals:
+                individual.fitness.values = fitness_values
+            if cache is not None:
+                del pending_keys[cache.key(individuals[0])]
+                cache.put(individuals[0], fitness_values)
+            completed.extend(individuals)
+            evaluated_count += 1
+
+        if len(completed) < selection_batch:
+            continue
+
+        gen += 1
+        # Individuals completed together beyond the batch go to the next one
+        population = parents + completed[:selection_batch]
+
+        with timer.phase('history_update'):
+            _update_history_and_hof(halloffame, history, population)
+        _record_stats(stats, logbook, gen, population, evaluated_count,
+                      cache=cache, toolbox=toolbox)
+
+        # Select the next parents, new offspring will be generated from these
+        with timer.phase('selection'):
+            parents = toolbox.select(population, mu)
+        completed = completed[selection_batch:]
+        offspring = []
+        evaluated_count = 0
 
         logger.info(logbook.stream)
 
         if(cp_filename and cp_frequency and
            gen % cp_frequency == 0):
-            cp = dict(population=population,
-                      generation=gen,
-                      parents=parents,
-                      halloffame=halloffame,
-                      history=history,
-                      logbook=logbook,
-                      rndstate=random.getstate())
-            pickle.dump(cp, open(cp_filename, "wb"))
-            logger.debug('Wrote checkpoint to %s', cp_filename)
+            with timer.phase('checkpoint'):
+                _save_checkpoint(cp_filename, population, gen, parents,
+                                 halloffame, history, logbook,
+                                 cp_writer=cp_writer)
+
+        _report_generation(callback, timer, logbook, population, parents,
+                           halloffame)
+        timer = _PhaseTimer()
+
+    # Evaluations that are still running are not needed anymore
+    for future in pending:
+        future.cancel()
 
     return population, logbook, history
+
+
+def ring_topology(n_islands):
+    '''Migration topology in which every island sends to the next one'''
+    return [[(island + 1) % n_islands] for island in range(n_islands)]
+
+
+def complete_topology(n_islands):
+    '''Migration topology in which every island sends to all the others'''
+    return [[destination for destination in range(n_islands)
+             if destination != island] for island in range(n_islands)]
+
+
+MIGRATION_TOPOLOGIES = {
+    'ring': ring_topology,
+    'complete': complete_topology
+}
+
+
+def _migrate(islands, toolbox, mu, migration_size, destinations):
+    '''Send migration_size emigrants from every island to its destinations
+
+    The emigrants are picked with toolbox.select, on every receiving island
+    the new parents are selected among the old parents and the immigrants
+    '''
+    immigrants = [[] for _ in islands]
+    for island, parents in enumerate(islands):
+        emigrants = toolbox.select(parents, migration_size)
+        for destination in destinations[island]:
+            immigrants[destination].extend(
+                toolbox.clone(emigrant) for emigrant in emigrants)
+
+    return [toolbox.select(parents + island_immigrants, mu)
+            if island_immigrants else parents
+            for parents, island_immigrants in zip(islands, immigrants)]
+
+
+def eaAlphaMuPlusLambdaIslandsCheckpoint(
+        populations,
+        toolbox,
+        mu,
+        cxpb,
+        mutpb,
+        ngen,
+        stats=None,
+        halloffame=None,
+        cp_frequency=1,
+        cp_filename=None,
+        continue_cp=False,
+        cache=None,
+        cp_incremental=False,
+        migration_interval=5,
+        migration_size=1,
+        migration_topology='ring',
+        callback=None):
+    r"""Island model version of the :math:`(~\alpha,\mu~,~\lambda)` algorithm
+
+    Every island evolves its own population of mu parents, and every
+    migration_interval generations a number of individuals migrate between
+    the islands according to the migration topology. Because selection is
+    performed per island, its cost only depends on the size of the island
+    populations. The offspring of all the islands are evaluated together,
+    so that there are more evaluations to distribute over the workers at
+    every generation.
+
+    The logbook, history and hall of fame are shared by all the islands,
+    the population and parents in the checkpoints are lists with an entry
+    for every island.
+
+    Args:
+        populations(list of lists of deap Individuals): initial population
+            of every island
+        toolbox(deap Toolbox)
+        mu(int): parent population size of every island
+        cxpb(float): Crossover probability
+        mutpb(float): Mutation probability
+        ngen(int): Total number of generation to run
+        stats(deap.tools.Statistics): generation of statistics
+        halloffame(deap.tools.HallOfFame): hall of fame
+        cp_frequency(int): generations between checkpoints
+        cp_filename(string): path to checkpoint filename
+        continue_cp(bool): whether to continue
+        cache(EvaluationCache): cache of fitness values, used to avoid
+            re-evaluating individuals with the same parameters
+        cp_incremental(bool): append a record to the checkpoint file at every
+            checkpoint, instead of rewriting the entire state
+        migration_interval(int): generations between migrations
+        migration_size(int): number of individuals sent by every island to
+            each of its destinations
+        migration_topology(str or callable): 'ring' or 'complete', or a
+            function that receives the number of islands and returns for
+            every island the list of islands it sends emigrants to
+        callback(callable): function called at the end of every generation,
+            see eaAlphaMuPlusLambdaCheckpoint (the time spent in migrations is
+            included in the selection phase, population and parents are lists
+            with an entry for every island)
+    """
+
+    if not callable(migration_topology):
+        if migration_topology not in MIGRATION_TOPOLOGIES:
+            raise ValueError(
+                'Unknown migration topology %s, available topologies: %s' %
+                (migration_topology, ', '.join(MIGRATION_TOPOLOGIES)))
+        migration_topology = MIGRATION_TOPOLOGIES[migration_topology]
+
+    if continue_cp:
+        # A file name has been given, then load the data from the file
+        populations, islands, start_gen, halloffame, logbook, history = \
+            _load_checkpoint(cp_filename)
+        if cache is not None:
+            cache.update(history.genealogy_history.values())
+    else:
+        # Start a new evolution
+        start_gen = 1
+        islands = [population[:] for population in populations]
+        logbook = _create_logbook(stats, cache=cache, toolbox=toolbox)
+        history = deap.tools.History()
+
+        timer = _PhaseTimer()
+
+        population = sum(populations, [])
+        with timer.phase('evaluation'):
+            invalid_count = _evaluate_invalid_fitness(
+                toolbox, population, cache=cache)
+        with timer.phase('history_update'):
+            _update_history_and_hof(halloffame, history, population)
+        _record_stats(stats, logbook, start_gen, population, invalid_count,
+                      cache=cache, toolbox=toolbox)
+        _report_generation(callback, timer, logbook, populations, islands,
+                           halloffame)
+
+    destinations = migration_topology(len(islands))
+
+    cp_writer = _create_checkpoint_writer(
+        cp_filename, cp_incremental, continue_cp)
+
+    # Begin the generational process
+    for gen in range(start_gen + 1, ngen + 1):
+        timer = _PhaseTimer()
+
+        with timer.phase('variation'):
+            offspring = [_get_offspring(parents, toolbox, cxpb, mutpb)
+                         for parents in islands]
+
+        populations = [parents + island_offspring for parents, island_offspring
+                       in zip(islands, offspring)]
+        population = sum(populations, [])
+
+        with timer.phase('evaluation'):
+            invalid_count = _evaluate_invalid_fitness(
+                toolbox, sum(offspring, []), cache=cache)
+        with timer.phase('history_update'):
+            _update_history_and_hof(halloffame, history, population)
+        _record_stats(stats, logbook, gen, population, invalid_count,
+                      cache=cache, toolbox=toolbox)
+
+        # Select the next generation parents on every island
+        with timer.phase('selection'):
+            islands = [toolbox.select(island_population, mu)
+                       for island_population in populations]
+
+            if migration_interval and gen % migration_interval == 0:
+                islands = _migrate(
+                    islands, toolbox, mu, migration_size, destinations)
+
+        logger.info(logbook.stream)
+
+        if(cp_filename and cp_frequency and
+           gen % cp_frequency == 0):
+            with timer.phase('checkpoint'):
+                _save_checkpoint(cp_filename, populations, gen, islands,
+                                 halloffame, history, logbook,
+                                 cp_writer=cp_writer)
+
+        _report_generation(callback, timer, logbook, populations, islands,
+                           halloffame)
+
+    return sum(populations, []), logbook, history
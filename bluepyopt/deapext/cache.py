@@ -0,0 +1,124 @@
+"""Evaluation cache"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import collections
+
+
+class EvaluationCache(object):
+
+    """Cache of fitness values, indexed by parameter values
+
+    Used by the optimisation algorithms to avoid re-evaluating individuals
+    that have the same parameter values as an individual that was evaluated
+    before. When the cache is full, the least recently used entry is removed.
+    """
+
+    def __init__(self, max_size=10000, tolerance=None):
+        """Constructor
+
+        Args:
+            max_size (int): maximum number of entries in the cache
+                (None means unbounded)
+            tolerance (float): size of the grid on which the parameter
+                values are quantised, values that are rounded to the same
+                multiple of tolerance are considered identical. Values that
+                are closer than tolerance but on both sides of the midpoint
+                between two multiples are not. (None means that the values
+                have to be exactly equal)
+        """
+
+        self.max_size = max_size
+        self.tolerance = tolerance
+
+        self._entries = collections.OrderedDict()
+
+        # Counters since the last call to reset_statistics
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, param_values):
+        """Key of a list of parameter values
+
+        With a tolerance, the key contains the parameter values rounded to
+        the nearest multiple of tolerance
+        """
+
+        if self.tolerance:
+            return tuple(int(round(value / self.tolerance))
+                         for value in param_values)
+        else:
+            return tuple(param_values)
+
+    def get(self, param_values):
+        """Return cached fitness values, or None if not in the cache"""
+
+        key = self.key(param_values)
+
+        if key in self._entries:
+            # Move entry to the end, it is the most recently used now
+            fitness_values = self._entries.pop(key)
+            self._entries[key] = fitness_values
+            self.hits += 1
+            return fitness_values
+        else:
+            self.misses += 1
+            return None
+
+    def put(self, param_values, fitness_values):
+        """Add the fitness values of a list of parameter values"""
+
+        key = self.key(param_values)
+
+        self._entries.pop(key, None)
+        self._entries[key] = tuple(fitness_values)
+
+        if self.max_size is not None:
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def update(self, individuals):
+        """Add the individuals with a valid fitness to the cache
+
+        Can be used to seed the cache, e.g. with the individuals in the
+        history of a checkpoint
+        """
+
+        for individual in individuals:
+            if individual.fitness.valid:
+                self.put(individual, individual.fitness.values)
+
+    def reset_statistics(self):
+        """Reset hit and miss counters"""
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, param_values):
+        return self.key(param_values) in self._entries
+
+    def __str__(self):
+        """String representation"""
+
+        return 'EvaluationCache: %d entries (max size %s, tolerance %s)' % (
+            len(self), self.max_size, self.tolerance)
@@ -0,0 +1,219 @@
+"""Checkpoint files"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import os
+import pickle
+import random
+import struct
+import zlib
+
+import deap.tools
+
+# First bytes of an incremental checkpoint file
+MAGIC = b'BPOCP\x01\n'
+
+# Every record starts with its length and crc32 checksum
+RECORD_HEADER = struct.Struct('<QI')
+
+
+def _write_record(cp_file, record):
+    """Write a record to an incremental checkpoint file"""
+
+    payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+    cp_file.write(RECORD_HEADER.pack(
+        len(payload), zlib.crc32(payload) & 0xffffffff))
+    cp_file.write(payload)
+    cp_file.flush()
+    os.fsync(cp_file.fileno())
+
+
+def _read_records(cp_file):
+    """Read the complete records of an incremental checkpoint file
+
+    Yields the records, together with the file offset after the record.
+    Reading stops at the first incomplete or corrupt record (e.g. left behind
+    by a crash during a write).
+    """
+
+    while True:
+        header = cp_file.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return
+
+        length, checksum = RECORD_HEADER.unpack(header)
+        payload = cp_file.read(length)
+        if len(payload) < length or \
+                zlib.crc32(payload) & 0xffffffff != checksum:
+            return
+
+        yield pickle.loads(payload), cp_file.tell()
+
+
+def _load_incremental(cp_file):
+    """Load an incremental checkpoint file
+
+    Returns the checkpoint dict of the latest complete record, and the file
+    offset after that record
+    """
+
+    history = deap.tools.History()
+    logbook = deap.tools.Logbook()
+
+    cp = None
+    offset = len(MAGIC)
+    for record, offset in _read_records(cp_file):
+        for index, individual, parent_indices in record['history']:
+            history.genealogy_history[index] = individual
+            history.genealogy_tree[index] = parent_indices
+            history.genealogy_index = index
+
+        logbook.header = record['logbook_header']
+        logbook.extend(record['logbook'])
+
+        cp = record
+
+    if cp is None:
+        raise Exception(
+            'Checkpoint file %s does not contain a complete record' %
+            cp_file.name)
+
+    # All the entries in the logbook have already been streamed
+    logbook.buffindex = len(logbook)
+
+    cp = dict(cp, history=history, logbook=logbook)
+    del cp['logbook_header']
+
+    return cp, offset
+
+
+def load(cp_filename):
+    """Load a checkpoint
+
+    Works with both the pickle checkpoints and the incremental checkpoints
+
+    Returns a dict with keys population, generation, parents, halloffame,
+    history, logbook and rndstate
+    """
+
+    with open(cp_filename, 'rb') as cp_file:
+        if cp_file.read(len(MAGIC)) == MAGIC:
+            return _load_incremental(cp_file)[0]
+
+        cp_file.seek(0)
+        return pickle.load(cp_file)
+
+
+def save(cp_filename, cp):
+    """Write a pickle checkpoint
+
+    The checkpoint is first written to a temporary file, which then replaces
+    the checkpoint file, so that a crash during the write doesn't corrupt it
+    """
+
+    tmp_filename = '%s.tmp' % cp_filename
+    with open(tmp_filename, 'wb') as cp_file:
+        pickle.dump(cp, cp_file)
+        cp_file.flush()
+        os.fsync(cp_file.fileno())
+    os.rename(tmp_filename, cp_filename)
+
+
+class IncrementalCheckpointWriter(object):
+
+    """Writer of incremental checkpoint files
+
+    Instead of pickling the entire state of the optimisation for every
+    checkpoint, a record is appended to the file for every checkpoint. A
+    record only contains the entries of the history and the logbook that were
+    added since the previous record, so the cost of a checkpoint doesn't
+    grow with the number of generations. Every record has a checksum, when
+    loading the file the latest complete record is used.
+    """
+
+    def __init__(self, cp_filename):
+        """Constructor
+
+        Args:
+            cp_filename (str): path to the checkpoint file
+        """
+
+        self.cp_filename = cp_filename
+
+        # Last history index and logbook length already in the file
+        self._history_index = 0
+        self._logbook_len = 0
+
+        # File offset after the last complete record
+        # (None means the file needs to be created)
+        self._offset = None
+
+    def resume(self):
+        """Continue appending records to an existing checkpoint file
+
+        If the file is not an incremental checkpoint file, it will be
+        replaced by one at the next write
+        """
+
+        with open(self.cp_filename, 'rb') as cp_file:
+            if cp_file.read(len(MAGIC)) != MAGIC:
+                return
+
+            cp, self._offset = _load_incremental(cp_file)
+
+        self._history_index = cp['history'].genealogy_index
+        self._logbook_len = len(cp['logbook'])
+
+    def write(self, population, generation, parents, halloffame, history,
+              logbook):
+        """Write a checkpoint record"""
+
+        record = dict(
+            population=population,
+            generation=generation,
+            parents=parents,
+            halloffame=halloffame,
+            rndstate=random.getstate(),
+            logbook_header=logbook.header,
+            logbook=list(logbook[self._logbook_len:]),
+            history=[(index,
+                      history.genealogy_history[index],
+                      history.genealogy_tree[index])
+                     for index in range(self._history_index + 1,
+                                        history.genealogy_index + 1)])
+
+        if self._offset is None:
+            # Create the file atomically
+            tmp_filename = '%s.tmp' % self.cp_filename
+            with open(tmp_filename, 'wb') as cp_file:
+                cp_file.write(MAGIC)
+                _write_record(cp_file, record)
+                self._offset = cp_file.tell()
+            os.rename(tmp_filename, self.cp_filename)
+        else:
+            with open(self.cp_filename, 'r+b') as cp_file:
+                # Discard anything after the last complete record
+                cp_file.truncate(self._offset)
+                cp_file.seek(self._offset)
+                _write_record(cp_file, record)
+                self._offset = cp_file.tell()
+
+        self._history_index = history.genealogy_index
+        self._logbook_len = len(logbook)
@@ -100,8 +100,15 @@ class DEAPOptimisation(bluepyopt.optimisations.Optimisation):
                  mutpb=1.0,
                  cxpb=1.0,
                  map_function=None,
-                 hof=None):
-        """Constructor"""
+                 hof=None,
+                 cache=None):
+        """Constructor
+
+        Args:
+            cache (bluepyopt.deapext.cache.EvaluationCache): cache of fitness
+                values, individuals with parameters found in the cache are
+                not evaluated again
+        """
 
         super(DEAPOptimisation, self).__init__(evaluator=evaluator)
 
@@ -113,6 +120,7 @@ class DEAPOptimisation(bluepyopt.optimisations.Optimisation):
         self.mutpb = mutpb
         self.map_function = map_function
         self.hof = hof
+        self.cache = cache
 
         if self.hof is None:
             self.hof = deap.tools.HallOfFame(10)
@@ -222,17 +230,80 @@ class DEAPOptimisation(bluepyopt.optimisations.Optimisation):
 
             from scoop import futures
             self.toolbox.register("map", futures.map)
+            self.toolbox.register("submit", futures.submit)
+            self.toolbox.register(
+                "wait_first",
+                futures.wait,
+                return_when=futures.FIRST_COMPLETED)
 
         elif self.map_function:
             self.toolbox.register("map", self.map_function)
 
+        # Register the evaluation function for the entire population
+        # this allows the evaluator to group the evaluations of individuals
+        if hasattr(self.evaluator, 'evaluate_population'):
+            self.toolbox.register(
+                "evaluate_population",
+                self.evaluator.evaluate_population,
+                map_function=self.toolbox.map)
+
+        # Evaluation of single chunks, used to evaluate individuals
+        # asynchronously while keeping the statistics of the evaluator
+        if hasattr(self.evaluator, 'evaluate_chunk') and \
+                hasattr(self.evaluator, 'collect_chunk_results'):
+            self.toolbox.register(
+                "evaluate_chunk",
+                self.evaluator.evaluate_chunk)
+            self.toolbox.register(
+                "collect_chunk_results",
+                self.evaluator.collect_chunk_results)
+
+        # Statistics of the evaluator that are recorded in the logbook
+        if hasattr(self.evaluator, 'evaluation_statistics'):
+            self.toolbox.register(
+                "evaluation_statistics",
+                self.evaluator.evaluation_statistics)
+
     def run(self,
             max_ngen=10,
             offspring_size=None,
             continue_cp=False,
             cp_filename=None,
-            cp_frequency=1):
-        """Run optimisation"""
+            cp_frequency=1,
+            asynchronous=False,
+            selection_batch=None,
+            cp_incremental=False,
+            islands=None,
+            migration_interval=5,
+            migration_size=1,
+            migration_topology='ring',
+            callback=None):
+        """Run optimisation
+
+        Args:
+            asynchronous (bool): use the asynchronous version of the
+                algorithm, which doesn't wait for all the individuals of a
+                generation to be evaluated (requires scoop to run in parallel)
+            selection_batch (int): for the asynchronous algorithm, number of
+                completed evaluations between selections
+            cp_incremental (bool): write checkpoints by appending a record
+                for every checkpoint to cp_filename, instead of pickling the
+                entire state every time
+            islands (int): number of islands, if given every island evolves
+                a population of offspring_size individuals, with migrations
+                between the islands
+            migration_interval (int): generations between migrations of
+                individuals between the islands
+            migration_size (int): number of individuals every island sends to
+                each of its destinations during a migration
+            migration_topology (str or callable): 'ring' or 'complete', or a
+                function returning for every island the list of islands it
+                sends individuals to (see deapext.algorithms.ring_topology)
+            callback (callable): function called at the end of every
+                generation with a dict with the logbook record and the
+                timings of the phases of the generation (see
+                deapext.algorithms.eaAlphaMuPlusLambdaCheckpoint)
+        """
         # Allow run function to override offspring_size
         # TODO probably in the future this should not be an object field anymore
         # keeping for backward compatibility
@@ -249,18 +320,67 @@ class DEAPOptimisation(bluepyopt.optimisations.Optimisation):
         stats.register("min", numpy.min)
         stats.register("max", numpy.max)
 
-        pop, log, history = algorithms.eaAlphaMuPlusLambdaCheckpoint(
-            pop,
-            self.toolbox,
-            offspring_size,
-            self.cxpb,
-            self.mutpb,
-            max_ngen,
-            stats=stats,
-            halloffame=self.hof,
-            cp_frequency=cp_frequency,
-            continue_cp=continue_cp,
-            cp_filename=cp_filename)
+        if islands is not None:
+            if asynchronous:
+                raise ValueError(
+                    'The island model can not be used with the '
+                    'asynchronous algorithm')
+
+            pops = [pop] + [self.toolbox.population(n=offspring_size)
+                            for _ in range(islands - 1)]
+
+            pop, log, history = \
+                algorithms.eaAlphaMuPlusLambdaIslandsCheckpoint(
+                    pops,
+                    self.toolbox,
+                    offspring_size,
+                    self.cxpb,
+                    self.mutpb,
+                    max_ngen,
+                    stats=stats,
+                    halloffame=self.hof,
+                    cp_frequency=cp_frequency,
+                    continue_cp=continue_cp,
+                    cp_filename=cp_filename,
+                    cache=self.cache,
+                    cp_incremental=cp_incremental,
+                    migration_interval=migration_interval,
+                    migration_size=migration_size,
+                    migration_topology=migration_topology,
+                    callback=callback)
+        elif asynchronous:
+            pop, log, history = algorithms.eaAlphaMuPlusLambdaAsyncCheckpoint(
+                pop,
+                self.toolbox,
+                offspring_size,
+                self.cxpb,
+                self.mutpb,
+                max_ngen,
+                stats=stats,
+                halloffame=self.hof,
+                cp_frequency=cp_frequency,
+                continue_cp=continue_cp,
+                cp_filename=cp_filename,
+                selection_batch=selection_batch,
+                cache=self.cache,
+                cp_incremental=cp_incremental,
+                callback=callback)
+        else:
+            pop, log, history = algorithms.eaAlphaMuPlusLambdaCheckpoint(
+                pop,
+                self.toolbox,
+                offspring_size,
+                self.cxpb,
+                self.mutpb,
+                max_ngen,
+                stats=stats,
+                halloffame=self.hof,
+                cp_frequency=cp_frequency,
+                continue_cp=continue_cp,
+                cp_filename=cp_filename,
+                cache=self.cache,
+                cp_incremental=cp_incremental,
+                callback=callback)
 
         return pop, self.hof, log, history
 
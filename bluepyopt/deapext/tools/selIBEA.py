@@ -33,20 +33,35 @@ import numpy
 import random
 
 
-def selIBEA(population, mu, alpha=None, kappa=.05, tournament_n=4):
-    """IBEA Selector"""
+def selIBEA(population, mu, alpha=None, kappa=.05, tournament_n=4,
+            max_block_memory=10, dtype=numpy.float64):
+    """IBEA Selector
+
+    Args:
+        max_block_memory (float): maximum memory (MB) used by the temporary
+            arrays during the calculation of the fitness components (the
+            N * N fitness components matrix itself is not included)
+        dtype (numpy dtype): floating point type used for the calculation of
+            the fitness components (e.g. numpy.float32 to halve the memory
+            footprint for large populations)
+    """
 
     if alpha is None:
         alpha = len(population)
 
     # Calculate a matrix with the fitness components of every individual
-    components = _calc_fitness_components(population, kappa=kappa)
+    components = _calc_fitness_components(
+        population,
+        kappa=kappa,
+        max_block_memory=max_block_memory,
+        dtype=dtype)
 
     # Calculate the fitness values
-    _calc_fitnesses(population, components)
+    fitnesses = _calc_fitnesses(population, components)
 
     # Do the environmental selection
-    population[:] = _environmental_selection(population, alpha)
+    population[:] = _environmental_selection(
+        population, alpha, fitnesses=fitnesses)
 
     # Select the parents in a tournament
     parents = _mating_selection(population, mu, tournament_n)
@@ -54,42 +69,72 @@ def selIBEA(population, mu, alpha=None, kappa=.05, tournament_n=4):
     return parents
 
 
-def _calc_fitness_components(population, kappa):
-    """returns an N * N numpy array of doubles, which is their IBEA fitness """
+def _calc_fitness_components(population, kappa, max_block_memory=10,
+                             dtype=numpy.float64):
+    """returns an N * N numpy array of dtype, which is their IBEA fitness
+
+    The indicator values are calculated for blocks of rows at a time, the
+    size of the blocks is chosen so that the temporary arrays don't use more
+    than max_block_memory MB
+    """
     # DEAP selector are supposed to maximise the objective values
     # We take the negative objectives because this algorithm will minimise
-    population_matrix = numpy.fromiter(
-        iter(-x for individual in population
-             for x in individual.fitness.wvalues),
-        dtype=numpy.float)
-    pop_len = len(population)
-    feat_len = len(population[0].fitness.wvalues)
-    population_matrix = population_matrix.reshape((pop_len, feat_len))
+    population_matrix = -numpy.array(
+        [individual.fitness.wvalues for individual in population],
+        dtype=dtype)
+    pop_len, feat_len = population_matrix.shape
 
     # Calculate minimal square bounding box of the objectives
     box_ranges = (numpy.max(population_matrix, axis=0) -
                   numpy.min(population_matrix, axis=0))
 
-    components_matrix = numpy.zeros((pop_len, pop_len))
-    for i in xrange(0, pop_len):
-        diff = population_matrix - population_matrix[i, :]
-        components_matrix[i, :] = numpy.max(
-            numpy.divide(
-                diff,
-                box_ranges),
-            axis=1)
+    # Number of rows that are processed together, the temporary array
+    # has a size of block_len * pop_len
+    block_len = int(max_block_memory * 1024 * 1024 /
+                    (pop_len * population_matrix.itemsize))
+    block_len = min(max(block_len, 1), pop_len)
+
+    objectives_matrix = numpy.ascontiguousarray(population_matrix.T)
+    components_matrix = numpy.empty((pop_len, pop_len), dtype=dtype)
+    diff = numpy.empty((block_len, pop_len), dtype=dtype)
+    for start in range(0, pop_len, block_len):
+        end = min(start + block_len, pop_len)
+        components_block = components_matrix[start:end, :]
+        diff_block = diff[:end - start, :]
+
+        # Maximum over the objectives of the normalised differences
+        for feat_index in range(feat_len):
+            objectives = objectives_matrix[feat_index]
+            numpy.subtract(
+                objectives[numpy.newaxis, :],
+                objectives[start:end, numpy.newaxis],
+                out=diff_block)
+            numpy.divide(diff_block, box_ranges[feat_index], out=diff_block)
+            if feat_index == 0:
+                components_block[:] = diff_block
+            else:
+                numpy.maximum(components_block, diff_block,
+                              out=components_block)
 
     # Calculate max of absolute value of all elements in matrix
-    max_absolute_indicator = numpy.max(numpy.abs(components_matrix))
+    max_absolute_indicator = max(
+        numpy.max(components_matrix), -numpy.min(components_matrix))
 
     # Normalisation
-    components_matrix = numpy.exp((-1.0 / (kappa * max_absolute_indicator)) *
-                                  components_matrix.T)
-    return components_matrix
+    numpy.multiply(
+        components_matrix,
+        (-1.0 / (kappa * max_absolute_indicator)),
+        out=components_matrix)
+    numpy.exp(components_matrix, out=components_matrix)
+
+    return components_matrix.T
 
 
 def _calc_fitnesses(population, components):
-    """Calculate the IBEA fitness of every individual"""
+    """Calculate the IBEA fitness of every individual
+
+    Returns a numpy array with the fitness values
+    """
 
     # Calculate sum of every column in the matrix, ignore diagonal elements
     column_sums = numpy.sum(components, axis=0) - numpy.diagonal(components)
@@ -98,28 +143,52 @@ def _calc_fitnesses(population, components):
     for individual, ibea_fitness in zip(population, column_sums):
         individual.ibea_fitness = ibea_fitness
 
+    return column_sums
 
-def _mating_selection(population, mu, tournament_n):
-    """Returns the n_of_parents individuals with the best fitness"""
 
-    parents = []
-    for _ in xrange(mu):
-        winner = random.choice(population)
-        for _ in xrange(tournament_n - 1):
-            individual = random.choice(population)
-            # Save winner is element with smallest fitness
-            if individual.ibea_fitness < winner.ibea_fitness:
-                winner = individual
-        parents.append(winner)
+def _get_fitnesses(population, fitnesses=None):
+    """Return the IBEA fitness values of the population as numpy array"""
 
-    return parents
+    if fitnesses is None:
+        fitnesses = numpy.array(
+            [individual.ibea_fitness for individual in population])
+
+    return fitnesses
+
+
+def _mating_selection(population, mu, tournament_n, fitnesses=None):
+    """Returns the n_of_parents individuals with the best fitness
 
+    All the tournaments are run at once on an array of fitness values. The
+    numpy random generator used is seeded from the 'random' module, this way
+    the selection can be reproduced from the state of the 'random' module
+    (which is the state that is stored in the checkpoints)
+    """
 
-def _environmental_selection(population, selection_size):
+    fitnesses = _get_fitnesses(population, fitnesses)
+
+    random_state = numpy.random.RandomState(random.randint(0, 2 ** 32 - 1))
+    competitors = random_state.randint(
+        0, len(population), size=(mu, tournament_n))
+
+    # Winner is the competitor with the smallest fitness, in case of a tie
+    # the first competitor wins
+    winners = competitors[
+        numpy.arange(mu),
+        numpy.argmin(fitnesses[competitors], axis=1)]
+
+    return [population[index] for index in winners]
+
+
+def _environmental_selection(population, selection_size, fitnesses=None):
     """Returns the selection_size individuals with the best fitness"""
 
+    fitnesses = _get_fitnesses(population, fitnesses)
+
     # Sort the individuals based on their fitness
-    population.sort(key=lambda ind: ind.ibea_fitness)
+    # (mergesort is stable, like the sort of lists)
+    order = numpy.argsort(fitnesses, kind='mergesort')
+    population[:] = [population[index] for index in order]
 
     # Return the first 'selection_size' elements
     return population[:selection_size]
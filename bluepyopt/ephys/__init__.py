@@ -36,6 +36,10 @@ import responses  # NOQA
 import recordings  # NOQA
 import objectivescalculators  # NOQA
 import stimuli  # NOQA
+import workers  # NOQA
+import timings  # NOQA
+import terminations  # NOQA
+import distributions  # NOQA
 
 # TODO create all the necessary abstract methods
 # TODO check inheritance structure
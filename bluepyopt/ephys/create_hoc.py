@@ -5,6 +5,7 @@ import re
 from collections import defaultdict, namedtuple, OrderedDict
 
 import jinja2
+from bluepyopt.ephys import distributions
 from bluepyopt.ephys.parameters import (NrnGlobalParameter,
                                         NrnSectionParameter,
                                         NrnRangeParameter)
@@ -29,6 +30,20 @@ def _generate_channels_by_location(mechanisms):
     return channels
 
 
+def _distribution_hoc_expression(distribution, value):
+    """Hoc expression of a soma distance distribution"""
+
+    try:
+        return distributions.compile_distribution(
+            distribution).hoc_expression(value)
+    except distributions.UnsupportedExpressionError:
+        # Distributions outside of the supported subset are converted
+        # textually
+        distribution = re.sub(r'math\.', '', distribution)
+        distribution = re.sub('{distance}', FLOAT_FORMAT, distribution)
+        return re.sub('{value}', format_float(value), distribution)
+
+
 def _generate_parameters(parameters):
     """Create a list of parameters that need to be added to the hoc template."""
     param_locations = defaultdict(list)
@@ -50,10 +65,8 @@ def _generate_parameters(parameters):
         for param in param_locations[loc]:
             if isinstance(param, NrnRangeParameter):
                 if isinstance(param.value_scaler, NrnSegmentSomaDistanceScaler):
-                    value = param.value_scaler.distribution
-                    value = re.sub(r'math\.', '', value)
-                    value = re.sub('{distance}', FLOAT_FORMAT, value)
-                    value = re.sub('{value}', format_float(param.value), value)
+                    value = _distribution_hoc_expression(
+                        param.value_scaler.distribution, param.value)
                     range_params.append(Range(loc, param.param_name, value))
                 elif isinstance(param.value_scaler, NrnSegmentLinearScaler):
                     value = param.value_scale_func(param.value)
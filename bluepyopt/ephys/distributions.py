@@ -0,0 +1,303 @@
+"""Compiled distribution expressions of parameter scalers"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import ast
+import math
+import operator
+
+import numpy
+
+FLOAT_FORMAT = '%.17g'
+
+# Division of the Python 2 expressions that are evaluated with eval
+_DIV = getattr(operator, 'div', operator.truediv)
+
+# Supported operators, ast class -> (function, hoc operator)
+BINARY_OPERATORS = {
+    ast.Add: (operator.add, '+'),
+    ast.Sub: (operator.sub, '-'),
+    ast.Mult: (operator.mul, '*'),
+    ast.Div: (_DIV, '/'),
+    ast.Pow: (operator.pow, '^'),
+}
+
+UNARY_OPERATORS = {
+    ast.USub: (operator.neg, '-'),
+    ast.UAdd: (operator.pos, '+'),
+}
+
+# Supported functions of math, name -> hoc function
+FUNCTIONS = {
+    'exp': 'exp',
+    'log': 'log',
+    'log10': 'log10',
+    'sqrt': 'sqrt',
+    'sin': 'sin',
+    'cos': 'cos',
+    'atan': 'atan',
+    'fabs': 'abs',
+}
+
+# Supported constants of math, name -> hoc constant
+CONSTANTS = {
+    'pi': 'PI',
+    'e': 'E',
+}
+
+VARIABLES = ('distance', 'value')
+
+# Compiled distributions, distribution -> CompiledDistribution, or the
+# UnsupportedExpressionError it raised
+_compiled_distributions = {}
+
+
+class UnsupportedExpressionError(ValueError):
+
+    """Raised when a distribution is not in the supported subset"""
+    pass
+
+
+def _as_literal(value):
+    """Value of the literal that FLOAT_FORMAT % value gives in an expression
+
+    Floats without fractional part are formatted as integers
+    """
+
+    if value.is_integer() and abs(value) < 1e17:
+        return int(value)
+
+    return value
+
+
+def _check_numbers(numbers):
+    """Raise ValueError if numbers are negative or not finite"""
+
+    numbers = numpy.asarray(numbers, dtype=numpy.float64)
+    if numpy.any(numbers < 0) or not numpy.all(numpy.isfinite(numbers)):
+        raise ValueError(
+            'CompiledDistribution: only non-negative finite distances and '
+            'values can be evaluated')
+
+
+def _elementwise(function, values):
+    """Apply a function of math to every element of values"""
+
+    if numpy.ndim(values) == 0:
+        return function(values)
+
+    return numpy.array([function(value) for value in values])
+
+
+class CompiledDistribution(object):
+
+    """Distribution expression parsed into a tree
+
+    The supported subset consists of the placeholders {distance} and
+    {value}, numbers, the arithmetic operators +, -, *, / and **, and the
+    functions and constants of math listed in FUNCTIONS and CONSTANTS.
+    """
+
+    def __init__(self, distribution):
+        """Constructor
+
+        Args:
+            distribution (str): distribution of a NrnSegmentSomaDistanceScaler
+
+        Raises:
+            UnsupportedExpressionError if the distribution is not in the
+            supported subset
+        """
+
+        self.distribution = distribution
+
+        try:
+            expression = distribution.format(
+                distance='distance', value='value')
+            tree = ast.parse(expression, mode='eval')
+        except (SyntaxError, KeyError, IndexError, ValueError):
+            raise UnsupportedExpressionError(
+                'Distribution %s can not be parsed' % distribution)
+
+        self.tree = self._convert(tree.body)
+
+    def _convert(self, node):
+        """Convert an ast node to a tree of tuples"""
+
+        if isinstance(node, ast.Num) and \
+                isinstance(node.n, (int, long, float)):
+            return ('number', node.n)
+        elif isinstance(node, ast.Name) and node.id in VARIABLES:
+            return ('variable', node.id)
+        elif isinstance(node, ast.BinOp) and \
+                type(node.op) in BINARY_OPERATORS:
+            return ('binary', type(node.op),
+                    self._convert(node.left), self._convert(node.right))
+        elif isinstance(node, ast.UnaryOp) and \
+                type(node.op) in UNARY_OPERATORS:
+            return ('unary', type(node.op), self._convert(node.operand))
+        elif isinstance(node, ast.Attribute) and \
+                self._is_math(node.value) and node.attr in CONSTANTS:
+            return ('constant', node.attr)
+        elif isinstance(node, ast.Call) and \
+                isinstance(node.func, ast.Attribute) and \
+                self._is_math(node.func.value) and \
+                node.func.attr in FUNCTIONS and \
+                len(node.args) == 1 and not node.keywords and \
+                node.starargs is None and node.kwargs is None:
+            return ('call', node.func.attr, self._convert(node.args[0]))
+
+        raise UnsupportedExpressionError(
+            'Distribution %s contains unsupported expression %s' %
+            (self.distribution, ast.dump(node)))
+
+    @staticmethod
+    def _is_math(node):
+        """Is the node the name math"""
+
+        return isinstance(node, ast.Name) and node.id == 'math'
+
+    def _evaluate(self, node, variables, apply_function):
+        """Evaluate a node of the tree"""
+
+        kind = node[0]
+        if kind == 'number':
+            return node[1]
+        elif kind == 'variable':
+            return variables[node[1]]
+        elif kind == 'constant':
+            return getattr(math, node[1])
+        elif kind == 'binary':
+            return BINARY_OPERATORS[node[1]][0](
+                self._evaluate(node[2], variables, apply_function),
+                self._evaluate(node[3], variables, apply_function))
+        elif kind == 'unary':
+            return UNARY_OPERATORS[node[1]][0](
+                self._evaluate(node[2], variables, apply_function))
+        elif kind == 'call':
+            return apply_function(
+                getattr(math, node[1]),
+                self._evaluate(node[2], variables, apply_function))
+
+    def evaluate(self, distance, value):
+        """Evaluate the distribution for a distance and value
+
+        Gives the same result as evaluating the distribution with the
+        distance and value formatted in it
+
+        Raises:
+            ValueError if the distance or value is negative or not finite
+            (formatted in the expression these would give another result,
+            e.g. -2**2, or can't be formatted)
+        """
+
+        _check_numbers([distance, value])
+
+        return self._evaluate(
+            self.tree,
+            {'distance': _as_literal(float(distance)),
+             'value': _as_literal(float(value))},
+            lambda function, argument: function(argument))
+
+    def evaluate_array(self, distances, value):
+        """Evaluate the distribution for an array of distances
+
+        The arithmetic is done by NumPy, the functions of math are applied
+        to every element, so that the results are the same as the ones of
+        evaluate for distances and values that are not integers.
+        Floating point errors raise FloatingPointError.
+
+        Raises:
+            ValueError if a distance or the value is negative or not finite
+        """
+
+        distances = numpy.asarray(distances, dtype=numpy.float64)
+        _check_numbers(distances)
+        _check_numbers(value)
+
+        with numpy.errstate(all='raise'):
+            values = self._evaluate(
+                self.tree,
+                {'distance': distances, 'value': float(value)},
+                _elementwise)
+
+        return numpy.array(
+            numpy.broadcast_to(values, distances.shape), dtype=numpy.float64)
+
+    def _hoc(self, node, value):
+        """Hoc expression of a node of the tree"""
+
+        kind = node[0]
+        if kind == 'number':
+            # repr of a float is exact, repr of a long ends with L
+            if isinstance(node[1], float):
+                return repr(node[1])
+            return str(node[1])
+        elif kind == 'variable':
+            if node[1] == 'distance':
+                return FLOAT_FORMAT
+            return FLOAT_FORMAT % value
+        elif kind == 'constant':
+            return CONSTANTS[node[1]]
+        elif kind == 'binary':
+            return '(%s %s %s)' % (self._hoc(node[2], value),
+                                   BINARY_OPERATORS[node[1]][1],
+                                   self._hoc(node[3], value))
+        elif kind == 'unary':
+            return '(%s%s)' % (UNARY_OPERATORS[node[1]][1],
+                               self._hoc(node[2], value))
+        elif kind == 'call':
+            return '%s(%s)' % (FUNCTIONS[node[1]], self._hoc(node[2], value))
+
+    def hoc_expression(self, value):
+        """Hoc expression of the distribution for a parameter value
+
+        The distance is a FLOAT_FORMAT placeholder, to be filled in with
+        sprint
+        """
+
+        return self._hoc(self.tree, value)
+
+    def __str__(self):
+        """String representation"""
+
+        return self.distribution
+
+
+def compile_distribution(distribution):
+    """Return the CompiledDistribution of a distribution, compiled only once
+
+    Raises:
+        UnsupportedExpressionError if the distribution is not in the
+        supported subset
+    """
+
+    if distribution not in _compiled_distributions:
+        try:
+            _compiled_distributions[distribution] = \
+                CompiledDistribution(distribution)
+        except UnsupportedExpressionError as error:
+            _compiled_distributions[distribution] = error
+
+    compiled = _compiled_distributions[distribution]
+    if isinstance(compiled, UnsupportedExpressionError):
+        raise compiled
+
+    return compiled
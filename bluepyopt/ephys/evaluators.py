@@ -22,11 +22,69 @@ Copyright (c) 2016, EPFL/Blue Brain Project
 
 # pylint: disable=W0511
 
+import time
 import logging
 logger = logging.getLogger(__name__)
 
 import bluepyopt as bpopt
 
+from . import protocols as ephys_protocols
+from . import timings as timings_module
+from . import workers
+
+
+def _failed_responses(protocols):
+    """Responses of protocols that didn't finish, None for every recording"""
+
+    responses = {}
+    for protocol in protocols:
+        for subprotocol in protocol.subprotocols().values():
+            for recording in getattr(subprotocol, 'recordings', None) or []:
+                responses[recording.name] = None
+
+    return responses
+
+
+class EvaluationStage(object):
+
+    """Stage of a staged cell evaluation
+
+    The protocols of a stage are run, and the objectives of the stage are
+    scored. If one of these scores exceeds the threshold, the protocols of
+    the next stages are not run, and all the objectives that haven't been
+    scored get the penalty score.
+    """
+
+    def __init__(self, protocol_names, objective_names, threshold=None,
+                 penalty=250.0):
+        """Constructor
+
+        Args:
+            protocol_names (list of str): names of the fitness protocols that
+                are run in this stage
+            objective_names (list of str): names of the objectives scored
+                after this stage, their features can use the responses of
+                this stage and of the previous stages
+            threshold (float): maximal score of the objectives of this stage
+                for the evaluation to continue (default: always continue)
+            penalty (float): score of the objectives that are skipped, it
+                should be at least as high as the scores the skipped
+                objectives can get, so that the skipped individuals remain
+                dominated in a multi-objective selection
+        """
+
+        self.protocol_names = protocol_names
+        self.objective_names = objective_names
+        self.threshold = threshold
+        self.penalty = penalty
+
+    def __str__(self):
+        """String representation"""
+
+        return 'stage: protocols %s, objectives %s, threshold %s, ' \
+            'penalty %s' % (self.protocol_names, self.objective_names,
+                            self.threshold, self.penalty)
+
 
 class CellEvaluator(bpopt.evaluators.Evaluator):
 
@@ -39,7 +97,14 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
             fitness_protocols=None,
             fitness_calculator=None,
             isolate_protocols=None,
-            sim=None):
+            sim=None,
+            population_chunk_size=None,
+            timings=None,
+            share_cell_instance=False,
+            stages=None,
+            pack_chunks=False,
+            protocol_timeout=None,
+            evaluation_timeout=None):
         """Constructor
 
         Args:
@@ -51,12 +116,42 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
             fitness_calculator (ObjectivesCalculator):
                 ObjectivesCalculator object used for the transformation of
                 Responses into Objective objects
-            isolate_protocols (bool): whether to use multiprocessing to
-                isolate the simulations
+            isolate_protocols (bool or ephys.workers.PersistentWorker):
+                whether to use multiprocessing to isolate the simulations
                 (disabling this could lead to unexpected behavior, and might
-                hinder the reproducability of the simulations)
+                hinder the reproducability of the simulations). If a
+                PersistentWorker is passed, the simulations are isolated in
+                a long-lived worker process instead of a new process for
+                every protocol
             sim (ephys.simulators.NrnSimulator): simulator to use for the cell
                 evaluation
+            population_chunk_size (int): number of individuals that are
+                packed in one task by evaluate_population (default 1)
+            timings (ephys.timings.EvaluationTimings): if given, the time
+                spent in the phases of every evaluation (per protocol and per
+                objective) is accumulated in this object. When the population
+                is evaluated with evaluate_population, the timings recorded
+                in the worker processes are sent back and added to it.
+            share_cell_instance (bool): instantiate the cell only once for
+                all the fitness protocols of an evaluation, instead of once
+                for every protocol (only supported for SweepProtocols)
+            stages (list of EvaluationStage): evaluate the protocols and
+                objectives in these ordered stages, skipping the remaining
+                stages when a stage threshold is exceeded. Protocols and
+                objectives that are not in any stage are evaluated after
+                the last stage.
+            pack_chunks (bool): evaluate all the individuals of a population
+                chunk (see population_chunk_size) in a single simulation,
+                with a copy of the cell for every individual (see
+                ephys.protocols.run_packed)
+            protocol_timeout (float): wall clock time limit (s) of the run of
+                a protocol. A simulation that exceeds it is killed, and the
+                responses of the protocol are None (giving its features the
+                failure score). Requires isolate_protocols.
+            evaluation_timeout (float): wall clock time limit (s) of all the
+                protocol runs of an evaluation together, the protocols that
+                are left when it is exceeded are not run. For packed chunks,
+                the limit of the packed run.
         """
 
         super(CellEvaluator, self).__init__(
@@ -78,6 +173,50 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
 
         self.isolate_protocols = isolate_protocols
 
+        self.population_chunk_size = population_chunk_size \
+            if population_chunk_size is not None else 1
+
+        self.timings = timings
+
+        self.share_cell_instance = share_cell_instance
+
+        self.protocol_timeout = protocol_timeout
+        self.evaluation_timeout = evaluation_timeout
+        if (protocol_timeout is not None or evaluation_timeout is not None) \
+                and isolate_protocols is False:
+            raise ValueError(
+                'CellEvaluator: timeouts can only be used with '
+                'isolate_protocols')
+
+        # Number of protocol runs that timed out in this process, see
+        # evaluation_statistics
+        self.timeout_count = 0
+
+        self.pack_chunks = pack_chunks
+        if pack_chunks and stages is not None:
+            raise ValueError(
+                'CellEvaluator: pack_chunks can not be combined with stages')
+        if pack_chunks:
+            ephys_protocols.check_packable(
+                fitness_protocols.values(), cell_model)
+
+        self.stages = stages
+        if stages is not None:
+            objective_names = [objective.name for objective
+                               in fitness_calculator.objectives]
+            for stage in stages:
+                for protocol_name in stage.protocol_names:
+                    if protocol_name not in fitness_protocols:
+                        raise ValueError(
+                            'CellEvaluator: stage protocol %s is not a '
+                            'fitness protocol' % protocol_name)
+                for objective_name in stage.objective_names:
+                    if objective_name not in objective_names:
+                        raise ValueError(
+                            'CellEvaluator: stage objective %s is not an '
+                            'objective of the fitness calculator' %
+                            objective_name)
+
     def param_dict(self, param_array):
         """Convert param_array in param_dict"""
         param_dict = {}
@@ -98,52 +237,333 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
 
         return objective_dict
 
-    def run_protocol(self, protocol, param_values, isolate=None):
+    def run_protocol(self, protocol, param_values, isolate=None,
+                     timings=None, timeout=None):
         """Run protocol"""
 
+        # Only pass timings and timeout when requested, protocols outside of
+        # bluepyopt might not accept the arguments
+        kwargs = {'timings': timings} if timings is not None else {}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+
         return protocol.run(
             self.cell_model,
             param_values,
             sim=self.sim,
-            isolate=isolate)
+            isolate=isolate,
+            **kwargs)
 
-    def run_protocols(self, protocols, param_values):
-        """Run a set of protocols"""
+    def _evaluation_deadline(self):
+        """Time at which an evaluation that starts now times out"""
+
+        if self.evaluation_timeout is None:
+            return None
+
+        return time.time() + self.evaluation_timeout
+
+    def _timeout(self, deadline=None):
+        """Time limit of the next protocol run, None if there is no limit"""
+
+        timeouts = []
+        if self.protocol_timeout is not None:
+            timeouts.append(self.protocol_timeout)
+        if deadline is not None:
+            timeouts.append(max(deadline - time.time(), 0.0))
+
+        return min(timeouts) if timeouts else None
+
+    def _timed_out(self, protocols, param_values):
+        """Count and log a timeout, return the responses of the protocols"""
+
+        self.timeout_count += 1
+
+        logger.warning(
+            'CellEvaluator: run of protocols %s of %s timed out, parameters: '
+            '%s', [protocol.name for protocol in protocols],
+            self.cell_model.name, str(param_values))
+
+        return _failed_responses(protocols)
+
+    def run_protocols(self, protocols, param_values, timings=None,
+                      deadline=None):
+        """Run a set of protocols
+
+        Args:
+            deadline (float): time (as returned by time.time) at which the
+                evaluation times out
+        """
+
+        if self.share_cell_instance:
+            try:
+                return ephys_protocols.run_on_shared_cell(
+                    protocols,
+                    self.cell_model,
+                    param_values,
+                    sim=self.sim,
+                    isolate=self.isolate_protocols,
+                    timings=timings,
+                    timeout=self._timeout(deadline))
+            except workers.EvaluationTimeout:
+                return self._timed_out(protocols, param_values)
 
         responses = {}
 
         for protocol in protocols:
-            responses.update(self.run_protocol(
-                protocol,
-                param_values=param_values,
-                isolate=self.isolate_protocols))
+            timeout = self._timeout(deadline)
+            if timeout is not None and timeout <= 0.0:
+                logger.debug(
+                    'CellEvaluator: evaluation time limit exceeded, not '
+                    'running protocol %s', protocol.name)
+                responses.update(_failed_responses([protocol]))
+                continue
+
+            try:
+                responses.update(self.run_protocol(
+                    protocol,
+                    param_values=param_values,
+                    isolate=self.isolate_protocols,
+                    timings=timings,
+                    timeout=timeout))
+            except workers.EvaluationTimeout:
+                responses.update(self._timed_out([protocol], param_values))
 
         return responses
 
-    def evaluate_with_dicts(self, param_dict=None):
-        """Run evaluation with dict as input and output"""
+    def evaluate_with_dicts(self, param_dict=None, timings=None):
+        """Run evaluation with dict as input and output
+
+        Args:
+            param_dict (dict): parameter values
+            timings (ephys.timings.EvaluationTimings): object in which the
+                timings of the evaluation are recorded (default
+                self.timings)
+        """
 
         if self.fitness_calculator is None:
             raise Exception(
                 'CellEvaluator: need fitness_calculator to evaluate')
 
+        if timings is None:
+            timings = self.timings
+
         logger.debug('Evaluating %s', self.cell_model.name)
 
+        deadline = self._evaluation_deadline()
+
+        if self.stages is not None:
+            return self._evaluate_stages(
+                param_dict, timings=timings, deadline=deadline)
+
         responses = self.run_protocols(
             self.fitness_protocols.values(),
-            param_dict)
+            param_dict,
+            timings=timings,
+            deadline=deadline)
 
-        return self.fitness_calculator.calculate_scores(responses)
+        if timings is None:
+            return self.fitness_calculator.calculate_scores(responses)
 
-    def evaluate_with_lists(self, param_list=None):
+        return self.fitness_calculator.calculate_scores(
+            responses, timings=timings)
+
+    def _calculate_scores(self, responses, objective_names, timings=None):
+        """Calculate the scores of a subset of the objectives"""
+
+        if timings is None:
+            return self.fitness_calculator.calculate_scores(
+                responses, objective_names=objective_names)
+
+        return self.fitness_calculator.calculate_scores(
+            responses, timings=timings, objective_names=objective_names)
+
+    def _evaluate_stages(self, param_dict, timings=None, deadline=None):
+        """Run the evaluation stage by stage"""
+
+        objective_names = [objective.name for objective
+                           in self.fitness_calculator.objectives]
+
+        final_stage = EvaluationStage(
+            [name for name in self.fitness_protocols
+             if not any(name in stage.protocol_names
+                        for stage in self.stages)],
+            [name for name in objective_names
+             if not any(name in stage.objective_names
+                        for stage in self.stages)])
+
+        responses = {}
+        scores = {}
+        for stage in self.stages + [final_stage]:
+            responses.update(self.run_protocols(
+                [self.fitness_protocols[name]
+                 for name in stage.protocol_names],
+                param_dict,
+                timings=timings,
+                deadline=deadline))
+
+            stage_scores = self._calculate_scores(
+                responses, stage.objective_names, timings=timings)
+            scores.update(stage_scores)
+
+            if stage.threshold is not None and stage_scores and \
+                    max(stage_scores.values()) > stage.threshold:
+                logger.debug(
+                    'Evaluation of %s stopped after %s, score %.6g above '
+                    'threshold %.6g', self.cell_model.name, stage,
+                    max(stage_scores.values()), stage.threshold)
+                break
+
+        return {name: scores[name] if name in scores else stage.penalty
+                for name in objective_names}
+
+    def evaluate_with_lists(self, param_list=None, timings=None):
         """Run evaluation with lists as input and outputs"""
 
         param_dict = self.param_dict(param_list)
 
-        obj_dict = self.evaluate_with_dicts(param_dict=param_dict)
+        obj_dict = self.evaluate_with_dicts(
+            param_dict=param_dict,
+            timings=timings)
 
         return obj_dict.values()
 
+    def evaluate_packed(self, param_lists, timings=None):
+        """Evaluate parameter sets in a single simulation"""
+
+        param_dicts = [self.param_dict(param_list)
+                       for param_list in param_lists]
+
+        logger.debug('Evaluating %d packed copies of %s',
+                     len(param_dicts), self.cell_model.name)
+
+        try:
+            responses_list = ephys_protocols.run_packed(
+                self.fitness_protocols.values(),
+                self.cell_model,
+                param_dicts,
+                sim=self.sim,
+                isolate=self.isolate_protocols,
+                timings=timings,
+                timeout=self._timeout(self._evaluation_deadline()))
+        except workers.EvaluationTimeout:
+            responses = self._timed_out(
+                self.fitness_protocols.values(), param_dicts)
+            responses_list = [responses for _ in param_dicts]
+
+        kwargs = {'timings': timings} if timings is not None else {}
+        return [self.fitness_calculator.calculate_scores(
+            responses, **kwargs).values()
+            for responses in responses_list]
+
+    def _returns_chunk_statistics(self):
+        """Does evaluate_chunk return timings and timeout counts"""
+
+        return self.timings is not None or \
+            self.protocol_timeout is not None or \
+            self.evaluation_timeout is not None
+
+    def evaluate_chunk(self, param_lists):
+        """Evaluate a chunk of parameter sets
+
+        The parameter sets are evaluated one after the other, or in a single
+        simulation if pack_chunks is set. If timings are recorded or timeouts
+        are set, returns a tuple with the list of objectives, the
+        EvaluationTimings of the chunk (None if timings aren't recorded) and
+        the number of timeouts in the chunk
+        """
+
+        if not self._returns_chunk_statistics():
+            if self.pack_chunks:
+                return self.evaluate_packed(param_lists)
+
+            return [self.evaluate_with_lists(param_list)
+                    for param_list in param_lists]
+
+        timeout_count = self.timeout_count
+
+        chunk_timings = timings_module.EvaluationTimings() \
+            if self.timings is not None else None
+
+        if self.pack_chunks:
+            objectives = self.evaluate_packed(
+                param_lists, timings=chunk_timings)
+        else:
+            objectives = [
+                self.evaluate_with_lists(param_list, timings=chunk_timings)
+                for param_list in param_lists]
+
+        # The timeouts are added to the count by evaluate_population, which
+        # can run in another process
+        chunk_timeout_count = self.timeout_count - timeout_count
+        self.timeout_count = timeout_count
+
+        return objectives, chunk_timings, chunk_timeout_count
+
+    def evaluate_population(self, param_lists, map_function=map):
+        """Evaluate a population of parameter sets
+
+        The parameter sets are packed in chunks of population_chunk_size
+        elements, and every chunk is evaluated in a single call to the map
+        function. This reduces the overhead of dispatching a task for every
+        individual when the simulations are short.
+
+        If self.timings is set, the timings of all the evaluations are
+        added to it. The timeouts are added to self.timeout_count.
+        """
+
+        param_lists = [list(param_list) for param_list in param_lists]
+
+        chunks = [param_lists[index:index + self.population_chunk_size]
+                  for index in range(
+                      0, len(param_lists), self.population_chunk_size)]
+
+        return self.collect_chunk_results(
+            map_function(self.evaluate_chunk, chunks))
+
+    def collect_chunk_results(self, chunk_results):
+        """Objectives of the results of evaluate_chunk
+
+        The timings and timeouts of the chunks are added to self.timings and
+        self.timeout_count, e.g. when the chunks were evaluated in other
+        processes
+
+        Returns:
+            list with the objectives of every parameter set of the chunks
+        """
+
+        chunk_results = list(chunk_results)
+
+        if self._returns_chunk_statistics():
+            for _, chunk_timings, chunk_timeout_count in chunk_results:
+                if chunk_timings is not None:
+                    self.timings.update(chunk_timings)
+                self.timeout_count += chunk_timeout_count
+            chunk_results = [chunk_objectives
+                             for chunk_objectives, _, _ in chunk_results]
+
+        return [objectives
+                for chunk_objectives in chunk_results
+                for objectives in chunk_objectives]
+
+    def evaluation_statistics(self, reset=True):
+        """Statistics of the evaluations, e.g. to record in a logbook
+
+        Returns a dict with the number of protocol runs that timed out
+        (empty when no timeouts are set)
+
+        Args:
+            reset (bool): reset the statistics
+        """
+
+        if self.protocol_timeout is None and self.evaluation_timeout is None:
+            return {}
+
+        statistics = {'timeouts': self.timeout_count}
+        if reset:
+            self.timeout_count = 0
+
+        return statistics
+
     def evaluate(self, param_list=None):
         """Run evaluation with lists as input and outputs"""
 
@@ -163,4 +583,9 @@ class CellEvaluator(bpopt.evaluators.Evaluator):
         content += '  fitness calculator:\n'
         content += '    %s\n' % str(self.fitness_calculator)
 
+        if self.stages is not None:
+            content += '  evaluation stages:\n'
+            for stage in self.stages:
+                content += '    %s\n' % str(stage)
+
         return content
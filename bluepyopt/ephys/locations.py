@@ -21,11 +21,249 @@ Copyright (c) 2016, EPFL/Blue Brain Project
 
 # pylint: disable=W0511
 
-import itertools
+import heapq
 
 from bluepyopt.ephys.base import BaseEPhys
 from bluepyopt.ephys.serializer import DictMixin
 
+# Sections in the section lists of instantiated cells,
+# cell name -> section list name -> list of sections
+_section_index = {}
+
+# Soma distance indices of the section lists of instantiated cells,
+# (cell name, section list name) -> SomaDistanceIndex
+_soma_distance_index = {}
+
+
+def section_list(icell, seclist_name):
+    """List of the sections in a section list of an instantiated cell
+
+    The section list is only traversed once, the list is kept until the
+    index of the cell is invalidated (see invalidate_section_index).
+    Cells that are not hoc objects are not indexed.
+    """
+
+    if not hasattr(icell, 'hname'):
+        return list(getattr(icell, seclist_name))
+
+    cell_index = _section_index.setdefault(icell.hname(), {})
+
+    sections = cell_index.get(seclist_name)
+    if sections is None:
+        sections = list(getattr(icell, seclist_name))
+        cell_index[seclist_name] = sections
+
+    return sections
+
+
+def invalidate_section_index(icell=None):
+    """Remove the section index of a cell, or of all cells if icell is None
+
+    Needs to be called when sections are created or removed after the
+    morphology was instantiated (e.g. when replacing the axon)
+    """
+
+    if icell is None:
+        _section_index.clear()
+        _soma_distance_index.clear()
+    elif hasattr(icell, 'hname'):
+        cell_name = icell.hname()
+        _section_index.pop(cell_name, None)
+        for key in list(_soma_distance_index):
+            if key[0] == cell_name:
+                del _soma_distance_index[key]
+
+
+class _IntervalNode(object):
+
+    """Node of a centered interval tree
+
+    Contains the intervals that overlap the center of the node, sorted by
+    increasing lower bound and by decreasing upper bound, and the subtrees
+    of the intervals below and above the center
+    """
+
+    __slots__ = ('center', 'by_lower', 'by_upper', 'below', 'above')
+
+    def __init__(self, intervals):
+        """Constructor
+
+        Args:
+            intervals (list): intervals (lower bound, upper bound, ...),
+                sorted by lower bound
+        """
+
+        self.center = intervals[len(intervals) // 2][0]
+
+        below = [interval for interval in intervals
+                 if interval[1] < self.center]
+        above = [interval for interval in intervals
+                 if interval[0] > self.center]
+
+        self.by_lower = [interval for interval in intervals
+                         if interval[0] <= self.center <= interval[1]]
+        self.by_upper = sorted(
+            self.by_lower, key=lambda interval: interval[1], reverse=True)
+
+        self.below = _IntervalNode(below) if below else None
+        self.above = _IntervalNode(above) if above else None
+
+
+class SomaDistanceIndex(object):
+
+    """Intervals of soma distances covered by the sections of a list
+
+    Every section covers the distances between the distances of its start
+    and its end. The intervals are stored in a centered interval tree, a
+    lookup takes O(log(n) + k) for n sections of which k contain the
+    distance. Several distances are looked up with a single sweep over the
+    intervals sorted by lower bound (see segments).
+    """
+
+    def __init__(self, sim, icell, seclist_name):
+        """Constructor
+
+        Args:
+            sim (NrnSimulator): simulator
+            icell (hoc object): instantiated cell
+            seclist_name (str): name of Neuron section list (ex: 'apical')
+        """
+
+        sections = section_list(icell, seclist_name)
+
+        # Initialise origin
+        sim.neuron.h.distance(0, 0.5, sec=icell.soma[0])
+
+        intervals = []
+        for position, isec in enumerate(sections):
+            start_distance = sim.neuron.h.distance(1, 0.0, sec=isec)
+            end_distance = sim.neuron.h.distance(1, 1.0, sec=isec)
+
+            min_distance = min(start_distance, end_distance)
+            max_distance = max(start_distance, end_distance)
+
+            # Sections that go towards the soma only contain their end
+            intervals.append(
+                (min_distance, end_distance, max_distance, position, isec))
+
+        intervals.sort(key=lambda interval: (interval[0], interval[3]))
+
+        self.intervals = intervals
+        self.tree = _IntervalNode(intervals) if intervals else None
+
+    def sections_at(self, soma_distance):
+        """Intervals of the sections that contain a soma distance"""
+
+        found = []
+
+        node = self.tree
+        while node is not None:
+            if soma_distance < node.center:
+                for interval in node.by_lower:
+                    if interval[0] > soma_distance:
+                        break
+                    found.append(interval)
+                node = node.below
+            elif soma_distance > node.center:
+                for interval in node.by_upper:
+                    if interval[1] < soma_distance:
+                        break
+                    found.append(interval)
+                node = node.above
+            else:
+                found.extend(node.by_lower)
+                node = None
+
+        return found
+
+    @staticmethod
+    def _choose_segment(soma_distance, intervals):
+        """Segment at a distance in the sections of intervals
+
+        Of all the sections at the distance, the last one in the section
+        list with a segment of non-zero diameter is chosen.
+        """
+
+        icomp = None
+        icomp_position = -1
+
+        for min_distance, _, max_distance, position, isec in intervals:
+            if position < icomp_position:
+                continue
+
+            comp_x = float(soma_distance - min_distance) / \
+                (max_distance - min_distance)
+
+            if isec(comp_x).diam > 0.0:
+                icomp = isec(comp_x)
+                icomp_position = position
+
+        if icomp is None:
+            raise Exception(
+                'No comp found at %s distance from soma' %
+                soma_distance)
+
+        return icomp
+
+    def segment(self, soma_distance):
+        """Segment at a distance from the soma"""
+
+        return self._choose_segment(
+            soma_distance, self.sections_at(soma_distance))
+
+    def segments(self, soma_distances):
+        """Segments at several distances from the soma
+
+        The distances are sorted, and the intervals are swept once in order
+        of their lower bound, keeping the intervals that contain the current
+        distance in a heap ordered by upper bound
+        """
+
+        order = sorted(range(len(soma_distances)),
+                       key=lambda index: soma_distances[index])
+
+        icomps = [None] * len(soma_distances)
+        active = []
+        next_interval = 0
+
+        for index in order:
+            soma_distance = soma_distances[index]
+
+            while next_interval < len(self.intervals) and \
+                    self.intervals[next_interval][0] <= soma_distance:
+                interval = self.intervals[next_interval]
+                heapq.heappush(active, (interval[1], next_interval))
+                next_interval += 1
+
+            while active and active[0][0] < soma_distance:
+                heapq.heappop(active)
+
+            icomps[index] = self._choose_segment(
+                soma_distance,
+                [self.intervals[position] for _, position in active])
+
+        return icomps
+
+
+def soma_distance_index(sim, icell, seclist_name):
+    """SomaDistanceIndex of a section list of an instantiated cell
+
+    The index is built only once, until the section index of the cell is
+    invalidated (see invalidate_section_index)
+    """
+
+    if not hasattr(icell, 'hname'):
+        return SomaDistanceIndex(sim, icell, seclist_name)
+
+    key = (icell.hname(), seclist_name)
+
+    index = _soma_distance_index.get(key)
+    if index is None:
+        index = SomaDistanceIndex(sim, icell, seclist_name)
+        _soma_distance_index[key] = index
+
+    return index
+
 
 class Location(BaseEPhys):
 
@@ -38,19 +276,6 @@ class Location(BaseEPhys):
 # TODO specify in document abrevation comp=compartment, sec=section, ...
 
 
-def _nth_isectionlist(isectionlist, index):
-    """Get nth element of isectionlist
-
-    Sectionlists don't support direct indexing
-    """
-    isection = next(
-        itertools.islice(
-            isectionlist,
-            index,
-            index + 1))
-    return isection
-
-
 class NrnSeclistCompLocation(Location, DictMixin):
 
     """Compartment in a sectionlist"""
@@ -86,15 +311,15 @@ class NrnSeclistCompLocation(Location, DictMixin):
 
     def instantiate(self, sim=None, icell=None):  # pylint: disable=W0613
         """Find the instantiate compartment"""
-        iseclist = getattr(icell, self.seclist_name)
+        isections = section_list(icell, self.seclist_name)
 
-        iseclist_size = len([x for x in iseclist])
+        iseclist_size = len(isections)
         if self.sec_index >= iseclist_size:
             raise Exception(
                 'NrnSeclistCompLocation: section index %d falls out of '
                 'SectionList size of %d' %
                 (self.sec_index, iseclist_size))
-        isection = _nth_isectionlist(iseclist, self.sec_index)
+        isection = isections[self.sec_index]
         icomp = isection(self.comp_x)
         return icomp
 
@@ -128,9 +353,9 @@ class NrnSeclistLocation(Location, DictMixin):
     def instantiate(self, sim=None, icell=None):  # pylint: disable=W0613
         """Find the instantiate compartment"""
 
-        isectionlist = getattr(icell, self.seclist_name)
+        isections = section_list(icell, self.seclist_name)
 
-        return (isection for isection in isectionlist)
+        return (isection for isection in isections)
 
     def __str__(self):
         """String representation"""
@@ -165,8 +390,7 @@ class NrnSeclistSecLocation(Location, DictMixin):
     def instantiate(self, sim=None, icell=None):  # pylint: disable=W0613
         """Find the instantiate compartment"""
 
-        isectionlist = getattr(icell, self.seclist_name)
-        isection = _nth_isectionlist(isectionlist, self.sec_index)
+        isection = section_list(icell, self.seclist_name)[self.sec_index]
         return isection
 
     def __str__(self):
@@ -200,37 +424,8 @@ class NrnSomaDistanceCompLocation(Location, DictMixin):
     def instantiate(self, sim=None, icell=None):
         """Find the instantiate compartment"""
 
-        soma = icell.soma[0]
-
-        sim.neuron.h.distance(0, 0.5, sec=soma)
-
-        iseclist = getattr(icell, self.seclist_name)
-
-        icomp = None
-        max_diam = 0.0
-
-        for isec in iseclist:
-            start_distance = sim.neuron.h.distance(1, 0.0, sec=isec)
-            end_distance = sim.neuron.h.distance(1, 1.0, sec=isec)
-
-            min_distance = min(start_distance, end_distance)
-            max_distance = max(start_distance, end_distance)
-
-            if min_distance <= self.soma_distance <= end_distance:
-                comp_x = float(self.soma_distance - min_distance) / \
-                    (max_distance - min_distance)
-
-                comp_diam = isec(comp_x).diam
-
-                if comp_diam > max_diam:
-                    icomp = isec(comp_x)
-
-        if icomp is None:
-            raise Exception(
-                'No comp found at %s distance from soma' %
-                self.soma_distance)
-
-        return icomp
+        return soma_distance_index(
+            sim, icell, self.seclist_name).segment(self.soma_distance)
 
     def __str__(self):
         """String representation"""
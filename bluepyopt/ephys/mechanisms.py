@@ -148,8 +148,7 @@ class NrnMODMechanism(Mechanism, DictMixin):
         """Calculate hash value of string in Python"""
 
         # Load hash function in hoc, only do this once
-        if not hasattr(sim.neuron.h, 'hash_str'):
-            sim.neuron.h(NrnMODMechanism.hash_hoc_string)
+        sim.define_hoc('hash_str', NrnMODMechanism.hash_hoc_string)
 
         return sim.neuron.h.hash_str(string)
 
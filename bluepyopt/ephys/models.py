@@ -30,11 +30,71 @@ import os
 import collections
 import string
 
+from bluepyopt.ephys import locations
 from bluepyopt.ephys import morphologies
+from bluepyopt.ephys import parameters
+from bluepyopt.ephys import parameterscalers
 
 import logging
 logger = logging.getLogger(__name__)
 
+# Instantiated cells that are kept in this process to be reused,
+# cell model name -> (fingerprint, icell, number of sections,
+#                     parameter name -> last applied (value, definition))
+_reusable_icells = {}
+
+# Names of the Neuron parameters that change the geometry of the sections
+_GEOMETRY_PARAM_NAMES = ('L', 'diam', 'nseg')
+
+
+def _param_definition(param):
+    """Definition of a parameter without its value
+
+    None if the definition is not known, i.e. if the parameter can't be
+    serialized
+    """
+
+    if not hasattr(param, 'to_dict'):
+        return None
+
+    definition = param.to_dict()
+    for field in ('value', 'frozen', 'bounds'):
+        definition.pop(field, None)
+
+    return repr(sorted(definition.items()))
+
+
+def _changes_geometry(param):
+    """Check if a parameter can change the geometry of the sections
+
+    Parameters of types other than global, section and range parameters
+    are assumed to change it
+    """
+
+    if isinstance(param, parameters.NrnGlobalParameter):
+        return False
+
+    if not isinstance(param, (parameters.NrnSectionParameter,
+                              parameters.NrnRangeParameter)):
+        return True
+
+    return param.param_name in _GEOMETRY_PARAM_NAMES
+
+
+def reused_section_count():
+    """Number of sections of the cells kept for reuse in this process"""
+
+    return sum(entry[2] for entry in _reusable_icells.values())
+
+
+def destroy_reused_instances(sim=None):
+    """Destroy the cells kept for reuse in this process"""
+
+    for _, icell, _, _ in _reusable_icells.values():
+        CellModel.destroy_icell(icell, sim=sim)
+
+    _reusable_icells.clear()
+
 
 class Model(object):
 
@@ -66,7 +126,9 @@ class CellModel(Model):
             morph=None,
             mechs=None,
             params=None,
-            gid=0):
+            gid=0,
+            reuse_instance=False,
+            check_param_diff=False):
         """Constructor
 
         Args:
@@ -79,6 +141,19 @@ class CellModel(Model):
                 Mechanisms associated with the cell
             params (list of Parameters):
                 Parameters of the cell model
+            reuse_instance (bool):
+                keep the instantiated cell in the simulator when the model is
+                destroyed. The next instantiation in the same process only
+                sets the parameter values, instead of loading the morphology
+                and inserting the mechanisms again. Cells with parameters
+                that change the geometry of the sections (e.g. L, diam or
+                nseg) are never reused, their parameters have to be applied
+                to the geometry of the morphology.
+            check_param_diff (bool):
+                when a cell is reused, only the parameters whose values
+                changed are applied. If check_param_diff is set, all the
+                parameters are applied afterwards, and an exception is
+                raised if the state of the cell differs.
         """
         super(CellModel, self).__init__(name)
         self.check_name()
@@ -94,6 +169,13 @@ class CellModel(Model):
 
         self.param_values = None
         self.gid = gid
+        self.reuse_instance = reuse_instance
+        self.check_param_diff = check_param_diff
+
+        # Parameters that are applied to the instantiated cell,
+        # parameter name -> (value, definition)
+        self.applied_params = None
+
         self.seclist_names = \
             ['all', 'somatic', 'basal', 'apical', 'axonal', 'myelinated']
         self.secarray_names = \
@@ -197,9 +279,129 @@ class CellModel(Model):
 
         return template_function()
 
+    def _instance_fingerprint(self):
+        """Identify the morphology and mechanisms of an instantiated cell"""
+
+        return (str(self.morphology),
+                tuple(str(mechanism) for mechanism in self.mechanisms))
+
+    def reset_mechanisms(self, sim=None):
+        """Instantiate the non-deterministic mechanisms again
+
+        This resets the seeds of their random number generators, as on a new
+        instantiation of the cell
+        """
+
+        for mechanism in self.mechanisms:
+            if not getattr(mechanism, 'deterministic', True):
+                mechanism.instantiate(sim=sim, icell=self.icell)
+
+    def param_states(self):
+        """Values and definitions of the parameters
+
+        Returns:
+            dict with parameter name -> (value, definition), the definition
+            contains e.g. the locations and scaler of the parameter
+        """
+
+        return dict(
+            (param_name, (param.value, _param_definition(param)))
+            for param_name, param in self.params.items())
+
+    def changed_params(self, applied_params):
+        """Parameters that have to be applied to a cell again
+
+        Args:
+            applied_params (dict): parameters that were applied last to the
+                cell, see param_states
+
+        Returns:
+            list with the parameters whose values or definitions differ from
+            the applied ones (or whose definitions are not known), and the
+            parameters that follow them and would have been overwritten by
+            them: the range and section parameters with the same name in
+            Neuron. Global parameters are always applied, other cells in the
+            process can change them.
+        """
+
+        param_states = self.param_states()
+
+        changed = []
+        overwritten_names = set()
+
+        for param_name, param in self.params.items():
+            if isinstance(param, parameters.NrnGlobalParameter):
+                changed.append(param)
+                continue
+
+            neuron_name = getattr(param, 'param_name', None)
+            if neuron_name in overwritten_names or \
+                    param_states[param_name][1] is None or \
+                    applied_params.get(param_name) != \
+                    param_states[param_name]:
+                changed.append(param)
+                overwritten_names.add(neuron_name)
+
+        return changed
+
+    def _reusable(self):
+        """Check if the instantiated cell can be kept for reuse"""
+
+        return self.reuse_instance and not any(
+            _changes_geometry(param) for param in self.params.values())
+
+    def _apply_params(self, params, sim=None):
+        """Apply parameters to the instantiated cell"""
+
+        for param in params:
+            param.instantiate(sim=sim, icell=self.icell)
+
+            if _changes_geometry(param):
+                # The geometry of the sections can have changed, the soma
+                # distances computed before can't be used anymore
+                parameterscalers.clear_distance_cache()
+                locations.invalidate_section_index(self.icell)
+
+        self.applied_params = self.param_states()
+
+    def _reinstantiate(self, applied_params, sim=None):
+        """Set the parameters of a reused cell"""
+
+        self.reset_mechanisms(sim=sim)
+
+        changed = self.changed_params(applied_params)
+        logger.debug(
+            'Applying %d of %d parameters to reused cell %s',
+            len(changed), len(self.params), self.name)
+        self._apply_params(changed, sim=sim)
+
+        if self.check_param_diff:
+            diff_snapshot = self.instance_snapshot(sim=sim)
+            self._apply_params(self.params.values(), sim=sim)
+            if diff_snapshot != self.instance_snapshot(sim=sim):
+                raise Exception(
+                    'CellModel: applying only the changed parameters %s to '
+                    'reused cell %s gives a different cell than applying '
+                    'all the parameters' %
+                    ([param.name for param in changed], self.name))
+
     def instantiate(self, sim=None):
         """Instantiate model in simulator"""
 
+        if self._reusable():
+            fingerprint, icell, _, applied_params = \
+                _reusable_icells.pop(self.name, (None, None, None, None))
+            if icell is not None:
+                if fingerprint == self._instance_fingerprint():
+                    logger.debug('Reusing instantiated cell %s', self.name)
+                    self.icell = icell
+                    self._reinstantiate(applied_params, sim=sim)
+                    return
+                self.destroy_icell(icell, sim=sim)
+
+        # The distances of the segments of a previous cell can't be reused
+        parameterscalers.clear_distance_cache()
+
         # TODO replace this with the real template name
         if not hasattr(sim.neuron.h, self.name):
             self.icell = self.create_empty_cell(
@@ -216,24 +418,48 @@ class CellModel(Model):
 
         for mechanism in self.mechanisms:
             mechanism.instantiate(sim=sim, icell=self.icell)
-        for param in self.params.values():
-            param.instantiate(sim=sim, icell=self.icell)
+        self._apply_params(self.params.values(), sim=sim)
 
-    def destroy(self, sim=None):  # pylint: disable=W0613
-        """Destroy instantiated model in simulator"""
+    @staticmethod
+    def destroy_icell(icell, sim=None):
+        """Destroy a cell instantiated in the simulator"""
+
+        locations.invalidate_section_index(icell)
 
         # Make sure the icell's destroy() method is called
         # without it a circular reference exists between CellRef and the object
         # this prevents the icells from being garbage collected, and
         # cell objects pile up in the simulator
-        self.icell.destroy()
+        icell.destroy()
 
         # The line below is some M. Hines magic
         # DON'T remove it, because it will make sure garbage collection
         # is called on the icell object
         sim.neuron.h.Vector().size()
 
+    def destroy(self, sim=None):  # pylint: disable=W0613
+        """Destroy instantiated model in simulator
+
+        If reuse_instance is set, the cell is kept in the simulator for the
+        next instantiation
+        """
+
+        if self._reusable() and self.name not in _reusable_icells:
+            _reusable_icells[self.name] = (
+                self._instance_fingerprint(),
+                self.icell,
+                sum(1 for _ in self.icell.all),
+                self.applied_params)
+            self.icell = None
+            self.applied_params = None
+            return
+
+        self.destroy_icell(self.icell, sim=sim)
+
         self.icell = None
+        self.applied_params = None
+
+        parameterscalers.clear_distance_cache()
 
         self.morphology.destroy(sim=sim)
         for mechanism in self.mechanisms:
@@ -241,6 +467,42 @@ class CellModel(Model):
         for param in self.params.values():
             param.destroy(sim=sim)
 
+    def instance_snapshot(self, sim=None):
+        """Snapshot of the state of the instantiated cell
+
+        Contains the geometry and inserted mechanisms of every section, and
+        the value of every parameter at every segment. Can be used to check
+        that a reused cell is identical to a freshly instantiated one.
+        """
+
+        param_names = sorted(set(
+            param.param_name for param in self.params.values()
+            if getattr(param, 'param_name', None) is not None))
+
+        snapshot = []
+        for section in self.icell.all:
+            segments = []
+            for segment in section:
+                segments.append((
+                    segment.x,
+                    segment.diam,
+                    sorted(mechanism.name() for mechanism in segment),
+                    [(param_name, getattr(segment, param_name))
+                     for param_name in param_names
+                     if hasattr(segment, param_name)]))
+            snapshot.append((
+                sim.neuron.h.secname(sec=section).split('.')[-1],
+                section.nseg,
+                section.L,
+                section.Ra,
+                segments))
+
+        global_values = [(param_name, getattr(sim.neuron.h, param_name))
+                         for param_name in param_names
+                         if hasattr(sim.neuron.h, param_name)]
+
+        return snapshot, global_values
+
     def check_nonfrozen_params(self, param_names):  # pylint: disable=W0613
         """Check if all nonfrozen params are set"""
 
@@ -368,11 +630,12 @@ class HocCellModel(CellModel):
         pass
 
     def instantiate(self, sim=None):
-        sim.neuron.h.load_file('stdrun.hoc')
+        sim.load_file('stdrun.hoc')
         template_name = load_hoc_template(sim, self.hoc_path)
         morph_path = self.morphology.morphology_path
         self.cell = getattr(sim.neuron.h, template_name)(0, morph_path)
         self.icell = self.cell.CellRef
+        locations.invalidate_section_index(self.icell)
 
     def destroy(self, sim=None):
         self.cell = None
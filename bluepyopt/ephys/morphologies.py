@@ -22,8 +22,15 @@ Copyright (c) 2016, EPFL/Blue Brain Project
 # pylint: disable=W0511
 
 import os
+import pickle
+import hashlib
 import platform
 import logging
+import collections
+
+import numpy
+
+from bluepyopt.ephys import locations
 from bluepyopt.ephys.base import BaseEPhys
 from bluepyopt.ephys.serializer import DictMixin
 
@@ -31,6 +38,156 @@ logger = logging.getLogger(__name__)
 
 # TODO define an addressing scheme
 
+# Section lists of a cell that are stored in parsed morphologies
+SECLIST_NAMES = ('all', 'somatic', 'basal', 'apical', 'axonal', 'myelinated')
+
+# Parsed morphologies of this process, (path, mtime) -> ParsedMorphology
+_parsed_morphologies = {}
+
+
+class ParsedMorphology(object):
+
+    """3D points and topology of a morphology loaded in a cell
+
+    Used to instantiate a morphology in a cell without parsing the file
+    again with Import3d
+    """
+
+    # Version of the on-disk format
+    VERSION = 1
+
+    def __init__(self, section_names, points, point_offsets, parents,
+                 seclists):
+        """Constructor
+
+        Args:
+            section_names (list of (str, int)): array name and index of every
+                section, in the order of the 'all' section list
+            points (numpy.ndarray): x, y, z and diam of the 3D points of all
+                the sections, shape (n_points, 4)
+            point_offsets (numpy.ndarray): index of the first point of every
+                section in points, followed by the total number of points
+            parents (list of (int, float, float)): for every section the index
+                of the parent section (-1 for root sections), the location
+                on the parent and the end of the section that is connected
+            seclists (dict of str -> list of int): indices of the sections in
+                every section list
+        """
+
+        self.section_names = section_names
+        self.points = points
+        self.point_offsets = point_offsets
+        self.parents = parents
+        self.seclists = seclists
+
+    @classmethod
+    def from_icell(cls, sim=None, icell=None):
+        """Read the morphology of an instantiated cell"""
+
+        h = sim.neuron.h
+
+        sections = list(icell.all)
+        section_indices = {}
+        section_names = []
+        for index, section in enumerate(sections):
+            secname = h.secname(sec=section).split('.')[-1]
+            array_name, array_index = secname.rstrip(']').split('[')
+            section_names.append((array_name, int(array_index)))
+            section_indices[secname] = index
+
+        points = []
+        point_offsets = [0]
+        parents = []
+        for section in sections:
+            for point in range(int(h.n3d(sec=section))):
+                points.append((h.x3d(point, sec=section),
+                               h.y3d(point, sec=section),
+                               h.z3d(point, sec=section),
+                               h.diam3d(point, sec=section)))
+            point_offsets.append(len(points))
+
+            section_ref = h.SectionRef(sec=section)
+            if section_ref.has_parent():
+                parent_name = h.secname(
+                    sec=section_ref.parent).split('.')[-1]
+                parents.append((section_indices[parent_name],
+                                h.parent_connection(sec=section),
+                                h.section_orientation(sec=section)))
+            else:
+                parents.append((-1, 0.0, 0.0))
+
+        seclists = {}
+        for seclist_name in SECLIST_NAMES:
+            if hasattr(icell, seclist_name):
+                seclists[seclist_name] = [
+                    section_indices[h.secname(sec=section).split('.')[-1]]
+                    for section in getattr(icell, seclist_name)]
+
+        return cls(section_names,
+                   numpy.array(points, dtype=numpy.float64).reshape(-1, 4),
+                   numpy.array(point_offsets, dtype=numpy.int64),
+                   parents,
+                   seclists)
+
+    def instantiate(self, sim=None, icell=None):
+        """Create the sections of the morphology in a cell"""
+
+        h = sim.neuron.h
+
+        array_sizes = collections.OrderedDict()
+        for array_name, array_index in self.section_names:
+            array_sizes[array_name] = max(
+                array_sizes.get(array_name, 0), array_index + 1)
+
+        for array_name, array_size in array_sizes.items():
+            h.execute('create %s[%d]' % (array_name, array_size), icell)
+
+        sections = [getattr(icell, array_name)[array_index]
+                    for array_name, array_index in self.section_names]
+
+        for index, section in enumerate(sections):
+            h.pt3dclear(sec=section)
+            for x, y, z, diam in self.points[
+                    self.point_offsets[index]:self.point_offsets[index + 1]]:
+                h.pt3dadd(x, y, z, diam, sec=section)
+
+        for section, (parent_index, parent_x, child_x) in zip(
+                sections, self.parents):
+            if parent_index >= 0:
+                section.connect(sections[parent_index], parent_x, child_x)
+
+        for seclist_name, indices in self.seclists.items():
+            seclist = getattr(icell, seclist_name)
+            for index in indices:
+                seclist.append(sec=sections[index])
+
+    def save(self, filename):
+        """Write to a binary file"""
+
+        tmp_filename = '%s.tmp%d' % (filename, os.getpid())
+        with open(tmp_filename, 'wb') as cache_file:
+            pickle.dump(
+                (self.VERSION, self.section_names, self.points,
+                 self.point_offsets, self.parents, self.seclists),
+                cache_file,
+                protocol=pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_filename, filename)
+
+    @classmethod
+    def load(cls, filename):
+        """Read from a binary file, returns None if the file is invalid"""
+
+        try:
+            with open(filename, 'rb') as cache_file:
+                content = pickle.load(cache_file)
+        except Exception:  # pylint: disable=W0703
+            return None
+
+        if content[0] != cls.VERSION:
+            return None
+
+        return cls(*content[1:])
+
 
 class Morphology(BaseEPhys):
 
@@ -41,14 +198,17 @@ class Morphology(BaseEPhys):
 class NrnFileMorphology(Morphology, DictMixin):
 
     """Morphology loaded from a file"""
-    SERIALIZED_FIELDS = ('morphology_path', 'do_replace_axon', 'do_set_nseg')
+    SERIALIZED_FIELDS = ('morphology_path', 'do_replace_axon', 'do_set_nseg',
+                         'use_cache', 'cache_dir')
 
     def __init__(
             self,
             morphology_path,
             do_replace_axon=False,
             do_set_nseg=True,
-            comment=''):
+            comment='',
+            use_cache=True,
+            cache_dir=None):
         """Constructor
 
         Args:
@@ -56,20 +216,67 @@ class NrnFileMorphology(Morphology, DictMixin):
                 morphology
             do_replace_axon(bool): Does the axon need to be replaced by an AIS
                 stub ?
+            use_cache(bool): keep the parsed morphology in memory, so that
+                later instantiations in the same process don't parse the
+                file again
+            cache_dir(str): directory in which the parsed morphology is
+                stored, so that it can be loaded by new processes without
+                parsing the file (None means no on-disk cache)
         """
         name = os.path.basename(morphology_path)
         super(NrnFileMorphology, self).__init__(name=name, comment=comment)
-        # TODO speed up loading of morphologies from files
         # Path to morphology
         self.morphology_path = morphology_path
         self.do_replace_axon = do_replace_axon
         self.do_set_nseg = do_set_nseg
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
 
     def __str__(self):
         """Return string representation"""
 
         return self.morphology_path
 
+    def _cache_key(self):
+        """Key of the morphology file in the caches"""
+
+        path = os.path.abspath(self.morphology_path)
+        return path, os.path.getmtime(path)
+
+    def _cache_filename(self, cache_key):
+        """Path of the on-disk cache file"""
+
+        return os.path.join(
+            self.cache_dir,
+            '%s.%s.morphcache' % (
+                os.path.basename(self.morphology_path),
+                hashlib.md5(repr(cache_key)).hexdigest()))
+
+    def _get_parsed(self, cache_key):
+        """Find the parsed morphology in the caches"""
+
+        parsed = _parsed_morphologies.get(cache_key)
+        if parsed is None and self.cache_dir is not None:
+            parsed = ParsedMorphology.load(self._cache_filename(cache_key))
+            if parsed is not None:
+                _parsed_morphologies[cache_key] = parsed
+
+        return parsed
+
+    def _put_parsed(self, cache_key, sim=None, icell=None):
+        """Store the morphology loaded in icell in the caches"""
+
+        parsed = ParsedMorphology.from_icell(sim=sim, icell=icell)
+        _parsed_morphologies[cache_key] = parsed
+
+        if self.cache_dir is not None:
+            try:
+                parsed.save(self._cache_filename(cache_key))
+            except (IOError, OSError) as e:
+                logger.warning(
+                    'Could not write morphology cache for %s: %s',
+                    self.morphology_path, e)
+
     def instantiate(self, sim=None, icell=None):
         """Load morphology"""
 
@@ -80,11 +287,50 @@ class NrnFileMorphology(Morphology, DictMixin):
                 'Morphology not found at \'%s\'' %
                 self.morphology_path)
 
-        sim.neuron.h.load_file('stdrun.hoc')
-        sim.neuron.h.load_file('import3d.hoc')
+        sim.load_file('stdrun.hoc')
+        sim.load_file('import3d.hoc')
 
         extension = self.morphology_path.split('.')[-1]
 
+        if extension.lower() not in ['swc', 'asc']:
+            raise ValueError("Unknown filetype: %s" % extension)
+
+        if icell is not None:
+            locations.invalidate_section_index(icell)
+
+        # The parsed morphology can only be read from / copied into a cell
+        use_cache = self.use_cache and icell is not None
+
+        parsed = None
+        if use_cache:
+            cache_key = self._cache_key()
+            parsed = self._get_parsed(cache_key)
+
+        if parsed is not None:
+            parsed.instantiate(sim=sim, icell=icell)
+        else:
+            self._import(sim=sim, icell=icell, extension=extension)
+            if use_cache:
+                self._put_parsed(cache_key, sim=sim, icell=icell)
+
+        # TODO Set nseg should be called after all the parameters have been
+        # set
+        # (in case e.g. Ra was changed)
+        if self.do_set_nseg:
+            self.set_nseg(icell)
+
+        # TODO replace these two functions with general function users can
+        # specify
+        if self.do_replace_axon:
+            self.replace_axon(sim=sim, icell=icell)
+
+            # The section lists have changed, the sections indexed for the
+            # locations can't be used anymore
+            locations.invalidate_section_index(icell)
+
+    def _import(self, sim=None, icell=None, extension=None):
+        """Load morphology file with Import3d"""
+
         if extension.lower() == 'swc':
             imorphology = sim.neuron.h.Import3d_SWC_read()
         elif extension.lower() == 'asc':
@@ -108,17 +354,6 @@ class NrnFileMorphology(Morphology, DictMixin):
 
         morphology_importer.instantiate(icell)
 
-        # TODO Set nseg should be called after all the parameters have been
-        # set
-        # (in case e.g. Ra was changed)
-        if self.do_set_nseg:
-            self.set_nseg(icell)
-
-        # TODO replace these two functions with general function users can
-        # specify
-        if self.do_replace_axon:
-            self.replace_axon(sim=sim, icell=icell)
-
     def destroy(self, sim=None):
         """Destroy morphology instantiation"""
         pass
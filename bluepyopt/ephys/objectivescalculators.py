@@ -35,11 +35,34 @@ class ObjectivesCalculator(object):
 
         self.objectives = objectives
 
-    def calculate_scores(self, responses):
-        """Calculator the score for every objective"""
+    def calculate_scores(self, responses, timings=None,
+                         objective_names=None):
+        """Calculator the score for every objective
 
-        return {objective.name: objective.calculate_score(responses)
-                for objective in self.objectives}
+        Args:
+            responses (dict): responses of the protocols
+            timings (ephys.timings.EvaluationTimings): if given, the time
+                spent scoring every objective is added to it
+            objective_names (list of str): if given, only the scores of the
+                objectives with these names are calculated
+        """
+
+        if objective_names is None:
+            objectives = self.objectives
+        else:
+            objectives = [objective for objective in self.objectives
+                          if objective.name in objective_names]
+
+        if timings is None:
+            return {objective.name: objective.calculate_score(responses)
+                    for objective in objectives}
+
+        scores = {}
+        for objective in objectives:
+            with timings.timer(objective.name, 'scoring'):
+                scores[objective.name] = objective.calculate_score(responses)
+
+        return scores
 
     def __str__(self):
         return 'objectives:\n  %s' % '\n  '.join(
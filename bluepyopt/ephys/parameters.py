@@ -98,7 +98,7 @@ class NrnGlobalParameter(NrnParameter, DictMixin):
     def instantiate(self, sim=None, icell=None):
         """Instantiate"""
 
-        setattr(sim.neuron.h, self.param_name, self.value)
+        sim.set_global(self.param_name, self.value)
 
         logger.debug('Set %s to %s', self.param_name, str(self.value))
 
@@ -235,11 +235,18 @@ class NrnRangeParameter(NrnParameter, DictMixin):
                 'NrnRangeParameter: impossible to instantiate parameter "%s" '
                 'without value' % self.name)
 
+        # Scalers that only implement scale are called for every segment
+        scale_section = getattr(self.value_scaler, 'scale_section', None)
+
         for location in self.locations:
             for isection in location.instantiate(sim=sim, icell=icell):
-                for seg in isection:
-                    setattr(seg, '%s' % self.param_name,
-                            self.value_scale_func(self.value, seg, sim=sim))
+                if scale_section is None:
+                    values = [self.value_scale_func(self.value, seg, sim=sim)
+                              for seg in isection]
+                else:
+                    values = scale_section(self.value, isection, sim=sim)
+                for seg, value in zip(isection, values):
+                    setattr(seg, '%s' % self.param_name, value)
         logger.debug(
             'Set %s in %s to %s with scaler %s', self.param_name,
             [str(location)
@@ -21,21 +21,65 @@ Copyright (c) 2016, EPFL/Blue Brain Project
 
 # pylint: disable=W0511
 
+import math
+
+from bluepyopt.ephys import distributions
 from bluepyopt.ephys.base import BaseEPhys
 from bluepyopt.ephys.serializer import DictMixin
 
 
-FLOAT_FORMAT = '%.17g'
+FLOAT_FORMAT = distributions.FLOAT_FORMAT
+
+# Distances from the soma of the segments of instantiated sections,
+# section name -> list of distances (um)
+_soma_distances = {}
 
 
 def format_float(value):
     return FLOAT_FORMAT % value
 
 
+def clear_distance_cache():
+    """Remove the distances of the segments of instantiated sections"""
+
+    _soma_distances.clear()
+
+
+def section_soma_distances(section, sim=None):
+    """Distances from the soma of the segments of a section
+
+    The distances are computed only once for every section, until
+    clear_distance_cache is called (e.g. when the cell is destroyed)
+    """
+
+    section_name = sim.neuron.h.secname(sec=section)
+
+    distances = _soma_distances.get(section_name)
+    if distances is None:
+        soma = section.cell().soma[0]
+
+        # Initialise origin
+        sim.neuron.h.distance(0, 0.5, sec=soma)
+
+        distances = [sim.neuron.h.distance(1, segment.x, sec=section)
+                     for segment in section]
+        _soma_distances[section_name] = distances
+
+    return distances
+
+
 class ParameterScaler(BaseEPhys):
 
     """Parameter scalers"""
-    pass
+
+    def scale_section(self, value, section, sim=None):
+        """Scale a value for all the segments of a section
+
+        Returns:
+            list with the scaled value of every segment
+        """
+
+        return [self.scale(value, segment, sim=sim) for segment in section]
 
 # TODO get rid of the 'segment' here
 
@@ -79,6 +123,10 @@ class NrnSegmentSomaDistanceScaler(ParameterScaler, DictMixin):
     """Scaler based on distance from soma"""
     SERIALIZED_FIELDS = ('name', 'comment', 'distribution', )
 
+    # Subclasses that override scale set this to False, their scale is then
+    # called for every segment by scale_section
+    USE_DISTANCE_TABLE = True
+
     def __init__(
             self,
             name=None,
@@ -109,8 +157,25 @@ class NrnSegmentSomaDistanceScaler(ParameterScaler, DictMixin):
 
         distance = sim.neuron.h.distance(1, segment.x, sec=segment.sec)
 
-        # Find something to generalise this
-        import math  # pylint:disable=W0611 #NOQA
+        return self.scale_distances(value, [distance])[0]
+
+    def scale_section(self, value, section, sim=None):
+        """Scale a value for all the segments of a section
+
+        The distances of the segments are taken from the table of soma
+        distances of the instantiated cell (see section_soma_distances),
+        unless USE_DISTANCE_TABLE is False
+        """
+
+        if not self.USE_DISTANCE_TABLE:
+            return super(NrnSegmentSomaDistanceScaler, self).scale_section(
+                value, section, sim=sim)
+
+        return self.scale_distances(
+            value, section_soma_distances(section, sim=sim))
+
+    def _eval_formatted(self, value, distance):
+        """Evaluate the distribution with the values formatted in it"""
 
         # This eval is unsafe (but is it ever dangerous ?)
         # pylint: disable=W0123
@@ -118,6 +183,50 @@ class NrnSegmentSomaDistanceScaler(ParameterScaler, DictMixin):
                                         value=format_float(value))
         return eval(dist)
 
+    def scale_distances(self, value, distances):
+        """Scale a value for segments at distances from the soma
+
+        Distributions in the subset supported by ephys.distributions are
+        compiled once and evaluated without eval, other distributions are
+        formatted and evaluated for every distance.
+
+        Args:
+            value (float): parameter value
+            distances (list of floats): distances from the soma (um)
+
+        Returns:
+            list of scaled values
+        """
+
+        value = float(value)
+        distances = [float(distance) for distance in distances]
+
+        # Formatting a negative number in the expression can give another
+        # result than using it as a variable (e.g. -2**2), and nan or inf
+        # can't be formatted in an expression
+        if any(number < 0 or math.isnan(number) or math.isinf(number)
+               for number in [value] + distances):
+            return [self._eval_formatted(value, distance)
+                    for distance in distances]
+
+        try:
+            compiled = distributions.compile_distribution(self.distribution)
+        except distributions.UnsupportedExpressionError:
+            return [self._eval_formatted(value, distance)
+                    for distance in distances]
+
+        # Integers behave differently from floats (e.g. division), so only
+        # values with a fractional part are evaluated as an array
+        if not any(number.is_integer() for number in [value] + distances):
+            try:
+                return [float(scaled) for scaled
+                        in compiled.evaluate_array(distances, value)]
+            except ArithmeticError:
+                # Floating point errors are raised as for floats below
+                pass
+
+        return [compiled.evaluate(distance, value) for distance in distances]
+
     def __str__(self):
         """String representation"""
 
@@ -21,13 +21,26 @@ Copyright (c) 2016, EPFL/Blue Brain Project
 
 # pylint: disable=W0511
 
+import copy
+import time
+import contextlib
 import collections
 
+from . import workers
+from . import parameters as ephys_parameters
+from . import timings as timings_module
+
 # TODO: maybe find a better name ? -> sweep ?
 import logging
 logger = logging.getLogger(__name__)
 
 
+@contextlib.contextmanager
+def _no_timer(_scope, _phase):
+    """Context manager used when no timings are recorded"""
+    yield
+
+
 class Protocol(object):
 
     """Class representing a protocol (stimulus and recording)."""
@@ -57,18 +70,30 @@ class SequenceProtocol(Protocol):
         super(SequenceProtocol, self).__init__(name)
         self.protocols = protocols
 
-    def run(self, cell_model, param_values, sim=None, isolate=None):
-        """Instantiate protocol"""
+    def run(self, cell_model, param_values, sim=None, isolate=None,
+            timings=None, timeout=None):
+        """Instantiate protocol
+
+        Args:
+            timeout (float): wall clock time limit (s) of all the
+                subprotocols together, see SweepProtocol.run
+        """
 
         responses = collections.OrderedDict({})
 
+        deadline = time.time() + timeout if timeout is not None else None
+
         for protocol in self.protocols:
+            kwargs = {'timings': timings} if timings is not None else {}
+            if deadline is not None:
+                kwargs['timeout'] = max(deadline - time.time(), 0.0)
             responses.update(
                 protocol.run(
                     cell_model=cell_model,
                     param_values=param_values,
                     sim=sim,
-                    isolate=isolate))
+                    isolate=isolate,
+                    **kwargs))
 
         return responses
 
@@ -92,7 +117,8 @@ class SweepProtocol(Protocol):
             name=None,
             stimuli=None,
             recordings=None,
-            cvode_active=None):
+            cvode_active=None,
+            termination_criteria=None):
         """Constructor
 
         Args:
@@ -101,12 +127,18 @@ class SweepProtocol(Protocol):
             recordings (list of Recordings): Recording objects used in the
                 protocol
             cvode_active (bool): whether to use variable time step
+            termination_criteria (list of TerminationCriteria): criteria
+                that abort the simulation when they are met, all the
+                responses of the protocol are then None (which gives the
+                features of the protocol the failure score)
         """
 
         super(SweepProtocol, self).__init__(name)
         self.stimuli = stimuli
         self.recordings = recordings
         self.cvode_active = cvode_active
+        self.termination_criteria = termination_criteria \
+            if termination_criteria is not None else []
 
     @property
     def total_duration(self):
@@ -119,35 +151,87 @@ class SweepProtocol(Protocol):
 
         return collections.OrderedDict({self.name: self})
 
-    def _run_func(self, cell_model, param_values, sim=None):
-        """Run protocols"""
+    def run_on_cell(self, cell_model, param_values, sim=None, timer=None):
+        """Run the protocol on a cell model that is already instantiated
 
-        try:
-            cell_model.freeze(param_values)
-            cell_model.instantiate(sim=sim)
+        Args:
+            timer: function returning a context manager that records the
+                time spent in it, with a scope and phase as arguments (e.g.
+                EvaluationTimings.timer)
+        """
 
+        if timer is None:
+            timer = _no_timer
+
+        with timer(self.name, 'protocol_instantiation'):
             self.instantiate(sim=sim, icell=cell_model.icell)
 
-            try:
-                sim.run(self.total_duration, cvode_active=self.cvode_active)
-            except RuntimeError:
+        try:
+            with timer(self.name, 'simulation'):
+                terminated_by = None
+                if self.termination_criteria:
+                    terminated_by = sim.run(
+                        self.total_duration,
+                        cvode_active=self.cvode_active,
+                        termination_criteria=self.termination_criteria)
+                else:
+                    sim.run(
+                        self.total_duration,
+                        cvode_active=self.cvode_active)
+        except RuntimeError:
+            logger.debug(
+                'SweepProtocol: Running of parameter set {%s} generated '
+                'RuntimeError, returning None in responses',
+                str(param_values))
+            responses = {recording.name:
+                         None for recording in self.recordings}
+        else:
+            if terminated_by is not None:
                 logger.debug(
-                    'SweepProtocol: Running of parameter set {%s} generated '
-                    'RuntimeError, returning None in responses',
-                    str(param_values))
+                    'SweepProtocol: Running of parameter set {%s} was '
+                    'terminated by %s, returning None in responses',
+                    str(param_values), terminated_by.name)
                 responses = {recording.name:
                              None for recording in self.recordings}
             else:
-                responses = {
-                    recording.name: recording.response
-                    for recording in self.recordings}
+                with timer(self.name, 'response_conversion'):
+                    responses = {
+                        recording.name: recording.response
+                        for recording in self.recordings}
 
+        with timer(self.name, 'protocol_destruction'):
             self.destroy(sim=sim)
 
-            cell_model.destroy(sim=sim)
+        return responses
 
-            cell_model.unfreeze(param_values.keys())
+    def _run_func(self, cell_model, param_values, sim=None, timings=None):
+        """Run protocols
+
+        If an EvaluationTimings object is passed, the time spent in the
+        different phases of the protocol is recorded in it, and a tuple
+        (responses, timings) is returned
+        """
+
+        if timings is not None:
+            timer = timings.timer
+        else:
+            timer = _no_timer
 
+        try:
+            with timer(self.name, 'cell_instantiation'):
+                cell_model.freeze(param_values)
+                cell_model.instantiate(sim=sim)
+
+            responses = self.run_on_cell(
+                cell_model, param_values, sim=sim, timer=timer)
+
+            with timer(self.name, 'cell_destruction'):
+                cell_model.destroy(sim=sim)
+
+                cell_model.unfreeze(param_values.keys())
+
+            if timings is not None:
+                return responses, timings
             return responses
         except:
             import sys
@@ -156,39 +240,41 @@ class SweepProtocol(Protocol):
                 "".join(
                     traceback.format_exception(*sys.exc_info())))
 
-    def run(self, cell_model, param_values, sim=None, isolate=None):
-        """Instantiate protocol"""
-
-        if isolate is None:
-            isolate = True
-
-        if isolate:
-            def _reduce_method(meth):
-                """Overwrite reduce"""
-                return (getattr, (meth.__self__, meth.__func__.__name__))
-
-            import copy_reg
-            import types
-            copy_reg.pickle(types.MethodType, _reduce_method)
+    def run(self, cell_model, param_values, sim=None, isolate=None,
+            timings=None, timeout=None):
+        """Instantiate protocol
 
-            import multiprocessing
-
-            pool = multiprocessing.Pool(1, maxtasksperchild=1)
-            responses = pool.apply(
-                self._run_func,
-                kwds={
-                    'cell_model': cell_model,
-                    'param_values': param_values,
-                    'sim': sim})
+        Args:
+            isolate (bool or PersistentWorker): if True, run the simulation in
+                a new subprocess, if a PersistentWorker object is passed, run
+                the simulation in that (long-lived) worker process
+            timings (ephys.timings.EvaluationTimings): if given, the time
+                spent in cell instantiation, stimulus/recording setup,
+                simulation and response conversion is added to it, with the
+                name of this protocol as scope
+            timeout (float): wall clock time limit (s), when it is exceeded
+                the subprocess is killed and ephys.workers.EvaluationTimeout
+                is raised (requires isolate)
+        """
 
-            pool.terminate()
-            pool.join()
-            del pool
-        else:
-            responses = self._run_func(
-                cell_model=cell_model,
-                param_values=param_values,
-                sim=sim)
+        # The timings are recorded in a new object, so that they can be sent
+        # back from the subprocess
+        run_timings = timings_module.EvaluationTimings() \
+            if timings is not None else None
+
+        responses = workers.apply_isolated(
+            self._run_func,
+            kwds={
+                'cell_model': cell_model,
+                'param_values': param_values,
+                'sim': sim,
+                'timings': run_timings},
+            isolate=isolate,
+            timeout=timeout)
+
+        if timings is not None:
+            responses, run_timings = responses
+            timings.update(run_timings)
 
         return responses
 
@@ -201,6 +287,9 @@ class SweepProtocol(Protocol):
         for recording in self.recordings:
             recording.instantiate(sim=sim, icell=icell)
 
+        for criterion in self.termination_criteria:
+            criterion.instantiate(sim=sim, icell=icell)
+
     def destroy(self, sim=None):
         """Destroy protocol"""
 
@@ -210,6 +299,9 @@ class SweepProtocol(Protocol):
         for recording in self.recordings:
             recording.destroy(sim=sim)
 
+        for criterion in self.termination_criteria:
+            criterion.destroy(sim=sim)
+
     def __str__(self):
         """String representation"""
 
@@ -223,9 +315,280 @@ class SweepProtocol(Protocol):
         for recording in self.recordings:
             content += '    %s\n' % str(recording)
 
+        if self.termination_criteria:
+            content += '  termination criteria:\n'
+            for criterion in self.termination_criteria:
+                content += '    %s\n' % str(criterion)
+
         return content
 
 
+def _leaf_protocols(protocols):
+    """Expand the SequenceProtocols in a list of protocols"""
+
+    leaves = []
+    for protocol in protocols:
+        if isinstance(protocol, SequenceProtocol):
+            leaves.extend(_leaf_protocols(protocol.protocols))
+        else:
+            leaves.append(protocol)
+
+    return leaves
+
+
+def _run_on_shared_cell_func(protocols, cell_model, param_values, sim=None,
+                             timings=None):
+    """Run protocols one after the other on a single cell instantiation"""
+
+    if timings is not None:
+        timer = timings.timer
+    else:
+        timer = _no_timer
+
+    try:
+        with timer(cell_model.name, 'cell_instantiation'):
+            cell_model.freeze(param_values)
+            cell_model.instantiate(sim=sim)
+
+        responses = {}
+        for index, protocol in enumerate(protocols):
+            if index > 0:
+                # Give every protocol the same random streams as it would
+                # get on a new instantiation of the cell
+                cell_model.reset_mechanisms(sim=sim)
+
+            responses.update(protocol.run_on_cell(
+                cell_model, param_values, sim=sim, timer=timer))
+
+        with timer(cell_model.name, 'cell_destruction'):
+            cell_model.destroy(sim=sim)
+
+            cell_model.unfreeze(param_values.keys())
+
+        if timings is not None:
+            return responses, timings
+        return responses
+    except:
+        import sys
+        import traceback
+        raise Exception(
+            "".join(
+                traceback.format_exception(*sys.exc_info())))
+
+
+def run_on_shared_cell(protocols, cell_model, param_values, sim=None,
+                       isolate=None, timings=None, timeout=None):
+    """Run protocols on a single instantiation of the cell model
+
+    The cell is instantiated once, after which the stimuli and recordings of
+    every protocol are instantiated on it, the simulation is run (which
+    reinitialises the state of the cell) and the stimuli and recordings are
+    removed again.
+
+    Args:
+        protocols (list of Protocols): SweepProtocols, or SequenceProtocols
+            consisting of SweepProtocols
+        isolate (bool or PersistentWorker): see SweepProtocol.run, all the
+            protocols are run in the same subprocess
+        timings (ephys.timings.EvaluationTimings): see SweepProtocol.run,
+            the instantiation of the cell is recorded with the name of the
+            cell model as scope
+        timeout (float): see SweepProtocol.run, limit of all the protocols
+            together
+    """
+
+    protocols = _leaf_protocols(protocols)
+    for protocol in protocols:
+        if not isinstance(protocol, SweepProtocol):
+            raise TypeError(
+                'run_on_shared_cell: protocol %s is not a SweepProtocol' %
+                protocol.name)
+
+    run_timings = timings_module.EvaluationTimings() \
+        if timings is not None else None
+
+    responses = workers.apply_isolated(
+        _run_on_shared_cell_func,
+        kwds={
+            'protocols': protocols,
+            'cell_model': cell_model,
+            'param_values': param_values,
+            'sim': sim,
+            'timings': run_timings},
+        isolate=isolate,
+        timeout=timeout)
+
+    if timings is not None:
+        responses, run_timings = responses
+        timings.update(run_timings)
+
+    return responses
+
+
+def _run_packed_func(protocols, cell_model, param_values_list, sim=None,
+                     timings=None):
+    """Run protocols on copies of the cell that are simulated together"""
+
+    if timings is not None:
+        timer = timings.timer
+    else:
+        timer = _no_timer
+
+    try:
+        base_gid = cell_model.gid
+
+        icells = []
+        with timer(cell_model.name, 'cell_instantiation'):
+            for index, param_values in enumerate(param_values_list):
+                cell_model.gid = base_gid + index
+                cell_model.freeze(param_values)
+                cell_model.instantiate(sim=sim)
+                icells.append(cell_model.icell)
+                cell_model.unfreeze(param_values.keys())
+            cell_model.gid = base_gid
+
+        responses_list = [{} for _ in param_values_list]
+        for protocol_index, protocol in enumerate(protocols):
+            # Every copy of the cell gets its own stimuli and recordings
+            protocol_copies = [copy.deepcopy(protocol) for _ in icells]
+
+            with timer(protocol.name, 'protocol_instantiation'):
+                for protocol_copy, icell in zip(protocol_copies, icells):
+                    if protocol_index > 0:
+                        cell_model.icell = icell
+                        cell_model.reset_mechanisms(sim=sim)
+                    protocol_copy.instantiate(sim=sim, icell=icell)
+
+            try:
+                with timer(protocol.name, 'simulation'):
+                    sim.run(protocol.total_duration,
+                            cvode_active=protocol.cvode_active)
+            except RuntimeError:
+                logger.debug(
+                    'Packed run of protocol %s generated RuntimeError, '
+                    'returning None in responses', protocol.name)
+                for responses in responses_list:
+                    responses.update({recording.name: None
+                                      for recording in protocol.recordings})
+            else:
+                with timer(protocol.name, 'response_conversion'):
+                    for responses, protocol_copy in zip(
+                            responses_list, protocol_copies):
+                        responses.update({
+                            recording.name: recording.response
+                            for recording in protocol_copy.recordings})
+
+            with timer(protocol.name, 'protocol_destruction'):
+                for protocol_copy in protocol_copies:
+                    protocol_copy.destroy(sim=sim)
+
+        with timer(cell_model.name, 'cell_destruction'):
+            for icell in icells:
+                cell_model.icell = icell
+                cell_model.destroy(sim=sim)
+
+        if timings is not None:
+            return responses_list, timings
+        return responses_list
+    except:
+        import sys
+        import traceback
+        raise Exception(
+            "".join(
+                traceback.format_exception(*sys.exc_info())))
+
+
+def check_packable(protocols, cell_model):
+    """Check that protocols can be run on packed copies of a cell model
+
+    Raises:
+        TypeError if a protocol is not a SweepProtocol or a SequenceProtocol
+        of SweepProtocols
+        ValueError if a protocol has termination criteria (they would stop
+        the simulation of all the copies), or if the cell model reuses its
+        instance (only one instance can be kept)
+    """
+
+    for protocol in _leaf_protocols(protocols):
+        if not isinstance(protocol, SweepProtocol):
+            raise TypeError(
+                'run_packed: protocol %s is not a SweepProtocol' %
+                protocol.name)
+        if protocol.termination_criteria:
+            raise ValueError(
+                'run_packed: protocol %s has termination criteria, they '
+                'can not be used with packed copies of a cell' %
+                protocol.name)
+
+    if getattr(cell_model, 'reuse_instance', False):
+        raise ValueError(
+            'run_packed: cell model %s reuses its instance, this can not be '
+            'used with packed copies of a cell' % cell_model.name)
+
+
+def run_packed(protocols, cell_model, param_values_list, sim=None,
+               isolate=None, timings=None, timeout=None):
+    """Evaluate several parameter sets in a single simulation
+
+    A copy of the cell is instantiated for every parameter set, with gids
+    cell_model.gid, cell_model.gid + 1, ... For every protocol, the stimuli
+    and recordings are instantiated on all the copies, which are then
+    simulated together in a single run.
+
+    With cvode the copies share the variable time step, so the responses
+    can differ slightly from the ones of separate simulations. The protocols
+    can't have termination criteria, the cell model can't reuse its
+    instance (see check_packable), and parameters set in the global
+    namespace of Neuron need to be the same for all parameter sets.
+
+    Args:
+        protocols (list of Protocols): SweepProtocols, or SequenceProtocols
+            consisting of SweepProtocols
+        param_values_list (list of dicts): parameter sets to evaluate
+        isolate (bool or PersistentWorker): see SweepProtocol.run, all the
+            protocols are run in the same subprocess
+        timings (ephys.timings.EvaluationTimings): see SweepProtocol.run
+        timeout (float): see SweepProtocol.run, limit of the packed run of
+            all the protocols
+
+    Returns:
+        List with the responses of every parameter set
+    """
+
+    check_packable(protocols, cell_model)
+    protocols = _leaf_protocols(protocols)
+
+    for param_name, param in cell_model.params.items():
+        if isinstance(param, ephys_parameters.NrnGlobalParameter):
+            values = set(param_values[param_name]
+                         for param_values in param_values_list
+                         if param_name in param_values)
+            if len(values) > 1:
+                raise ValueError(
+                    'run_packed: global parameter %s has different values '
+                    'in the packed parameter sets' % param_name)
+
+    run_timings = timings_module.EvaluationTimings() \
+        if timings is not None else None
+
+    responses_list = workers.apply_isolated(
+        _run_packed_func,
+        kwds={
+            'protocols': protocols,
+            'cell_model': cell_model,
+            'param_values_list': param_values_list,
+            'sim': sim,
+            'timings': run_timings},
+        isolate=isolate,
+        timeout=timeout)
+
+    if timings is not None:
+        responses_list, run_timings = responses_list
+        timings.update(run_timings)
+
+    return responses_list
+
+
 class StepProtocol(SweepProtocol):
 
     """Protocol consisting of step and holding current"""
@@ -236,7 +599,8 @@ class StepProtocol(SweepProtocol):
             step_stimulus=None,
             holding_stimulus=None,
             recordings=None,
-            cvode_active=None):
+            cvode_active=None,
+            termination_criteria=None):
         """Constructor
 
         Args:
@@ -245,6 +609,8 @@ class StepProtocol(SweepProtocol):
             recordings (list of Recordings): Recording objects used in the
                 protocol
             cvode_active (bool): whether to use variable time step
+            termination_criteria (list of TerminationCriteria): see
+                SweepProtocol
         """
 
         super(StepProtocol, self).__init__(
@@ -254,7 +620,8 @@ class StepProtocol(SweepProtocol):
                 holding_stimulus]
             if holding_stimulus is not None else [step_stimulus],
             recordings=recordings,
-            cvode_active=cvode_active)
+            cvode_active=cvode_active,
+            termination_criteria=termination_criteria)
 
         self.step_stimulus = step_stimulus
         self.holding_stimulus = holding_stimulus
@@ -22,11 +22,23 @@ Copyright (c) 2016, EPFL/Blue Brain Project
 
 import logging
 
+import numpy
+
 from . import responses
 
 logger = logging.getLogger(__name__)
 
 
+def _vector_as_array(vector):
+    """NumPy array backed by the buffer of a Neuron Vector"""
+
+    try:
+        return vector.as_numpy()
+    except AttributeError:
+        # Versions of Neuron without as_numpy
+        return numpy.array(vector.to_python())
+
+
 class Recording(object):
 
     """Class to represent object that record variables during simulations"""
@@ -71,17 +83,28 @@ class CompRecording(Recording):
 
         self.instantiated = False
 
+        # Response handed out for the current instantiation
+        self._response = None
+
     @property
     def response(self):
-        """Return recording response"""
+        """Return recording response
+
+        The arrays in the response are views of the recorded Neuron vectors,
+        they are copied when the recording is destroyed
+        """
 
         if not self.instantiated:
             raise Exception(
                 'Recording not instantiated before requesting response')
 
-        return responses.TimeVoltageResponse(self.name,
-                                             self.tvector.to_python(),
-                                             self.varvector.to_python())
+        if self._response is None:
+            self._response = responses.TimeVoltageResponse(
+                self.name,
+                _vector_as_array(self.tvector),
+                _vector_as_array(self.varvector))
+
+        return self._response
 
     def instantiate(self, sim=None, icell=None):
         """Instantiate recording"""
@@ -89,6 +112,8 @@ class CompRecording(Recording):
         logger.debug('Adding compartment recording of %s at %s',
                      self.variable, self.location)
 
+        self._response = None
+
         self.varvector = sim.neuron.h.Vector()
         seg = self.location.instantiate(sim=sim, icell=icell)
         self.varvector.record(getattr(seg, '_ref_%s' % self.variable))
@@ -101,6 +126,11 @@ class CompRecording(Recording):
     def destroy(self, sim=None):
         """Destroy recording"""
 
+        # The response can't keep pointing to the buffers of the vectors
+        if self._response is not None:
+            self._response.detach()
+            self._response = None
+
         self.varvector = None
         self.tvector = None
         self.instantiated = False
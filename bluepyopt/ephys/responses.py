@@ -20,13 +20,17 @@ Copyright (c) 2016, EPFL/Blue Brain Project
 """
 
 
-import pandas
+import pickle
+
+import numpy
 
 
 class Response(object):
 
     """Response to stimulus"""
 
+    __slots__ = ('name', 'response')
+
     def __init__(self, name):
         """Constructor
 
@@ -41,28 +45,118 @@ class Response(object):
         return '%s: %s' % (self.__class__.__name__, self.name)
 
 
+def _as_float_array(values):
+    """Convert values to a contiguous float array, without copying arrays
+    that already are"""
+
+    if values is None:
+        return numpy.zeros(0)
+
+    return numpy.ascontiguousarray(values, dtype=numpy.float64)
+
+
+def _buffer_array(buffer):
+    """Float array of a buffer, copied if the buffer is read-only"""
+
+    array = numpy.frombuffer(buffer, dtype=numpy.float64)
+    if not array.flags.writeable:
+        array = array.copy()
+
+    return array
+
+
+def _unpickle_timevoltageresponse(cls, name, time, voltage):
+    """Recreate a TimeVoltageResponse from the buffers of its arrays"""
+
+    response = cls.__new__(cls)
+    response.name = name
+    response.time = _buffer_array(time)
+    response.voltage = _buffer_array(voltage)
+
+    return response
+
+
 class TimeVoltageResponse(Response):
 
-    """Response to stimulus"""
+    """Response to stimulus
+
+    The time and voltage are stored as NumPy arrays, response['time'] and
+    response['voltage'] return these arrays. The response attribute returns
+    the data as a pandas DataFrame, which is only built when requested.
+
+    When pickled, only the raw buffers of the arrays are stored (out-of-band
+    with pickle protocol 5 when available). The arrays of an unpickled
+    response use the out-of-band buffers when they are writeable, and are
+    copied otherwise.
+    """
+
+    __slots__ = ('time', 'voltage')
 
     def __init__(self, name, time=None, voltage=None):
         """Constructor
 
         Args:
             name (str): name of this object
-            time (list of floats): time series
-            voltage (list of floats): voltage series
+            time (list or array of floats): time series
+            voltage (list or array of floats): voltage series
         """
 
+        self.time = _as_float_array(time)
+        self.voltage = _as_float_array(voltage)
+
         super(TimeVoltageResponse, self).__init__(name)
 
-        self.response = pandas.DataFrame()
-        self.response['time'] = pandas.Series(time)
-        self.response['voltage'] = pandas.Series(voltage)
+    @property
+    def response(self):
+        """Response as a pandas DataFrame with time and voltage columns"""
+
+        import pandas
+
+        response = pandas.DataFrame()
+        response['time'] = pandas.Series(self.time)
+        response['voltage'] = pandas.Series(self.voltage)
+
+        return response
+
+    @response.setter
+    def response(self, response):
+        """Set time and voltage from a DataFrame"""
+
+        if response is not None:
+            self.time = _as_float_array(response['time'])
+            self.voltage = _as_float_array(response['voltage'])
+
+    def detach(self):
+        """Make sure the time and voltage arrays own their data
+
+        Arrays that are views of the buffer of another object (e.g. a Neuron
+        Vector) are replaced by a copy
+        """
+
+        if not self.time.flags.owndata:
+            self.time = self.time.copy()
+        if not self.voltage.flags.owndata:
+            self.voltage = self.voltage.copy()
+
+    def __reduce_ex__(self, protocol):
+        """Pickle the buffers of the arrays instead of the arrays"""
+
+        pickle_buffer = getattr(pickle, 'PickleBuffer', None)
+        if pickle_buffer is not None and protocol >= 5:
+            time = pickle_buffer(numpy.ascontiguousarray(self.time))
+            voltage = pickle_buffer(numpy.ascontiguousarray(self.voltage))
+        else:
+            time = numpy.ascontiguousarray(self.time).tobytes()
+            voltage = numpy.ascontiguousarray(self.voltage).tobytes()
+
+        return (_unpickle_timevoltageresponse,
+                (self.__class__, self.name, time, voltage))
 
     def read_csv(self, filename):
         """Load response from csv file"""
 
+        import pandas
+
         self.response = pandas.read_csv(filename)
 
     def to_csv(self, filename):
@@ -73,14 +167,19 @@ class TimeVoltageResponse(Response):
     def __getitem__(self, index):
         """Return item at index"""
 
-        return self.response.__getitem__(index)
+        if index == 'time':
+            return self.time
+        elif index == 'voltage':
+            return self.voltage
+        else:
+            raise KeyError(index)
 
     # This plot has to be generalised to several subplots
     def plot(self, axes):
         """Plot the response"""
 
         axes.plot(
-            self.response['time'],
-            self.response['voltage'],
+            self.time,
+            self.voltage,
             label='%s' %
             self.name)
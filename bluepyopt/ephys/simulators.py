@@ -3,22 +3,191 @@
 # pylint: disable=W0511
 
 import os
+import sys
 import logging
 import imp
 import ctypes
 import platform
+import collections
 
 logger = logging.getLogger(__name__)
 
 
+class _CountingHoc(object):
+
+    """Wrapper around the hoc interpreter that counts attribute accesses"""
+
+    def __init__(self, h, counts):
+        object.__setattr__(self, '_h', h)
+        object.__setattr__(self, '_counts', counts)
+
+    def __getattr__(self, name):
+        self._counts[name] += 1
+        return getattr(self._h, name)
+
+    def __setattr__(self, name, value):
+        self._counts[name] += 1
+        setattr(self._h, name, value)
+
+    def __call__(self, *args, **kwargs):
+        self._counts['__call__'] += 1
+        return self._h(*args, **kwargs)
+
+
+class _CountingNeuron(object):
+
+    """Wrapper around the neuron module that counts the hoc calls"""
+
+    def __init__(self, neuron, counts):
+        self._neuron = neuron
+        self.h = _CountingHoc(neuron.h, counts)
+
+    def __getattr__(self, name):
+        return getattr(self._neuron, name)
+
+
+class NrnSession(object):
+
+    """State of Neuron in the current process
+
+    Neuron is imported and initialised only once per process, and the hoc
+    files and code that have been loaded are recorded so that they are
+    only loaded once.
+    """
+
+    # Hoc files loaded when Neuron is initialised
+    PRELOADED_FILES = ('stdrun.hoc', 'import3d.hoc')
+
+    # Hoc globals that are restored after every task of a persistent worker,
+    # in addition to the ones set with set_global
+    RESTORED_GLOBALS = ('celsius', 'v_init', 'dt', 'steps_per_ms')
+
+    def __init__(self):
+        """Constructor"""
+
+        self._neuron = None
+        self._counting_neuron = None
+
+        self.loaded_files = set()
+        self.defined_names = set()
+
+        # Values of hoc globals before they were first changed in this
+        # process, name -> value
+        self.global_defaults = {}
+
+        # Number of accesses to every attribute of hoc, only recorded for
+        # simulators with count_hoc_calls
+        self.hoc_call_counts = collections.Counter()
+
+    @staticmethod
+    def _import_neuron():
+        """Import the neuron module"""
+
+        if 'neuron' not in sys.modules and platform.system() != 'Windows':
+            # hoc.so does not exist on NEURON Windows
+            # although \\hoc.pyd can work here, it gives an error for
+            # nrn_nobanner_ line
+            hoc_so = os.path.join(imp.find_module('neuron')[1] + '/hoc.so')
+            nrndll = ctypes.cdll[hoc_so]
+            ctypes.c_int.in_dll(nrndll, 'nrn_nobanner_').value = 1
+
+        import neuron  # NOQA
+
+        return neuron
+
+    @property
+    def neuron(self):
+        """Return neuron module, initialise Neuron if necessary"""
+
+        if self._neuron is None:
+            neuron = self._import_neuron()
+            for filename in self.PRELOADED_FILES:
+                neuron.h.load_file(filename)
+                self.loaded_files.add(filename)
+            for name in self.RESTORED_GLOBALS:
+                self.global_defaults.setdefault(name, getattr(neuron.h, name))
+            self._neuron = neuron
+
+        return self._neuron
+
+    @property
+    def counting_neuron(self):
+        """Return wrapper of neuron module that counts the hoc calls"""
+
+        if self._counting_neuron is None:
+            self._counting_neuron = _CountingNeuron(
+                self.neuron, self.hoc_call_counts)
+
+        return self._counting_neuron
+
+    def load_file(self, filename):
+        """Load a hoc file, if it hasn't been loaded before"""
+
+        if filename not in self.loaded_files:
+            self.neuron.h.load_file(filename)
+            self.loaded_files.add(filename)
+
+    def define_hoc(self, name, hoc_code):
+        """Execute hoc code that defines name, if name is not defined yet"""
+
+        if name not in self.defined_names:
+            if not hasattr(self.neuron.h, name):
+                self.neuron.h(hoc_code)
+            self.defined_names.add(name)
+
+    def record_global(self, name):
+        """Record the value of a hoc global before it is changed"""
+
+        if name not in self.global_defaults:
+            self.global_defaults[name] = getattr(self.neuron.h, name)
+
+    def global_values(self):
+        """Current values of the hoc globals in global_defaults"""
+
+        if self._neuron is None:
+            return {}
+
+        return dict((name, getattr(self._neuron.h, name))
+                    for name in self.global_defaults)
+
+    def restore_globals(self, values):
+        """Set the hoc globals in global_defaults back
+
+        Args:
+            values (dict): values to restore, name -> value, the globals that
+                are not in values are set to their defaults
+        """
+
+        if self._neuron is None:
+            return
+
+        for name, default in self.global_defaults.items():
+            setattr(self._neuron.h, name, values.get(name, default))
+
+
+# Neuron session of this process
+session = NrnSession()
+
+
 class NrnSimulator(object):
 
     """Neuron simulator"""
 
-    def __init__(self, dt=None, cvode_active=True, cvode_minstep=None):
-        """Constructor"""
+    def __init__(self, dt=None, cvode_active=True, cvode_minstep=None,
+                 count_hoc_calls=False):
+        """Constructor
+
+        Args:
+            dt (float): time step (default: dt of Neuron)
+            cvode_active (bool): use variable time step
+            cvode_minstep (float): minimal time step of cvode
+            count_hoc_calls (bool): count the accesses to every attribute
+                of hoc through this simulator, in session.hoc_call_counts
+        """
+
+        self.count_hoc_calls = count_hoc_calls
 
-        self.neuron.h.load_file('stdrun.hoc')
+        self.load_file('stdrun.hoc')
 
         self.dt = dt if dt is not None else self.neuron.h.dt
 
@@ -46,27 +215,54 @@ class NrnSimulator(object):
 
         self.cvode.minstep(value)
 
-    # pylint: disable=R0201
-    # TODO function below should probably a class property or something in that
-    # sense
     @property
     def neuron(self):
         """Return neuron module"""
 
-        if platform.system() != 'Windows':
-            # hoc.so does not exist on NEURON Windows
-            # although \\hoc.pyd can work here, it gives an error for
-            # nrn_nobanner_ line
-            hoc_so = os.path.join(imp.find_module('neuron')[1] + '/hoc.so')
-            nrndll = ctypes.cdll[hoc_so]
-            ctypes.c_int.in_dll(nrndll, 'nrn_nobanner_').value = 1
+        if self.count_hoc_calls:
+            return session.counting_neuron
 
-        import neuron  # NOQA
+        return session.neuron
 
-        return neuron
+    @property
+    def hoc_call_counts(self):
+        """Number of accesses to every attribute of hoc in this process"""
+
+        return session.hoc_call_counts
 
-    def run(self, tstop=None, dt=None, cvode_active=None):
-        """Run protocol"""
+    @staticmethod
+    def load_file(filename):
+        """Load a hoc file, only once per process"""
+
+        session.load_file(filename)
+
+    @staticmethod
+    def define_hoc(name, hoc_code):
+        """Execute hoc code that defines name, only once per process"""
+
+        session.define_hoc(name, hoc_code)
+
+    def set_global(self, name, value):
+        """Set a hoc global, persistent workers restore it after a task"""
+
+        session.record_global(name)
+        setattr(self.neuron.h, name, value)
+
+    def run(self, tstop=None, dt=None, cvode_active=None,
+            termination_criteria=None, check_interval=5.0):
+        """Run protocol
+
+        Args:
+            termination_criteria (list of TerminationCriteria): criteria
+                that are checked every check_interval ms, the simulation
+                stops as soon as one of them is met
+            check_interval (float): time between checks of the termination
+                criteria (ms)
+
+        Returns:
+            The termination criterion that stopped the simulation, None if
+            the simulation ran until tstop
+        """
 
         self.neuron.h.tstop = tstop
 
@@ -100,6 +296,22 @@ class NrnSimulator(object):
                 tstop,
                 dt)
 
-        self.neuron.h.run()
+        if not termination_criteria:
+            self.neuron.h.run()
+            logger.debug('Neuron simulation finished')
+            return None
+
+        self.neuron.h.stdinit()
+        while self.neuron.h.t < tstop:
+            self.neuron.h.continuerun(
+                min(self.neuron.h.t + check_interval, tstop))
+
+            for criterion in termination_criteria:
+                if criterion.check(self.neuron.h.t):
+                    logger.debug(
+                        'Neuron simulation terminated at %.6g ms by %s',
+                        self.neuron.h.t, criterion.name)
+                    return criterion
 
         logger.debug('Neuron simulation finished')
+        return None
@@ -0,0 +1,208 @@
+"""Criteria to terminate simulations early"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import math
+
+
+class TerminationCriterion(object):
+
+    """Criterion that aborts a simulation when it is met
+
+    The simulator checks the criteria at regular intervals while the
+    simulation is running (see NrnSimulator.run).
+    """
+
+    def __init__(self, name=None):
+        """Constructor
+
+        Args:
+            name (str): name of this object
+        """
+
+        self.name = name
+
+    def instantiate(self, sim=None, icell=None):
+        """Instantiate criterion"""
+        pass
+
+    def check(self, time):  # pylint: disable=W0613
+        """Return True if the simulation should be terminated at time (ms)
+
+        The base criterion is never met
+        """
+
+        return False
+
+    def destroy(self, sim=None):
+        """Destroy criterion"""
+        pass
+
+
+class NrnThresholdCriterion(TerminationCriterion):
+
+    """Criterion based on the threshold crossings of the voltage at a location
+
+    The upward crossings of the threshold are recorded by a NetCon, so that
+    no crossing is missed between two checks.
+    """
+
+    def __init__(self, name=None, location=None, threshold=-20.0):
+        """Constructor
+
+        Args:
+            name (str): name of this object
+            location (Location): location in the model of the voltage
+            threshold (float): voltage threshold (mV)
+        """
+
+        super(NrnThresholdCriterion, self).__init__(name=name)
+        self.location = location
+        self.threshold = threshold
+
+        self.segment = None
+        self.netcon = None
+        self.crossing_times = None
+
+    def instantiate(self, sim=None, icell=None):
+        """Instantiate criterion"""
+
+        self.segment = self.location.instantiate(sim=sim, icell=icell)
+
+        self.crossing_times = sim.neuron.h.Vector()
+        self.netcon = sim.neuron.h.NetCon(
+            self.segment._ref_v,  # pylint: disable=W0212
+            None,
+            sec=self.segment.sec)
+        self.netcon.threshold = self.threshold
+        self.netcon.record(self.crossing_times)
+
+    def destroy(self, sim=None):
+        """Destroy criterion"""
+
+        self.segment = None
+        self.netcon = None
+        self.crossing_times = None
+
+
+class RunawayVoltageCriterion(NrnThresholdCriterion):
+
+    """Terminate when the voltage exceeds a threshold or is not finite"""
+
+    def __init__(self, name=None, location=None, threshold=100.0):
+        """Constructor
+
+        Args:
+            name (str): name of this object
+            location (Location): location in the model of the voltage
+            threshold (float): maximal voltage (mV)
+        """
+
+        super(RunawayVoltageCriterion, self).__init__(
+            name=name, location=location, threshold=threshold)
+
+    def check(self, time):
+        """Return True if the simulation should be terminated at time (ms)"""
+
+        voltage = self.segment.v
+        return len(self.crossing_times) > 0 or \
+            math.isnan(voltage) or math.isinf(voltage)
+
+    def __str__(self):
+        """String representation"""
+
+        return '%s: voltage above %s mV at %s' % \
+            (self.name, self.threshold, self.location)
+
+
+class DepolarizationBlockCriterion(NrnThresholdCriterion):
+
+    """Terminate when the voltage stays above a threshold for too long"""
+
+    def __init__(self, name=None, location=None, threshold=-20.0,
+                 duration=100.0):
+        """Constructor
+
+        Args:
+            name (str): name of this object
+            location (Location): location in the model of the voltage
+            threshold (float): voltage threshold (mV)
+            duration (float): time the voltage has to stay above threshold
+                for the criterion to be met (ms)
+        """
+
+        super(DepolarizationBlockCriterion, self).__init__(
+            name=name, location=location, threshold=threshold)
+        self.duration = duration
+
+    def check(self, time):
+        """Return True if the simulation should be terminated at time (ms)"""
+
+        if self.segment.v <= self.threshold:
+            return False
+
+        if len(self.crossing_times) > 0:
+            above_since = self.crossing_times[len(self.crossing_times) - 1]
+        else:
+            above_since = 0.0
+
+        return time - above_since >= self.duration
+
+    def __str__(self):
+        """String representation"""
+
+        return '%s: voltage above %s mV for %s ms at %s' % \
+            (self.name, self.threshold, self.duration, self.location)
+
+
+class NoSpikeCriterion(NrnThresholdCriterion):
+
+    """Terminate when there was no spike before a deadline"""
+
+    def __init__(self, name=None, location=None, threshold=-20.0,
+                 deadline=None):
+        """Constructor
+
+        Args:
+            name (str): name of this object
+            location (Location): location in the model of the voltage
+            threshold (float): spike detection threshold (mV)
+            deadline (float): time before which a spike has to occur (ms),
+                e.g. the end of the step of a step protocol (required)
+        """
+
+        super(NoSpikeCriterion, self).__init__(
+            name=name, location=location, threshold=threshold)
+
+        if deadline is None:
+            raise ValueError(
+                'NoSpikeCriterion: criterion %s needs a deadline' % name)
+        self.deadline = deadline
+
+    def check(self, time):
+        """Return True if the simulation should be terminated at time (ms)"""
+
+        return time >= self.deadline and len(self.crossing_times) == 0
+
+    def __str__(self):
+        """String representation"""
+
+        return '%s: no spike above %s mV before %s ms at %s' % \
+            (self.name, self.threshold, self.deadline, self.location)
@@ -0,0 +1,105 @@
+"""Timing of the phases of cell evaluations"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import time
+import contextlib
+import collections
+
+
+class EvaluationTimings(object):
+
+    """Accumulated wall clock time of the phases of cell evaluations
+
+    Every entry is identified by a scope (e.g. the name of a protocol or an
+    objective) and a phase (e.g. 'simulation'). Timings recorded in
+    different processes can be merged with update.
+    """
+
+    def __init__(self):
+        """Constructor"""
+
+        # (scope, phase) -> [count, total time]
+        self._entries = collections.OrderedDict()
+
+    def record(self, scope, phase, duration, count=1):
+        """Add a duration (s) to an entry"""
+
+        entry = self._entries.setdefault((scope, phase), [0, 0.0])
+        entry[0] += count
+        entry[1] += duration
+
+    @contextlib.contextmanager
+    def timer(self, scope, phase):
+        """Context manager that records the time spent in it"""
+
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(scope, phase, time.time() - start)
+
+    def update(self, other):
+        """Add the entries of another EvaluationTimings object"""
+
+        for (scope, phase), (count, total) in other.items():
+            self.record(scope, phase, total, count=count)
+
+    def items(self):
+        """Return list of ((scope, phase), (count, total time))"""
+
+        return [(key, tuple(entry)) for key, entry in self._entries.items()]
+
+    def as_dict(self):
+        """Return timings as dict of scope -> phase -> dict with count,
+        total and mean time"""
+
+        timings = collections.OrderedDict()
+        for (scope, phase), (count, total) in self.items():
+            timings.setdefault(scope, collections.OrderedDict())[phase] = {
+                'count': count,
+                'total': total,
+                'mean': total / count if count else 0.0}
+
+        return timings
+
+    def total(self, phase=None):
+        """Total time (s) of all the entries, or of all entries of a phase"""
+
+        return sum(total for (_, entry_phase), (_, total) in self.items()
+                   if phase is None or entry_phase == phase)
+
+    def reset(self):
+        """Remove all entries"""
+
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __str__(self):
+        """String representation"""
+
+        content = 'evaluation timings:\n'
+        for (scope, phase), (count, total) in self.items():
+            content += '  %s %s: %d x, %.6g s total\n' % (
+                scope, phase, count, total)
+
+        return content
@@ -0,0 +1,380 @@
+"""Worker classes used to isolate simulations"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+# pylint: disable=W0511
+
+import os
+import sys
+import logging
+import multiprocessing
+
+from . import models
+from . import simulators
+
+logger = logging.getLogger(__name__)
+
+
+# Worker processes started by this process, shared by all the
+# PersistentWorker objects with the same limits (also the unpickled ones),
+# (pid, max_tasks, max_memory) -> (process, connection)
+_worker_processes = {}
+
+
+class EvaluationTimeout(Exception):
+
+    """Raised when an isolated task exceeds its wall clock time limit"""
+    pass
+
+
+def _resident_memory():
+    """Resident memory of the current process (MB)
+
+    Read from /proc/self/statm where available, otherwise the peak resident
+    memory is used, which never decreases and includes the memory the
+    process had when it was forked
+    """
+
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024.0 * 1024.0)
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is expressed in bytes on OSX, and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / (1024.0 * 1024.0)
+    else:
+        return peak / 1024.0
+
+
+def _simulator_objects():
+    """Number of sections, NetCons, Vectors and point processes (per type)
+    in the Neuron simulator, None if Neuron is not loaded"""
+
+    neuron = sys.modules.get('neuron')
+    if neuron is None:
+        return None
+
+    hoc = neuron.h
+    objects = {
+        'sections': sum(1 for _ in hoc.allsec()),
+        'NetCon': int(hoc.List('NetCon').count()),
+        'Vector': int(hoc.List('Vector').count())}
+
+    point_processes = hoc.MechanismType(1)
+    name = hoc.ref('')
+    for index in range(int(point_processes.count())):
+        point_processes.select(index)
+        point_processes.selected(name)
+        objects[name[0]] = int(hoc.List(name[0]).count())
+
+    return objects
+
+
+def _simulator_is_clean(objects, initial_objects):
+    """Check that no Neuron objects are left behind by a task
+
+    Args:
+        objects (dict): current result of _simulator_objects
+        initial_objects (dict): result of _simulator_objects before the
+            first task, or when a cell was last kept for reuse
+
+    The sections of cells that are kept for reuse (see CellModel
+    reuse_instance) are allowed. Objects of other types (e.g. hoc templates
+    or python objects) are not checked.
+    """
+
+    if objects is None:
+        return True
+
+    initial_objects = initial_objects or {}
+    for name, count in objects.items():
+        if name == 'sections':
+            expected = models.reused_section_count()
+        else:
+            expected = initial_objects.get(name, 0)
+        if count != expected:
+            return False
+
+    return True
+
+
+def _worker_loop(conn, max_tasks, max_memory):
+    """Main loop of the worker process
+
+    The hoc globals (see simulators.NrnSession.RESTORED_GLOBALS and
+    NrnSimulator.set_global) are set back after every task to the values
+    they had when the worker was started, like in a newly forked process
+    """
+
+    task_count = 0
+    initial_globals = simulators.session.global_values()
+    initial_objects = _simulator_objects()
+    reused_sections = models.reused_section_count()
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+
+        if task is None:
+            break
+
+        func, kwds = task
+
+        try:
+            result = (True, func(**kwds))
+        except Exception as exception:  # pylint: disable=W0703
+            result = (False, exception)
+
+        simulators.session.restore_globals(initial_globals)
+
+        task_count += 1
+
+        memory = _resident_memory() if max_memory is not None else None
+
+        objects = _simulator_objects()
+        if (initial_objects is None or
+                models.reused_section_count() != reused_sections):
+            # Objects created together with the cells kept for reuse (or
+            # when Neuron was loaded) are allowed to stay
+            initial_objects = objects
+            reused_sections = models.reused_section_count()
+
+        recycle_reason = None
+        if max_tasks is not None and task_count >= max_tasks:
+            recycle_reason = 'reached %d tasks' % task_count
+        elif memory is not None and memory > max_memory:
+            recycle_reason = 'memory usage of %.1f MB' % memory
+        elif not _simulator_is_clean(objects, initial_objects):
+            recycle_reason = 'simulator state not clean'
+
+        conn.send(result + (recycle_reason,))
+
+        if recycle_reason is not None:
+            break
+
+    conn.close()
+
+
+def apply_isolated(func, kwds=None, isolate=None, timeout=None):
+    """Run func(**kwds), isolated in a subprocess
+
+    Args:
+        func: function to run, needs to be picklable if isolate is set
+        kwds (dict): keyword arguments of func
+        isolate (bool or PersistentWorker): if True (default) run func in a
+            new subprocess, if a PersistentWorker object is passed, run func
+            in that (long-lived) worker process, if False run func in the
+            current process
+        timeout (float): wall clock time limit (s), when it is exceeded the
+            subprocess is killed and EvaluationTimeout is raised. Requires
+            isolation.
+    """
+
+    if kwds is None:
+        kwds = {}
+
+    if isolate is None:
+        isolate = True
+
+    if timeout is not None and not isolate:
+        raise ValueError(
+            'apply_isolated: a timeout can only be used with isolation')
+
+    if isolate:
+        def _reduce_method(meth):
+            """Overwrite reduce"""
+            return (getattr, (meth.__self__, meth.__func__.__name__))
+
+        import copy_reg
+        import types
+        copy_reg.pickle(types.MethodType, _reduce_method)
+
+    if isinstance(isolate, PersistentWorker):
+        return isolate.apply(func, kwds=kwds, timeout=timeout)
+    elif isolate:
+        pool = multiprocessing.Pool(1, maxtasksperchild=1)
+        try:
+            result = pool.apply_async(func, kwds=kwds).get(timeout)
+        except multiprocessing.TimeoutError:
+            raise EvaluationTimeout(
+                'apply_isolated: task exceeded time limit of %.6g s' %
+                timeout)
+        finally:
+            pool.terminate()
+            pool.join()
+            del pool
+
+        return result
+    else:
+        return func(**kwds)
+
+
+class PersistentWorker(object):
+
+    """Long-lived subprocess in which simulations are isolated
+
+    Instead of forking a new process for every simulation, the same worker
+    process is reused for subsequent tasks. The worker is recycled (i.e.
+    replaced by a fresh process) after max_tasks tasks, when its resident
+    memory exceeds max_memory, or when a task left sections, NetCons,
+    Vectors or point processes behind in the Neuron simulator. A worker that exceeds the time limit of a task is
+    killed.
+
+    The worker process is shared by all the PersistentWorker objects with
+    the same limits in a process. A PersistentWorker that is pickled to
+    another process (e.g. with the evaluator, by a parallel map function)
+    uses the worker process of that process, which is started on its first
+    task.
+    """
+
+    def __init__(self, max_tasks=None, max_memory=None):
+        """Constructor
+
+        Args:
+            max_tasks (int): number of tasks after which the worker process
+                is replaced (None means no limit)
+            max_memory (float): resident memory (MB) above which the
+                worker process is replaced (None means no limit)
+        """
+
+        self.max_tasks = max_tasks
+        self.max_memory = max_memory
+
+    @property
+    def _key(self):
+        """Key of the worker process in _worker_processes"""
+
+        return (os.getpid(), self.max_tasks, self.max_memory)
+
+    @property
+    def _process(self):
+        """Worker process, None if not started"""
+
+        return _worker_processes.get(self._key, (None, None))[0]
+
+    @property
+    def _conn(self):
+        """Connection to the worker process, None if not started"""
+
+        return _worker_processes.get(self._key, (None, None))[1]
+
+    def _start(self):
+        """Start a new worker process"""
+
+        parent_conn, child_conn = multiprocessing.Pipe()
+
+        process = multiprocessing.Process(
+            target=_worker_loop,
+            args=(child_conn, self.max_tasks, self.max_memory))
+        process.daemon = True
+        process.start()
+        child_conn.close()
+
+        _worker_processes[self._key] = (process, parent_conn)
+
+        logger.debug('Started worker process %d', process.pid)
+
+    def _join(self):
+        """Wait for the worker process to finish"""
+
+        process, conn = _worker_processes.pop(self._key)
+
+        conn.close()
+        process.join()
+
+    @property
+    def alive(self):
+        """Is there a worker process running"""
+
+        return self._process is not None and self._process.is_alive()
+
+    def apply(self, func, kwds=None, timeout=None):
+        """Run func(**kwds) in the worker process and return the result
+
+        Args:
+            timeout (float): wall clock time limit (s), when it is exceeded
+                the worker process is killed and EvaluationTimeout is raised
+        """
+
+        if not self.alive:
+            if self._process is not None:
+                self._join()
+            self._start()
+
+        self._conn.send((func, kwds if kwds is not None else {}))
+
+        if timeout is not None and not self._conn.poll(timeout):
+            logger.debug(
+                'Killing worker process %d, task exceeded %.6g s',
+                self._process.pid,
+                timeout)
+            self._process.terminate()
+            self._join()
+            raise EvaluationTimeout(
+                'PersistentWorker: task exceeded time limit of %.6g s' %
+                timeout)
+
+        try:
+            success, result, recycle_reason = self._conn.recv()
+        except EOFError:
+            self._join()
+            raise Exception(
+                'PersistentWorker: worker process died while running task')
+
+        if recycle_reason is not None:
+            logger.debug(
+                'Recycling worker process %d: %s',
+                self._process.pid,
+                recycle_reason)
+            self._join()
+
+        if not success:
+            raise result
+
+        return result
+
+    def terminate(self):
+        """Stop the worker process"""
+
+        if self._process is not None:
+            if self._process.is_alive():
+                try:
+                    self._conn.send(None)
+                except (IOError, OSError):
+                    self._process.terminate()
+            self._join()
+
+    def __str__(self):
+        """String representation"""
+
+        return 'PersistentWorker (max tasks %s, max memory %s MB)' % (
+            self.max_tasks, self.max_memory)
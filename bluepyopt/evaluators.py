@@ -72,3 +72,23 @@ class Evaluator(object):
                 List of Objectives with values calculated by the Evaluator.
 
         """
+
+    def evaluate_population(self, param_lists, map_function=map):
+        """Evaluate a population of parameter sets
+
+        Subclasses can override this method to group the evaluation of
+        several parameter sets.
+
+        Args:
+            param_lists (list of lists of Parameters):
+                The parameter sets to be evaluated.
+            map_function (function): map function used to distribute the
+                evaluations
+
+        Returns:
+            objectives (list of Objectives):
+                List of Objectives for every parameter set, in the same order
+                as param_lists
+        """
+
+        return list(map_function(self.evaluate_with_lists, param_lists))
@@ -0,0 +1,258 @@
+"""bluepyopt.deapext.algorithms tests"""
+
+import nose.tools as nt
+from nose.plugins.attrib import attr
+
+import bluepyopt
+import bluepyopt.evaluators
+import bluepyopt.objectives
+import bluepyopt.parameters
+
+
+class AbsEvaluator(bluepyopt.evaluators.Evaluator):
+
+    """Evaluator with the absolute values of the parameters as objectives"""
+
+    def __init__(self):
+        super(AbsEvaluator, self).__init__(
+            objectives=[bluepyopt.objectives.Objective('obj%d' % i)
+                        for i in range(3)],
+            params=[bluepyopt.parameters.Parameter('par%d' % i,
+                                                   bounds=[-1.0, 1.0])
+                    for i in range(3)])
+
+    def evaluate_with_lists(self, params):
+        return [abs(param) for param in params]
+
+
+def _run_optimisation(**kwargs):
+    """Run a small optimisation"""
+    optimisation = bluepyopt.deapext.optimisations.DEAPOptimisation(
+        evaluator=AbsEvaluator(),
+        offspring_size=10)
+    return optimisation.run(max_ngen=5, **kwargs)
+
+
+@attr('unit')
+def test_eaAlphaMuPlusLambdaAsyncCheckpoint():
+    """deapext.algorithms: test asynchronous algorithm"""
+
+    pop, hof, log, _ = _run_optimisation(asynchronous=True)
+    nt.assert_equal(len(log), 5)
+    nt.assert_equal(len(pop), 20)
+    nt.assert_true(all(ind.fitness.valid for ind in pop))
+
+    # Evaluated serially, the asynchronous algorithm has the same result
+    # as the generational one
+    sync_pop, _, sync_log, _ = _run_optimisation()
+    nt.assert_equal(log.select('min'), sync_log.select('min'))
+
+
+@attr('unit')
+def test_evaluate_invalid_fitness_cache():
+    """deapext.algorithms: test evaluation with cache"""
+
+    from bluepyopt.deapext.algorithms import _evaluate_invalid_fitness
+    from bluepyopt.deapext.cache import EvaluationCache
+
+    optimisation = bluepyopt.deapext.optimisations.DEAPOptimisation(
+        evaluator=AbsEvaluator())
+    toolbox = optimisation.toolbox
+    population = toolbox.population(n=3)
+    population.append(toolbox.clone(population[0]))
+
+    cache = EvaluationCache()
+    nt.assert_equal(
+        _evaluate_invalid_fitness(toolbox, population, cache=cache), 3)
+    nt.assert_equal(population[3].fitness.values,
+                    population[0].fitness.values)
+    nt.assert_equal(cache.hits, 1)
+
+    population.append(toolbox.clone(population[1]))
+    del population[4].fitness.values
+    nt.assert_equal(
+        _evaluate_invalid_fitness(toolbox, population, cache=cache), 0)
+    nt.assert_equal(cache.hits, 2)
+
+
+@attr('unit')
+def test_eaAlphaMuPlusLambdaIslandsCheckpoint():
+    """deapext.algorithms: test island model algorithm"""
+
+    pop, hof, log, history = _run_optimisation(
+        islands=3, migration_interval=2)
+    nt.assert_equal(len(log), 5)
+    nt.assert_equal(len(pop), 60)
+    nt.assert_equal(log.select('nevals'), [30, 30, 30, 30, 30])
+    nt.assert_true(all(ind.fitness.valid for ind in pop))
+
+    _, _, complete_log, _ = _run_optimisation(
+        islands=3, migration_topology='complete')
+    nt.assert_equal(len(complete_log), 5)
+
+    nt.assert_raises(
+        ValueError, _run_optimisation, islands=3, migration_topology='star')
+
+
+@attr('unit')
+def test_topologies():
+    """deapext.algorithms: test migration topologies"""
+
+    from bluepyopt.deapext.algorithms import ring_topology, complete_topology
+
+    nt.assert_equal(ring_topology(3), [[1], [2], [0]])
+    nt.assert_equal(complete_topology(3), [[1, 2], [0, 2], [0, 1]])
+
+
+@attr('unit')
+def test_callback():
+    """deapext.algorithms: test per-generation callback"""
+
+    for kwargs in [{}, {'asynchronous': True}, {'islands': 2}]:
+        reports = []
+        _, _, log, _ = _run_optimisation(callback=reports.append, **kwargs)
+
+        nt.assert_equal([report['generation'] for report in reports],
+                        [1, 2, 3, 4, 5])
+        nt.assert_equal([report['record'] for report in reports], log)
+        nt.assert_equal(
+            list(reports[0]['timings'].keys()),
+            ['evaluation', 'history_update'])
+        nt.assert_equal(
+            set(reports[-1]['timings'].keys()),
+            set(['variation', 'evaluation', 'history_update', 'selection']))
+
+
+class CountingEvaluator(AbsEvaluator):
+
+    """Evaluator that reports the number of evaluations as statistics"""
+
+    def __init__(self):
+        super(CountingEvaluator, self).__init__()
+        self.count = 0
+
+    def evaluate_with_lists(self, params):
+        self.count += 1
+        return super(CountingEvaluator, self).evaluate_with_lists(params)
+
+    def evaluation_statistics(self, reset=True):
+        statistics = {'timeouts': self.count}
+        if reset:
+            self.count = 0
+        return statistics
+
+
+@attr('unit')
+def test_evaluation_statistics():
+    """deapext.algorithms: test recording evaluator statistics"""
+
+    optimisation = bluepyopt.deapext.optimisations.DEAPOptimisation(
+        evaluator=CountingEvaluator(),
+        offspring_size=10)
+    _, _, log, _ = optimisation.run(max_ngen=3)
+
+    nt.assert_true('timeouts' in log.header)
+    nt.assert_equal(log.select('timeouts'), log.select('nevals'))
+
+
+class SleepingEvaluator(AbsEvaluator):
+
+    """Evaluator that takes some time for every evaluation"""
+
+    delay = 0.01
+
+    def evaluate_with_lists(self, params):
+        import time
+        time.sleep(self.delay)
+        return super(SleepingEvaluator, self).evaluate_with_lists(params)
+
+
+@attr('unit')
+def test_async_serial_timings():
+    """deapext.algorithms: test timings of serial asynchronous evaluation"""
+
+    optimisation = bluepyopt.deapext.optimisations.DEAPOptimisation(
+        evaluator=SleepingEvaluator(),
+        offspring_size=5)
+    reports = []
+    optimisation.run(max_ngen=3, asynchronous=True, callback=reports.append)
+
+    for report in reports:
+        nt.assert_true(report['record']['nevals'] > 0)
+        nt.assert_true(
+            report['timings']['evaluation'] >=
+            report['record']['nevals'] * SleepingEvaluator.delay)
+        nt.assert_true(
+            report['timings'].get('variation', 0.0) <
+            SleepingEvaluator.delay)
+
+
+class ChunkEvaluator(AbsEvaluator):
+
+    """Evaluator that counts the evaluated chunks in its statistics"""
+
+    def __init__(self):
+        super(ChunkEvaluator, self).__init__()
+        self.count = 0
+
+    def evaluate_chunk(self, param_lists):
+        return ([self.evaluate_with_lists(params) for params in param_lists],
+                len(param_lists))
+
+    def collect_chunk_results(self, chunk_results):
+        objectives = []
+        for chunk_objectives, count in chunk_results:
+            objectives.extend(chunk_objectives)
+            self.count += count
+        return objectives
+
+    def evaluate_population(self, param_lists, map_function=map):
+        return self.collect_chunk_results(
+            map_function(self.evaluate_chunk, [[list(params)]
+                                               for params in param_lists]))
+
+    def evaluation_statistics(self, reset=True):
+        statistics = {'timeouts': self.count}
+        if reset:
+            self.count = 0
+        return statistics
+
+
+@attr('unit')
+def test_async_evaluation_statistics():
+    """deapext.algorithms: test evaluator statistics of async evaluation"""
+
+    optimisation = bluepyopt.deapext.optimisations.DEAPOptimisation(
+        evaluator=ChunkEvaluator(),
+        offspring_size=10)
+    _, _, log, _ = optimisation.run(max_ngen=3, asynchronous=True)
+
+    nt.assert_equal(log.select('timeouts'), log.select('nevals'))
+
+
+@attr('unit')
+def test_async_without_evaluations():
+    """deapext.algorithms: test async algorithm when nothing is evaluated"""
+
+    from bluepyopt.deapext.cache import EvaluationCache
+
+    # Offspring without variation keep the fitness of their parents
+    optimisation = bluepyopt.deapext.optimisations.DEAPOptimisation(
+        evaluator=AbsEvaluator(), offspring_size=10, cxpb=0.0, mutpb=0.0)
+    pop, _, log, _ = optimisation.run(max_ngen=3, asynchronous=True)
+    nt.assert_equal(log.select('nevals'), [10, 0, 0])
+    nt.assert_equal(len(pop), 20)
+
+    # All the offspring are found in a warm cache
+    cache = EvaluationCache(max_size=None)
+    logs = []
+    for _ in range(2):
+        optimisation = bluepyopt.deapext.optimisations.DEAPOptimisation(
+            evaluator=AbsEvaluator(), offspring_size=10, seed=1, cache=cache)
+        pop, _, log, _ = optimisation.run(max_ngen=3, asynchronous=True)
+        nt.assert_equal(len(pop), 20)
+        logs.append(log)
+
+    nt.assert_true(sum(logs[0].select('nevals')) > 0)
+    nt.assert_equal(logs[1].select('nevals'), [0, 0, 0])
+    nt.assert_equal(logs[1].select('min'), logs[0].select('min'))
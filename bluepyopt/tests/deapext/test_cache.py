@@ -0,0 +1,53 @@
+"""bluepyopt.deapext.cache tests"""
+
+import nose.tools as nt
+from nose.plugins.attrib import attr
+
+from bluepyopt.deapext.cache import EvaluationCache
+
+
+@attr('unit')
+def test_evaluationcache_lru():
+    """deapext.cache: test EvaluationCache get, put and eviction"""
+
+    cache = EvaluationCache(max_size=2)
+    nt.assert_equal(cache.get([1.0, 2.0]), None)
+
+    cache.put([1.0, 2.0], [10.0])
+    cache.put([3.0, 4.0], [20.0])
+    nt.assert_equal(cache.get([1.0, 2.0]), (10.0,))
+
+    # [3.0, 4.0] is now the least recently used entry
+    cache.put([5.0, 6.0], [30.0])
+    nt.assert_equal(len(cache), 2)
+    nt.assert_true([1.0, 2.0] in cache)
+    nt.assert_false([3.0, 4.0] in cache)
+
+    nt.assert_equal(cache.hits, 1)
+    nt.assert_equal(cache.misses, 1)
+    cache.reset_statistics()
+    nt.assert_equal(cache.hits, 0)
+
+
+@attr('unit')
+def test_evaluationcache_tolerance():
+    """deapext.cache: test EvaluationCache tolerance"""
+
+    cache = EvaluationCache(tolerance=1e-6)
+    cache.put([1.0, 2.0], [10.0])
+    nt.assert_equal(cache.get([1.0 + 1e-9, 2.0]), (10.0,))
+    nt.assert_equal(cache.get([1.0 + 1e-3, 2.0]), None)
+
+
+@attr('unit')
+def test_evaluationcache_tolerance_grid():
+    """deapext.cache: test EvaluationCache quantisation boundaries"""
+
+    cache = EvaluationCache(tolerance=0.1)
+    cache.put([0.14], [10.0])
+
+    # Rounded to the same multiple of tolerance
+    nt.assert_equal(cache.get([0.06]), (10.0,))
+
+    # Closer than tolerance, but on the other side of the midpoint 0.15
+    nt.assert_equal(cache.get([0.16]), None)
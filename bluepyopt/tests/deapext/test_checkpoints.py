@@ -0,0 +1,106 @@
+"""bluepyopt.deapext.checkpoints tests"""
+
+import os
+import shutil
+import tempfile
+
+import nose.tools as nt
+from nose.plugins.attrib import attr
+
+import bluepyopt
+from bluepyopt.deapext import checkpoints
+
+from test_algorithms import AbsEvaluator
+
+
+def _run_optimisation(max_ngen, **kwargs):
+    """Run a small optimisation"""
+    optimisation = bluepyopt.deapext.optimisations.DEAPOptimisation(
+        evaluator=AbsEvaluator(),
+        offspring_size=10)
+    return optimisation.run(max_ngen=max_ngen, **kwargs)
+
+
+class TestIncrementalCheckpoint(object):
+
+    """Test class for incremental checkpoints"""
+
+    def __init__(self):
+        """Constructor"""
+        self.tmp_dir = None
+        self.cp_filename = None
+
+    def setup(self):
+        """Setup"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cp_filename = os.path.join(self.tmp_dir, 'checkpoint.pkl')
+
+    def teardown(self):
+        """Teardown"""
+        shutil.rmtree(self.tmp_dir)
+
+    @attr('unit')
+    def test_continue(self):
+        """deapext.checkpoints: test continuing from incremental checkpoint"""
+
+        _, _, log, history = _run_optimisation(10)
+
+        _run_optimisation(
+            5, cp_filename=self.cp_filename, cp_incremental=True)
+        cp = checkpoints.load(self.cp_filename)
+        nt.assert_equal(cp['generation'], 5)
+        nt.assert_equal(len(cp['logbook']), 5)
+
+        _, _, cont_log, cont_history = _run_optimisation(
+            10, cp_filename=self.cp_filename, cp_incremental=True,
+            continue_cp=True)
+        nt.assert_equal(log.select('min'), cont_log.select('min'))
+        nt.assert_equal(
+            history.genealogy_index, cont_history.genealogy_index)
+
+        cp = checkpoints.load(self.cp_filename)
+        nt.assert_equal(cp['generation'], 10)
+        nt.assert_equal(len(cp['logbook']), 10)
+        nt.assert_equal(
+            cp['history'].genealogy_tree, history.genealogy_tree)
+
+    @attr('unit')
+    def test_truncated(self):
+        """deapext.checkpoints: test truncated incremental checkpoint"""
+
+        _run_optimisation(
+            5, cp_filename=self.cp_filename, cp_incremental=True)
+
+        # Simulate a crash during the write of the last record
+        with open(self.cp_filename, 'r+b') as cp_file:
+            cp_file.truncate(os.path.getsize(self.cp_filename) - 10)
+
+        cp = checkpoints.load(self.cp_filename)
+        nt.assert_equal(cp['generation'], 4)
+        nt.assert_equal(len(cp['logbook']), 4)
+
+    @attr('unit')
+    def test_pickle(self):
+        """deapext.checkpoints: test loading pickle checkpoint"""
+
+        _run_optimisation(3, cp_filename=self.cp_filename)
+
+        cp = checkpoints.load(self.cp_filename)
+        nt.assert_equal(cp['generation'], 3)
+        nt.assert_false(os.path.exists('%s.tmp' % self.cp_filename))
+
+    @attr('unit')
+    def test_islands(self):
+        """deapext.checkpoints: test continuing island model checkpoint"""
+
+        _, _, log, _ = _run_optimisation(6, islands=2)
+
+        _run_optimisation(
+            3, islands=2, cp_filename=self.cp_filename, cp_incremental=True)
+        cp = checkpoints.load(self.cp_filename)
+        nt.assert_equal(len(cp['parents']), 2)
+
+        _, _, cont_log, _ = _run_optimisation(
+            6, islands=2, cp_filename=self.cp_filename, cp_incremental=True,
+            continue_cp=True)
+        nt.assert_equal(log.select('min'), cont_log.select('min'))
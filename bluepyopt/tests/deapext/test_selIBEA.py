@@ -1,10 +1,14 @@
 """selIBEA tests"""
 
+import random
+
 import numpy as np
 from nose.tools import ok_, eq_
+from nose.plugins.attrib import attr
 
 from bluepyopt.deapext.tools.selIBEA import (_calc_fitness_components,
                                              _mating_selection,
+                                             _environmental_selection,
                                              )
 from utils import make_mock_population
 
@@ -33,10 +37,49 @@ def test_calc_fitness_components():
     ok_(np.allclose(expected, components))
 
 
+@attr('unit')
+def test_calc_fitness_components_blocks():
+    """selIBEA: test calc_fitness_components with blocks and float32"""
+    KAPPA = 0.05
+    population = make_mock_population(features_count=7, population_count=50)
+
+    components = _calc_fitness_components(population, kappa=KAPPA)
+
+    # A very low memory limit forces the calculation row by row
+    components_blocks = _calc_fitness_components(
+        population, kappa=KAPPA, max_block_memory=1e-6)
+    ok_(np.array_equal(components, components_blocks))
+
+    components_float32 = _calc_fitness_components(
+        population, kappa=KAPPA, dtype=np.float32)
+    eq_(components_float32.dtype, np.float32)
+    ok_(np.allclose(components, components_float32, rtol=1e-5))
+
+
 def test_mating_selection():
     PARENT_COUNT = 10
     population = make_mock_population()
     parents = _mating_selection(population, PARENT_COUNT, 5)
     eq_(len(parents), PARENT_COUNT)
-    expected = [1, 1, 1, 1, 1, 0, 1, 0, 0, 0]
+    expected = [0, 1, 0, 1, 0, 0, 1, 1, 0, 0]
     eq_(expected, [ind.ibea_fitness for ind in parents])
+
+
+@attr('unit')
+def test_mating_selection_rndstate():
+    """selIBEA: test if mating selection is reproducible from rndstate"""
+    population = make_mock_population(population_count=20)
+    state = random.getstate()
+    parents = _mating_selection(population, 50, 4)
+    random.setstate(state)
+    eq_(parents, _mating_selection(population, 50, 4))
+
+
+@attr('unit')
+def test_environmental_selection():
+    """selIBEA: test environmental selection"""
+    population = make_mock_population(population_count=20)
+    random.shuffle(population)
+    selected = _environmental_selection(population, 5)
+    eq_([ind.ibea_fitness for ind in selected], [0, 1, 2, 3, 4])
+    eq_([ind.ibea_fitness for ind in population], list(range(20)))
@@ -0,0 +1,103 @@
+"""bluepyopt.ephys.distributions tests"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+# pylint:disable=W0612
+
+import math  # NOQA
+
+import numpy
+import nose.tools as nt
+from nose.plugins.attrib import attr
+
+from bluepyopt.ephys import distributions
+
+L5PC_DISTRIBUTION = \
+    '(-0.8696 + 2.087*math.exp(({distance})*0.0031))*{value}'
+
+
+@attr('unit')
+def test_compiled_distribution():
+    """ephys.distributions: test evaluating a compiled distribution"""
+
+    compiled = distributions.compile_distribution(L5PC_DISTRIBUTION)
+    nt.assert_true(
+        compiled is distributions.compile_distribution(L5PC_DISTRIBUTION))
+
+    distances = [0.0, 1.0, 12.5, 345.678]
+    for value in [2.0, 3e-05]:
+        expected = [eval(L5PC_DISTRIBUTION.format(
+            distance=distributions.FLOAT_FORMAT % distance,
+            value=distributions.FLOAT_FORMAT % value))
+            for distance in distances]
+        nt.assert_equal(
+            [compiled.evaluate(distance, value) for distance in distances],
+            expected)
+        nt.assert_equal(
+            list(compiled.evaluate_array(distances[2:], value)),
+            expected[2:])
+
+    compiled = distributions.compile_distribution('{value} / 2')
+    nt.assert_equal(compiled.evaluate(10.0, 3.0), 1)
+    numpy.testing.assert_array_equal(
+        compiled.evaluate_array([1.5, 2.5], 3.5), [1.75, 1.75])
+
+    # Negative and non-finite numbers are rejected
+    for distance, value in [(-1.0, 3.0), (1.0, -3.0), (float('nan'), 3.0),
+                            (1.0, float('inf'))]:
+        nt.assert_raises(ValueError, compiled.evaluate, distance, value)
+        nt.assert_raises(
+            ValueError, compiled.evaluate_array, [distance], value)
+
+
+@attr('unit')
+def test_hoc_expression():
+    """ephys.distributions: test hoc expression of a distribution"""
+
+    compiled = distributions.compile_distribution(L5PC_DISTRIBUTION)
+    nt.assert_equal(
+        compiled.hoc_expression(2.0),
+        '((-0.8696 + (2.087 * exp((%.17g * 0.0031)))) * 2)')
+
+    compiled = distributions.compile_distribution(
+        'math.fabs({distance}) ** 2 * math.pi')
+    nt.assert_equal(compiled.hoc_expression(1.0), '((abs(%.17g) ^ 2) * PI)')
+
+    # Long integers don't get a suffix
+    compiled = distributions.compile_distribution(
+        '{distance} * 100000000000000000000')
+    nt.assert_equal(
+        compiled.hoc_expression(1.0), '(%.17g * 100000000000000000000)')
+
+
+@attr('unit')
+def test_unsupported_expression():
+    """ephys.distributions: test rejecting unsupported expressions"""
+
+    for distribution in ['{value} if {distance} > 1 else 0',
+                         '__import__("os").getcwd()',
+                         'math.floor({distance})',
+                         '{distance} % 2',
+                         '{unknown}',
+                         '{distance} +']:
+        nt.assert_raises(
+            distributions.UnsupportedExpressionError,
+            distributions.compile_distribution,
+            distribution)
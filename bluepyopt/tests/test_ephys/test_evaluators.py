@@ -0,0 +1,155 @@
+"""bluepyopt.ephys.evaluators tests"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+# pylint:disable=W0612
+
+import mock
+import nose.tools as nt
+from nose.plugins.attrib import attr
+
+import bluepyopt
+from bluepyopt import ephys
+
+
+def _staged_evaluator(stages):
+    """Create a CellEvaluator with fake protocols and the given stages"""
+
+    protocols = {}
+    objectives = []
+    for name in ['step', 'bAP', 'noise']:
+        protocols[name] = mock.Mock()
+        protocols[name].run.return_value = {'%s.v' % name: 10.0}
+
+        objective = bluepyopt.objectives.Objective(name)
+        objective.calculate_score = \
+            lambda responses, key='%s.v' % name: responses[key]
+        objectives.append(objective)
+
+    cell_model = mock.Mock()
+    cell_model.params_by_names.return_value = [
+        bluepyopt.parameters.Parameter('par')]
+
+    return ephys.evaluators.CellEvaluator(
+        cell_model=cell_model,
+        param_names=['par'],
+        fitness_protocols=protocols,
+        fitness_calculator=ephys.objectivescalculators.ObjectivesCalculator(
+            objectives),
+        isolate_protocols=False,
+        sim=mock.Mock(),
+        stages=stages)
+
+
+@attr('unit')
+def test_cellevaluator_stages():
+    """ephys.evaluators: test staged evaluation"""
+
+    evaluator = _staged_evaluator([
+        ephys.evaluators.EvaluationStage(['step'], ['step'], threshold=5.0,
+                                         penalty=100.0)])
+    nt.assert_equal(evaluator.evaluate_with_dicts({'par': 1.0}),
+                    {'step': 10.0, 'bAP': 100.0, 'noise': 100.0})
+    nt.assert_false(evaluator.fitness_protocols['bAP'].run.called)
+
+    evaluator = _staged_evaluator([
+        ephys.evaluators.EvaluationStage(['step'], ['step'], threshold=20.0),
+        ephys.evaluators.EvaluationStage(['bAP'], ['bAP'], threshold=5.0)])
+    nt.assert_equal(evaluator.evaluate_with_dicts({'par': 1.0}),
+                    {'step': 10.0, 'bAP': 10.0, 'noise': 250.0})
+    nt.assert_false(evaluator.fitness_protocols['noise'].run.called)
+
+    evaluator = _staged_evaluator([
+        ephys.evaluators.EvaluationStage(['step'], ['step'], threshold=20.0)])
+    nt.assert_equal(evaluator.evaluate_with_dicts({'par': 1.0}),
+                    {'step': 10.0, 'bAP': 10.0, 'noise': 10.0})
+
+    nt.assert_raises(ValueError, _staged_evaluator, [
+        ephys.evaluators.EvaluationStage(['unknown'], ['step'])])
+    nt.assert_raises(ValueError, _staged_evaluator, [
+        ephys.evaluators.EvaluationStage(['step'], ['unknown'])])
+
+
+@attr('unit')
+def test_cellevaluator_timeout():
+    """ephys.evaluators: test protocol timeouts"""
+
+    evaluator = _staged_evaluator(None)
+    evaluator.protocol_timeout = 10.0
+
+    recording = mock.Mock()
+    recording.name = 'bAP.v'
+    bap_protocol = evaluator.fitness_protocols['bAP']
+    bap_protocol.run.side_effect = ephys.workers.EvaluationTimeout()
+    bap_protocol.subprotocols.return_value = {
+        'bAP': mock.Mock(recordings=[recording])}
+    evaluator.fitness_calculator.objectives[1].calculate_score = \
+        lambda responses: 250.0 if responses['bAP.v'] is None else 0.0
+
+    nt.assert_equal(evaluator.evaluate_with_dicts({'par': 1.0}),
+                    {'step': 10.0, 'bAP': 250.0, 'noise': 10.0})
+    nt.assert_equal(bap_protocol.run.call_args[1]['timeout'], 10.0)
+    nt.assert_equal(evaluator.evaluation_statistics(), {'timeouts': 1})
+    nt.assert_equal(evaluator.evaluation_statistics(), {'timeouts': 0})
+
+    # The timeouts in the chunks are counted by evaluate_population
+    evaluator.evaluate_population([[1.0], [2.0]])
+    nt.assert_equal(evaluator.timeout_count, 2)
+
+    nt.assert_raises(ValueError, ephys.evaluators.CellEvaluator,
+                     cell_model=evaluator.cell_model,
+                     param_names=['par'],
+                     fitness_protocols=evaluator.fitness_protocols,
+                     fitness_calculator=evaluator.fitness_calculator,
+                     isolate_protocols=False,
+                     sim=mock.Mock(),
+                     protocol_timeout=10.0)
+
+
+@attr('unit')
+def test_cellevaluator_pack_chunks_unsupported():
+    """ephys.evaluators: test pack_chunks with unsupported features"""
+
+    def create_evaluator(termination_criteria, reuse_instance):
+        """Create a packing CellEvaluator"""
+        protocol = ephys.protocols.SweepProtocol(
+            name='step', stimuli=[], recordings=[],
+            termination_criteria=termination_criteria)
+        cell_model = mock.Mock()
+        cell_model.reuse_instance = reuse_instance
+        cell_model.params_by_names.return_value = [
+            bluepyopt.parameters.Parameter('par')]
+        calculator = ephys.objectivescalculators.ObjectivesCalculator([])
+
+        return ephys.evaluators.CellEvaluator(
+            cell_model=cell_model,
+            param_names=['par'],
+            fitness_protocols={'step': protocol},
+            fitness_calculator=calculator,
+            isolate_protocols=False,
+            sim=mock.Mock(),
+            pack_chunks=True)
+
+    nt.assert_true(create_evaluator(None, False).pack_chunks)
+
+    criterion = ephys.terminations.NoSpikeCriterion(
+        'no_spike', deadline=50.0)
+    nt.assert_raises(ValueError, create_evaluator, [criterion], False)
+    nt.assert_raises(ValueError, create_evaluator, None, True)
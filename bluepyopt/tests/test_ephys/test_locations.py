@@ -87,6 +87,211 @@ class TestNrnSomaDistanceCompLocation(object):
         nt.assert_equal(comp, dend2(0.5))
 
 
+@attr('unit')
+def test_section_list():
+    """ephys.locations: test the section index of instantiated cells"""
+
+    class Cell(object):
+
+        """Cell class that counts the traversals of its section list"""
+
+        def __init__(self, name):
+            self.name = name
+            self.sections = ['dend1', 'dend2']
+            self.traversals = 0
+
+        def hname(self):
+            """Hoc name"""
+            return self.name
+
+        @property
+        def basal(self):
+            """Section list"""
+            self.traversals += 1
+            return iter(self.sections)
+
+    from bluepyopt.ephys.locations import (
+        section_list, invalidate_section_index)
+
+    cell = Cell('Cell[0]')
+    invalidate_section_index()
+
+    nt.assert_equal(section_list(cell, 'basal'), ['dend1', 'dend2'])
+    nt.assert_equal(section_list(cell, 'basal'), ['dend1', 'dend2'])
+    nt.assert_equal(cell.traversals, 1)
+
+    location = ephys.locations.NrnSeclistSecLocation(
+        'test', seclist_name='basal', sec_index=1)
+    nt.assert_equal(location.instantiate(icell=cell), 'dend2')
+    nt.assert_equal(cell.traversals, 1)
+
+    cell.sections.append('dend3')
+    invalidate_section_index(cell)
+    nt.assert_equal(
+        section_list(cell, 'basal'), ['dend1', 'dend2', 'dend3'])
+    nt.assert_equal(cell.traversals, 2)
+
+    invalidate_section_index()
+    section_list(cell, 'basal')
+    nt.assert_equal(cell.traversals, 3)
+
+    invalidate_section_index()
+
+
+class _FakeSegment(object):
+
+    """Segment of a _FakeSection"""
+
+    def __init__(self, section, x):
+        self.section = section
+        self.x = x
+        self.diam = section.diam
+
+    def __eq__(self, other):
+        return (self.section, self.x) == (other.section, other.x)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class _FakeSection(object):
+
+    """Section between two distances from the soma"""
+
+    def __init__(self, name, start, end, diam=1.0):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.diam = diam
+
+    def __call__(self, x):
+        return _FakeSegment(self, x)
+
+
+class _FakeHoc(object):
+
+    """Hoc interpreter that returns the distances of _FakeSections"""
+
+    def __init__(self):
+        self.distance_calls = 0
+
+    def distance(self, mode, x, sec=None):
+        """Distance from the origin"""
+        self.distance_calls += 1
+        if mode == 0:
+            return 0.0
+        return sec.start + x * (sec.end - sec.start)
+
+
+@attr('unit')
+def test_soma_distance_index():
+    """ephys.locations: test SomaDistanceIndex"""
+
+    import mock
+
+    sections = [
+        _FakeSection('dend0', 0.0, 100.0),
+        _FakeSection('dend1', 100.0, 250.0),
+        _FakeSection('dend2', 100.0, 300.0),
+        _FakeSection('dend3', 300.0, 350.0, diam=0.0),
+        _FakeSection('dend4', 400.0, 300.0),
+        _FakeSection('dend5', 20.0, 60.0),
+    ]
+
+    cell = mock.Mock()
+    cell.hname.return_value = 'Cell[1]'
+    cell.soma = [_FakeSection('soma', 0.0, 0.0)]
+    cell.apical = sections
+
+    sim = mock.Mock()
+    sim.neuron.h = _FakeHoc()
+
+    def scan(soma_distance):
+        """Segment found by scanning all the sections"""
+        icomp = None
+        for isec in sections:
+            min_distance = min(isec.start, isec.end)
+            max_distance = max(isec.start, isec.end)
+            if min_distance <= soma_distance <= isec.end:
+                comp_x = float(soma_distance - min_distance) / \
+                    (max_distance - min_distance)
+                if isec(comp_x).diam > 0.0:
+                    icomp = isec(comp_x)
+        return icomp
+
+    ephys.locations.invalidate_section_index()
+
+    distances = [0.0, 50.0, 100.0, 200.0, 275.0, 300.0]
+    index = ephys.locations.soma_distance_index(sim, cell, 'apical')
+    nt.assert_equal(index.segments(distances),
+                    [scan(distance) for distance in distances])
+    nt.assert_equal(index.segment(200.0), sections[2](0.5))
+
+    nt.assert_raises(Exception, index.segment, 325.0)
+    nt.assert_raises(Exception, index.segment, 500.0)
+
+    # The distances are only computed once per section
+    distance_calls = sim.neuron.h.distance_calls
+    for soma_distance in distances:
+        location = ephys.locations.NrnSomaDistanceCompLocation(
+            'test', soma_distance, 'apical')
+        nt.assert_equal(
+            location.instantiate(sim=sim, icell=cell), scan(soma_distance))
+    nt.assert_equal(sim.neuron.h.distance_calls, distance_calls)
+
+    ephys.locations.invalidate_section_index(cell)
+    nt.assert_true(
+        ephys.locations.soma_distance_index(sim, cell, 'apical') is not index)
+
+    ephys.locations.invalidate_section_index()
+
+
+@attr('unit')
+def test_soma_distance_index_random():
+    """ephys.locations: test SomaDistanceIndex against a linear scan"""
+
+    import random
+    import mock
+
+    random.seed(1)
+    sections = []
+    for index in range(200):
+        start = random.uniform(0.0, 1000.0)
+        end = start + random.choice([-1.0, 1.0]) * random.uniform(0.1, 500.0)
+        sections.append(_FakeSection(
+            'dend%d' % index, start, end, diam=random.choice([0.0, 1.0])))
+
+    # Long sections like the apical trunk
+    sections.insert(0, _FakeSection('trunk0', 0.0, 800.0))
+    sections.insert(100, _FakeSection('trunk1', 10.0, 900.0))
+
+    cell = mock.Mock()
+    cell.soma = [_FakeSection('soma', 0.0, 0.0)]
+    cell.apical = sections
+    del cell.hname
+
+    sim = mock.Mock()
+    sim.neuron.h = _FakeHoc()
+
+    index = ephys.locations.SomaDistanceIndex(sim, cell, 'apical')
+
+    distances = [random.uniform(0.0, 950.0) for _ in range(100)] + \
+        [section.start for section in sections[:20]]
+
+    expected = []
+    for soma_distance in distances:
+        found = sorted(
+            (interval[3] for interval in index.intervals
+             if interval[0] <= soma_distance <= interval[1]))
+        nt.assert_equal(
+            sorted(interval[3]
+                   for interval in index.sections_at(soma_distance)),
+            found)
+        expected.append(index.segment(soma_distance))
+
+    nt.assert_equal(index.segments(distances), expected)
+
+
 def test_serialize():
     """ephys.locations: Test serialize functionality"""
     from bluepyopt.ephys.locations import (
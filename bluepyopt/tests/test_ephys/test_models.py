@@ -147,3 +147,204 @@ def test_CellModel_destroy():
 
     cell_model1.destroy(sim=sim)
     nt.assert_equal(0, len(sim.neuron.h.CellModel_destroy))
+
+
+@attr('unit')
+def test_CellModel_reuse_instance():
+    """ephys.models: Test CellModel reuse_instance"""
+
+    def create_cell_model(reuse_instance, check_param_diff=False):
+        """Create a cell model with a parameter"""
+        somatic_loc = ephys.locations.NrnSeclistLocation(
+            'somatic', seclist_name='somatic')
+        mech = ephys.mechanisms.NrnMODMechanism(
+            'pas', prefix='pas', locations=[somatic_loc])
+        param = ephys.parameters.NrnRangeParameter(
+            'g_pas', param_name='g_pas', bounds=[0.0, 1.0],
+            locations=[somatic_loc])
+        return ephys.models.CellModel(
+            'CellModel_reuse',
+            morph=ephys.morphologies.NrnFileMorphology(MORPHOLOGY_PATH),
+            mechs=[mech],
+            params=[param],
+            reuse_instance=reuse_instance,
+            check_param_diff=check_param_diff)
+
+    def snapshot(cell_model, g_pas):
+        """Snapshot of cell instantiated with g_pas"""
+        cell_model.freeze({'g_pas': g_pas})
+        cell_model.instantiate(sim=sim)
+        state = cell_model.instance_snapshot(sim=sim)
+        cell_model.destroy(sim=sim)
+        cell_model.unfreeze(['g_pas'])
+        return state
+
+    fresh_model = create_cell_model(False)
+    reused_model = create_cell_model(True, check_param_diff=True)
+
+    nt.assert_equal(snapshot(reused_model, 0.1), snapshot(fresh_model, 0.1))
+
+    # The cell is kept in the simulator
+    nt.assert_equal(1, len(sim.neuron.h.CellModel_reuse))
+    nt.assert_true(ephys.models.reused_section_count() > 0)
+
+    # The state of the reused cell is identical to a fresh instantiation
+    nt.assert_equal(snapshot(reused_model, 0.2), snapshot(fresh_model, 0.2))
+    nt.assert_equal(1, len(sim.neuron.h.CellModel_reuse))
+
+    # Parameters with unchanged values are not applied again
+    nt.assert_equal(snapshot(reused_model, 0.2), snapshot(fresh_model, 0.2))
+
+    ephys.models.destroy_reused_instances(sim=sim)
+    nt.assert_equal(0, len(sim.neuron.h.CellModel_reuse))
+    nt.assert_equal(0, ephys.models.reused_section_count())
+
+
+@attr('unit')
+def test_CellModel_reuse_instance_geometry():
+    """ephys.models: Test CellModel reuse_instance with geometry parameters"""
+
+    def create_cell_model(reuse_instance):
+        """Create a cell model with a parameter that depends on the soma
+        distance, followed by a parameter that changes the geometry"""
+        all_loc = ephys.locations.NrnSeclistLocation(
+            'all', seclist_name='all')
+        basal_loc = ephys.locations.NrnSeclistLocation(
+            'basal', seclist_name='basal')
+        mech = ephys.mechanisms.NrnMODMechanism(
+            'pas', prefix='pas', locations=[all_loc])
+        params = [
+            ephys.parameters.NrnRangeParameter(
+                'g_pas', param_name='g_pas', bounds=[0.0, 1.0],
+                value_scaler=ephys.parameterscalers.
+                NrnSegmentSomaDistanceScaler(
+                    distribution='{value} * (1.0 + {distance})'),
+                locations=[all_loc]),
+            ephys.parameters.NrnSectionParameter(
+                'L.basal', param_name='L', bounds=[10.0, 100.0],
+                locations=[basal_loc])]
+        return ephys.models.CellModel(
+            'CellModel_reuse_geometry',
+            morph=ephys.morphologies.NrnFileMorphology(MORPHOLOGY_PATH),
+            mechs=[mech],
+            params=params,
+            reuse_instance=reuse_instance)
+
+    def snapshot(cell_model, values):
+        """Snapshot of cell instantiated with values"""
+        cell_model.freeze(values)
+        cell_model.instantiate(sim=sim)
+        state = cell_model.instance_snapshot(sim=sim)
+        cell_model.destroy(sim=sim)
+        cell_model.unfreeze(values.keys())
+        return state
+
+    reused_model = create_cell_model(True)
+
+    snapshot(reused_model, {'g_pas': 0.1, 'L.basal': 50.0})
+
+    # The cell is not kept, the geometry has been changed
+    nt.assert_equal(0, ephys.models.reused_section_count())
+
+    values = {'g_pas': 0.2, 'L.basal': 50.0}
+    nt.assert_equal(
+        snapshot(reused_model, values),
+        snapshot(create_cell_model(False), values))
+
+
+@attr('unit')
+def test_CellModel_changed_params():
+    """ephys.models: Test CellModel changed_params"""
+
+    somatic_loc = ephys.locations.NrnSeclistLocation(
+        'somatic', seclist_name='somatic')
+    all_loc = ephys.locations.NrnSeclistLocation('all', seclist_name='all')
+
+    params = [
+        ephys.parameters.NrnGlobalParameter(
+            'celsius', param_name='celsius', value=34.0, frozen=True),
+        ephys.parameters.NrnRangeParameter(
+            'g_pas.all', param_name='g_pas', value=1e-5, frozen=True,
+            locations=[all_loc]),
+        ephys.parameters.NrnRangeParameter(
+            'gbar_NaTs2_t.somatic', param_name='gbar_NaTs2_t',
+            bounds=[0.0, 1.0], locations=[somatic_loc]),
+        ephys.parameters.NrnRangeParameter(
+            'g_pas.somatic', param_name='g_pas', bounds=[0.0, 1.0],
+            locations=[somatic_loc]),
+        ephys.parameters.NrnSectionParameter(
+            'Ra.all', param_name='Ra', bounds=[50.0, 150.0],
+            locations=[all_loc]),
+        ephys.parameters.NrnRangeParameter(
+            'gbar_Ih.all', param_name='gbar_Ih', value=1e-4, frozen=True,
+            locations=[all_loc]),
+    ]
+    cell_model = ephys.models.CellModel(
+        'CellModel_changed', morph=None, mechs=[], params=params)
+
+    def changed_names(values, applied_params):
+        """Names of the parameters to apply for values"""
+        cell_model.freeze(values)
+        changed = cell_model.changed_params(applied_params)
+        cell_model.unfreeze(values.keys())
+        return [param.name for param in changed]
+
+    values = {'gbar_NaTs2_t.somatic': 0.1, 'g_pas.somatic': 0.2,
+              'Ra.all': 100.0}
+    cell_model.freeze(values)
+    applied_params = cell_model.param_states()
+    cell_model.unfreeze(values.keys())
+
+    # Global parameters are always applied
+    nt.assert_equal(changed_names(values, applied_params), ['celsius'])
+
+    # Every parameter is applied to a cell that has no applied values
+    nt.assert_equal(
+        changed_names(values, {}), [param.name for param in params])
+
+    # A changed parameter is applied with the parameters that overwrite it
+    value, definition = applied_params['g_pas.all']
+    applied_params['g_pas.all'] = (2e-5, definition)
+    nt.assert_equal(
+        changed_names(values, applied_params),
+        ['celsius', 'g_pas.all', 'g_pas.somatic'])
+    applied_params['g_pas.all'] = (value, definition)
+
+    changed_values = dict(values)
+    changed_values['gbar_NaTs2_t.somatic'] = 0.3
+    nt.assert_equal(
+        changed_names(changed_values, applied_params),
+        ['celsius', 'gbar_NaTs2_t.somatic'])
+
+    # A parameter with a changed definition is applied
+    params[2].locations = [all_loc]
+    nt.assert_equal(
+        changed_names(values, applied_params),
+        ['celsius', 'gbar_NaTs2_t.somatic'])
+    params[2].locations = [somatic_loc]
+
+    # A changed section parameter is applied with the parameters that
+    # overwrite it
+    changed_values = dict(values)
+    changed_values['Ra.all'] = 120.0
+    nt.assert_equal(
+        changed_names(changed_values, applied_params),
+        ['celsius', 'Ra.all'])
+
+    # The soma distances are cleared when the geometry can have changed
+    params.append(ephys.parameters.NrnSectionParameter(
+        'L.somatic', param_name='L', value=20.0, frozen=True,
+        locations=[somatic_loc]))
+    import mock
+    with mock.patch.object(
+            ephys.parameterscalers, 'clear_distance_cache') as clear, \
+            mock.patch.object(
+                ephys.parameters.NrnGlobalParameter, 'instantiate'), \
+            mock.patch.object(
+                ephys.parameters.NrnSectionParameter, 'instantiate'), \
+            mock.patch.object(
+                ephys.parameters.NrnRangeParameter, 'instantiate'):
+        cell_model._apply_params(params[:6])
+        nt.assert_equal(clear.call_count, 0)
+        cell_model._apply_params(params)
+        nt.assert_equal(clear.call_count, 1)
@@ -2,6 +2,8 @@
 
 import json
 import os
+import shutil
+import tempfile
 
 import nose.tools as nt
 from nose.plugins.attrib import attr
@@ -47,6 +49,40 @@ def test_nrnfilemorphology_init():
     morph.destroy(sim=sim)
 
 
+@attr('unit')
+def test_nrnfilemorphology_cache():
+    """ephys.morphologies: testing parsed morphology cache"""
+    sim = ephys.simulators.NrnSimulator()
+
+    def snapshot(morph):
+        """Snapshot of a cell with morph"""
+        cell_model = ephys.models.CellModel(
+            'morphology_cache', morph=morph, mechs=[], params=[])
+        cell_model.instantiate(sim=sim)
+        state = cell_model.instance_snapshot(sim=sim)
+        cell_model.destroy(sim=sim)
+        return state
+
+    fresh_snapshot = snapshot(ephys.morphologies.NrnFileMorphology(
+        simpleswc_morphpath, use_cache=False))
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        morph = ephys.morphologies.NrnFileMorphology(
+            simpleswc_morphpath, cache_dir=cache_dir)
+        nt.assert_equal(snapshot(morph), fresh_snapshot)
+
+        # Instantiation from the in-memory cache
+        nt.assert_equal(snapshot(morph), fresh_snapshot)
+        nt.assert_equal(len(os.listdir(cache_dir)), 1)
+
+        # Instantiation from the on-disk cache
+        ephys.morphologies._parsed_morphologies.clear()
+        nt.assert_equal(snapshot(morph), fresh_snapshot)
+    finally:
+        shutil.rmtree(cache_dir)
+
+
 def test_serialize():
     """ephys.morphology: testing serialization"""
 
@@ -16,3 +16,28 @@ def test_serialize():
         deserialized = instantiator(serialized)
         nt.ok_(isinstance(deserialized, param.__class__))
         nt.eq_(deserialized.name, param.__class__.__name__)
+
+
+def test_range_parameter_scaler():
+    """ephys.parameters: test range parameter with a scaler without
+    scale_section"""
+
+    import mock
+
+    class OffsetScaler(object):
+
+        """Scaler that only implements scale"""
+
+        def scale(self, value, segment, sim=None):
+            return value + segment.x
+
+    section = [mock.Mock(x=0.25), mock.Mock(x=0.75)]
+    location = mock.Mock()
+    location.instantiate.return_value = [section]
+
+    param = ephys.parameters.NrnRangeParameter(
+        'gbar_test', value=1.0, param_name='gbar_test',
+        value_scaler=OffsetScaler(), locations=[location])
+    param.instantiate(sim=None, icell=None)
+
+    nt.eq_([seg.gbar_test for seg in section], [1.25, 1.75])
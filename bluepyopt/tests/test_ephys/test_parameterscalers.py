@@ -1,6 +1,7 @@
 import json
 
 import nose.tools as nt
+from nose.plugins.attrib import attr
 
 from bluepyopt.ephys.parameterscalers import (NrnSegmentLinearScaler,
                                               NrnSegmentSomaDistanceScaler, )
@@ -20,3 +21,68 @@ def test_serialize():
         deserialized = instantiator(serialized)
         nt.ok_(isinstance(deserialized, ps.__class__))
         nt.eq_(deserialized.name, ps.__class__.__name__)
+
+
+@attr('unit')
+def test_soma_distance_scale_distances():
+    """ephys.parameterscalers: test scaling values for a table of distances"""
+
+    import random
+
+    distributions = [
+        '(-0.8696 + 2.087*math.exp(({distance})*0.0031))*{value}',
+        '{value} * (1 + {distance} / 100)',
+        '{value} / 3 + {distance} % 7 - {distance}**2',
+        '{value} if {distance} > 100 else 0',
+        '1 / {distance}',
+        '0.5']
+
+    random.seed(1)
+    distances = [0.0, 1.0, 17.5] + \
+        [random.uniform(0, 1000) for _ in range(20)]
+
+    for distribution in distributions:
+        scaler = NrnSegmentSomaDistanceScaler(distribution=distribution)
+        for value in [2.0, 0.003, -1.5, 0.0]:
+            for section_distances in [distances[1:], distances[3:]]:
+                expected = [scaler._eval_formatted(value, distance)
+                            for distance in section_distances]
+                nt.eq_(scaler.scale_distances(value, section_distances),
+                       expected)
+
+            if distribution == '1 / {distance}':
+                nt.assert_raises(ZeroDivisionError, scaler.scale_distances,
+                                 value, distances)
+
+
+@attr('unit')
+def test_scale_section():
+    """ephys.parameterscalers: test scaling values for a section"""
+
+    import mock
+
+    section = [mock.Mock(x=0.25), mock.Mock(x=0.75)]
+
+    scaler = NrnSegmentLinearScaler(multiplier=2.0, offset=1.0)
+    nt.eq_(scaler.scale_section(3.0, section), [7.0, 7.0])
+
+    # The distances of the segments are taken from the table
+    scaler = NrnSegmentSomaDistanceScaler(
+        distribution='{value} * {distance}')
+    with mock.patch(
+            'bluepyopt.ephys.parameterscalers.section_soma_distances',
+            return_value=[10.5, 20.5]):
+        nt.eq_(scaler.scale_section(2.0, section), [21.0, 41.0])
+
+    # Subclasses that override scale are used for every segment
+    class SegmentScaler(NrnSegmentSomaDistanceScaler):
+
+        """Scaler based on the position of the segment"""
+
+        USE_DISTANCE_TABLE = False
+
+        def scale(self, value, segment, sim=None):
+            return value * segment.x
+
+    scaler = SegmentScaler(distribution='{value} * {distance}')
+    nt.eq_(scaler.scale_section(2.0, section), [0.5, 1.5])
@@ -0,0 +1,218 @@
+"""bluepyopt.ephys.protocols tests"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+# pylint:disable=W0612
+
+import mock
+import nose.tools as nt
+from nose.plugins.attrib import attr
+
+from bluepyopt import ephys
+
+
+def _sweep_protocol(name):
+    """Create a SweepProtocol with a fake stimulus and recording"""
+
+    stimulus = mock.Mock(total_duration=100)
+    recording = mock.Mock(response='%s response' % name)
+    recording.name = '%s.v' % name
+    return ephys.protocols.SweepProtocol(
+        name=name, stimuli=[stimulus], recordings=[recording])
+
+
+@attr('unit')
+def test_run_on_shared_cell():
+    """ephys.protocols: test running protocols on a shared cell"""
+
+    protocols = [
+        _sweep_protocol('step1'),
+        ephys.protocols.SequenceProtocol(
+            'sequence',
+            protocols=[_sweep_protocol('step2'), _sweep_protocol('step3')])]
+
+    cell_model = mock.Mock()
+    sim = mock.Mock()
+    timings = ephys.timings.EvaluationTimings()
+
+    responses = ephys.protocols.run_on_shared_cell(
+        protocols, cell_model, {'par': 1.0}, sim=sim, isolate=False,
+        timings=timings)
+
+    nt.assert_equal(responses, {'step1.v': 'step1 response',
+                                'step2.v': 'step2 response',
+                                'step3.v': 'step3 response'})
+    nt.assert_equal(cell_model.instantiate.call_count, 1)
+    nt.assert_equal(cell_model.destroy.call_count, 1)
+    nt.assert_equal(cell_model.reset_mechanisms.call_count, 2)
+    nt.assert_equal(sim.run.call_count, 3)
+    nt.assert_equal(
+        timings.as_dict()['step2']['simulation']['count'], 1)
+
+    nt.assert_raises(
+        TypeError,
+        ephys.protocols.run_on_shared_cell,
+        [ephys.protocols.Protocol('protocol')], cell_model, {},
+        sim=sim, isolate=False)
+
+
+@attr('unit')
+def test_termination_criteria():
+    """ephys.protocols: test early termination of a SweepProtocol"""
+
+    criterion = mock.Mock()
+    criterion.name = 'criterion'
+    protocol = _sweep_protocol('step')
+    protocol.termination_criteria = [criterion]
+
+    cell_model = mock.Mock()
+    sim = mock.Mock()
+
+    sim.run.return_value = None
+    responses = protocol.run_on_cell(cell_model, {}, sim=sim)
+    nt.assert_equal(responses, {'step.v': 'step response'})
+    nt.assert_equal(
+        sim.run.call_args[1]['termination_criteria'], [criterion])
+    nt.assert_equal(criterion.instantiate.call_count, 1)
+    nt.assert_equal(criterion.destroy.call_count, 1)
+
+    sim.run.return_value = criterion
+    responses = protocol.run_on_cell(cell_model, {}, sim=sim)
+    nt.assert_equal(responses, {'step.v': None})
+
+
+class _FakeCellModel(object):
+
+    """Cell model that instantiates its parameter values as icell"""
+
+    def __init__(self):
+        self.name = 'cell'
+        self.gid = 10
+        self.params = {'par': ephys.parameters.NrnGlobalParameter('par')}
+        self.icell = None
+        self.param_values = None
+        self.instantiated_gids = []
+        self.destroyed = []
+
+    def freeze(self, param_values):
+        self.param_values = param_values
+
+    def unfreeze(self, _):
+        self.param_values = None
+
+    def instantiate(self, sim=None):
+        self.icell = self.param_values['value']
+        self.instantiated_gids.append(self.gid)
+
+    def reset_mechanisms(self, sim=None):
+        pass
+
+    def destroy(self, sim=None):
+        self.destroyed.append(self.icell)
+        self.icell = None
+
+
+class _FakeRecording(object):
+
+    """Recording with the icell it was instantiated on as response"""
+
+    def __init__(self, name):
+        self.name = name
+        self.response = None
+
+    def instantiate(self, sim=None, icell=None):
+        self.response = icell
+
+    def destroy(self, sim=None):
+        self.response = None
+
+
+class _FakeStimulus(object):
+
+    """Stimulus that does nothing"""
+
+    total_duration = 100
+
+    def instantiate(self, sim=None, icell=None):
+        pass
+
+    def destroy(self, sim=None):
+        pass
+
+
+@attr('unit')
+def test_run_packed():
+    """ephys.protocols: test running packed copies of a cell"""
+
+    protocols = [
+        ephys.protocols.SweepProtocol(
+            name=name, stimuli=[_FakeStimulus()],
+            recordings=[_FakeRecording(name)])
+        for name in ['step1', 'step2']]
+
+    cell_model = _FakeCellModel()
+    sim = mock.Mock()
+
+    responses_list = ephys.protocols.run_packed(
+        protocols, cell_model,
+        [{'value': 1.0}, {'value': 2.0}, {'value': 3.0}],
+        sim=sim, isolate=False)
+
+    nt.assert_equal(responses_list, [{'step1': 1.0, 'step2': 1.0},
+                                     {'step1': 2.0, 'step2': 2.0},
+                                     {'step1': 3.0, 'step2': 3.0}])
+    nt.assert_equal(sim.run.call_count, 2)
+    nt.assert_equal(cell_model.instantiated_gids, [10, 11, 12])
+    nt.assert_equal(cell_model.gid, 10)
+    nt.assert_equal(cell_model.destroyed, [1.0, 2.0, 3.0])
+
+    nt.assert_raises(
+        ValueError, ephys.protocols.run_packed, protocols, cell_model,
+        [{'par': 1.0, 'value': 1.0}, {'par': 2.0, 'value': 2.0}],
+        sim=sim, isolate=False)
+
+
+@attr('unit')
+def test_run_packed_unsupported():
+    """ephys.protocols: test packing with unsupported features"""
+
+    protocols = [
+        ephys.protocols.SweepProtocol(
+            name=name, stimuli=[_FakeStimulus()],
+            recordings=[_FakeRecording(name)])
+        for name in ['step1', 'step2']]
+    param_values_list = [{'value': 1.0}, {'value': 2.0}]
+
+    # Termination criteria
+    cell_model = _FakeCellModel()
+    protocols[1].termination_criteria = [
+        ephys.terminations.NoSpikeCriterion('no_spike', deadline=50.0)]
+    nt.assert_raises(
+        ValueError, ephys.protocols.run_packed, protocols, cell_model,
+        param_values_list, sim=mock.Mock(), isolate=False)
+    nt.assert_equal(cell_model.instantiated_gids, [])
+    protocols[1].termination_criteria = []
+
+    # Cell model that reuses its instance
+    cell_model.reuse_instance = True
+    nt.assert_raises(
+        ValueError, ephys.protocols.run_packed, protocols, cell_model,
+        param_values_list, sim=mock.Mock(), isolate=False)
+    nt.assert_equal(cell_model.instantiated_gids, [])
@@ -0,0 +1,123 @@
+"""bluepyopt.ephys.responses tests"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+# pylint:disable=W0612
+
+import os
+import shutil
+import tempfile
+
+import numpy
+import nose.tools as nt
+from nose.plugins.attrib import attr
+
+from bluepyopt.ephys.responses import TimeVoltageResponse
+
+testdata_dir = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'testdata')
+
+
+@attr('unit')
+def test_timevoltageresponse():
+    """ephys.responses: test TimeVoltageResponse arrays"""
+
+    response = TimeVoltageResponse('test', [0.0, 0.1, 0.2], [-65, -64, -63])
+    nt.assert_true(isinstance(response['time'], numpy.ndarray))
+    nt.assert_equal(response['voltage'].dtype, numpy.float64)
+    nt.assert_equal(list(response['voltage']), [-65.0, -64.0, -63.0])
+    nt.assert_raises(KeyError, response.__getitem__, 'current')
+
+    dataframe = response.response
+    nt.assert_equal(list(dataframe.columns), ['time', 'voltage'])
+    nt.assert_equal(list(dataframe['time']), [0.0, 0.1, 0.2])
+
+
+@attr('unit')
+def test_timevoltageresponse_detach():
+    """ephys.responses: test detaching TimeVoltageResponse from buffers"""
+
+    buffer_time = numpy.arange(5, dtype=numpy.float64)
+    buffer_voltage = numpy.zeros(5)
+
+    # Arrays that are passed are not copied
+    response = TimeVoltageResponse(
+        'test', buffer_time[:], buffer_voltage[:])
+    buffer_voltage[0] = 1.0
+    nt.assert_equal(response['voltage'][0], 1.0)
+
+    response.detach()
+    buffer_voltage[0] = 2.0
+    nt.assert_equal(response['voltage'][0], 1.0)
+    nt.assert_true(response['time'].flags.owndata)
+
+
+@attr('unit')
+def test_timevoltageresponse_csv():
+    """ephys.responses: test TimeVoltageResponse csv files"""
+
+    response = TimeVoltageResponse('test')
+    response.read_csv(os.path.join(testdata_dir, 'TimeVoltageResponse.csv'))
+    nt.assert_equal(response['time'][0], 0.0)
+    nt.assert_equal(response['voltage'][0], -65.0)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmp_dir, 'response.csv')
+        response.to_csv(filename)
+
+        read_response = TimeVoltageResponse('test')
+        read_response.read_csv(filename)
+        numpy.testing.assert_array_almost_equal(
+            read_response['voltage'], response['voltage'])
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+@attr('unit')
+def test_timevoltageresponse_pickle():
+    """ephys.responses: test pickling of TimeVoltageResponse"""
+
+    import pickle
+
+    response = TimeVoltageResponse('test', [0.0, 0.1, 0.2], [-65, -64, -63])
+
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        unpickled = pickle.loads(pickle.dumps(response, protocol))
+        nt.assert_true(isinstance(unpickled, TimeVoltageResponse))
+        nt.assert_equal(unpickled.name, 'test')
+        numpy.testing.assert_array_equal(unpickled['time'], response['time'])
+        numpy.testing.assert_array_equal(
+            unpickled['voltage'], response['voltage'])
+
+        # The traces can be edited in place
+        unpickled['voltage'][0] = 0.0
+        nt.assert_equal(response['voltage'][0], -65.0)
+
+
+@attr('unit')
+def test_timevoltageresponse_slots():
+    """ephys.responses: test TimeVoltageResponse has no instance dict"""
+
+    response = TimeVoltageResponse('test', [0.0, 0.1], [-65, -64])
+
+    nt.assert_false(hasattr(response, '__dict__'))
+    nt.assert_raises(
+        AttributeError, setattr, response, 'protocol_name', 'step')
@@ -64,3 +64,44 @@ def test_neuron_import():
     from bluepyopt import ephys  # NOQA
     neuron_sim = ephys.simulators.NrnSimulator()
     nt.assert_is_instance(neuron_sim.neuron, types.ModuleType)
+
+
+@attr('unit')
+def test_counting_hoc():
+    """ephys.simulators: test counting of hoc calls"""
+
+    class FakeHoc(object):
+
+        """Fake hoc interpreter"""
+
+        tstop = 0.0
+
+        @staticmethod
+        def run():
+            """Run"""
+            return 1
+
+    counts = {'tstop': 0, 'run': 0}
+    hoc = ephys.simulators._CountingHoc(FakeHoc(), counts)
+    hoc.tstop = 10.0
+    nt.assert_equal(hoc.tstop, 10.0)
+    nt.assert_equal(hoc.run(), 1)
+    nt.assert_equal(counts, {'tstop': 2, 'run': 1})
+
+
+@attr('unit')
+def test_nrnsimulator_session():
+    """ephys.simulators: test Neuron session of NrnSimulator"""
+
+    neuron_sim = ephys.simulators.NrnSimulator(count_hoc_calls=True)
+    session = ephys.simulators.session
+    nt.assert_true('import3d.hoc' in session.loaded_files)
+
+    neuron_sim.define_hoc('session_test_func', 'func session_test_func() '
+                          '{ return 3 }')
+    nt.assert_true('session_test_func' in session.defined_names)
+
+    calls = neuron_sim.hoc_call_counts['session_test_func']
+    nt.assert_equal(neuron_sim.neuron.h.session_test_func(), 3)
+    nt.assert_equal(
+        neuron_sim.hoc_call_counts['session_test_func'], calls + 1)
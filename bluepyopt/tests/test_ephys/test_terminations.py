@@ -0,0 +1,99 @@
+"""bluepyopt.ephys.terminations tests"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+# pylint:disable=W0612
+
+import mock
+import nose.tools as nt
+from nose.plugins.attrib import attr
+
+from bluepyopt.ephys import terminations
+
+
+def _instantiate(criterion, voltage):
+    """Instantiate a criterion on a fake segment with a voltage"""
+
+    sim = mock.Mock()
+    sim.neuron.h.Vector.return_value = []
+    criterion.location = mock.Mock()
+    criterion.location.instantiate.return_value = mock.Mock(v=voltage)
+    criterion.instantiate(sim=sim, icell=None)
+    nt.assert_equal(criterion.netcon.threshold, criterion.threshold)
+
+
+@attr('unit')
+def test_runaway_voltage():
+    """ephys.terminations: test RunawayVoltageCriterion"""
+
+    criterion = terminations.RunawayVoltageCriterion('runaway')
+    _instantiate(criterion, -65.0)
+    nt.assert_false(criterion.check(10.0))
+
+    criterion.crossing_times.append(12.0)
+    nt.assert_true(criterion.check(15.0))
+
+    _instantiate(criterion, float('nan'))
+    nt.assert_true(criterion.check(10.0))
+
+
+@attr('unit')
+def test_depolarization_block():
+    """ephys.terminations: test DepolarizationBlockCriterion"""
+
+    criterion = terminations.DepolarizationBlockCriterion(
+        'block', duration=50.0)
+    _instantiate(criterion, -10.0)
+    criterion.crossing_times.extend([10.0, 100.0])
+
+    nt.assert_false(criterion.check(120.0))
+    nt.assert_true(criterion.check(150.0))
+
+    criterion.segment.v = -70.0
+    nt.assert_false(criterion.check(150.0))
+
+    criterion.destroy()
+    nt.assert_equal(criterion.crossing_times, None)
+
+
+@attr('unit')
+def test_no_spike():
+    """ephys.terminations: test NoSpikeCriterion"""
+
+    criterion = terminations.NoSpikeCriterion('nospike', deadline=200.0)
+    _instantiate(criterion, -65.0)
+
+    nt.assert_false(criterion.check(100.0))
+    nt.assert_true(criterion.check(200.0))
+
+    criterion.crossing_times.append(150.0)
+    nt.assert_false(criterion.check(200.0))
+
+    nt.assert_raises(ValueError, terminations.NoSpikeCriterion, 'nospike')
+
+
+@attr('unit')
+def test_termination_criterion():
+    """ephys.terminations: test TerminationCriterion"""
+
+    criterion = terminations.TerminationCriterion('never')
+    criterion.instantiate()
+    nt.assert_false(criterion.check(100.0))
+    criterion.destroy()
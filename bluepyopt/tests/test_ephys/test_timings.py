@@ -0,0 +1,139 @@
+"""bluepyopt.ephys.timings tests"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+# pylint:disable=W0612
+
+import pickle
+
+import mock
+import nose.tools as nt
+from nose.plugins.attrib import attr
+
+import bluepyopt
+from bluepyopt import ephys
+from bluepyopt.ephys.timings import EvaluationTimings
+
+
+@attr('unit')
+def test_timings():
+    """ephys.timings: test EvaluationTimings"""
+
+    timings = EvaluationTimings()
+    timings.record('step1', 'simulation', 1.0)
+    timings.record('step1', 'simulation', 2.0)
+    with timings.timer('step1', 'response_conversion'):
+        pass
+
+    nt.assert_equal(len(timings), 2)
+    nt.assert_equal(
+        timings.as_dict()['step1']['simulation'],
+        {'count': 2, 'total': 3.0, 'mean': 1.5})
+    nt.assert_equal(timings.total('simulation'), 3.0)
+
+    other = pickle.loads(pickle.dumps(timings))
+    other.record('obj1', 'scoring', 0.5)
+    timings.update(other)
+    nt.assert_equal(timings.total('simulation'), 6.0)
+    nt.assert_equal(timings.as_dict()['obj1']['scoring']['count'], 1)
+    nt.assert_true('step1 simulation: 4 x' in str(timings))
+
+    timings.reset()
+    nt.assert_equal(len(timings), 0)
+
+
+@attr('unit')
+def test_sweepprotocol_timings():
+    """ephys.timings: test timings of SweepProtocol"""
+
+    stimulus = mock.Mock(total_duration=100)
+    recording = mock.Mock(response='response')
+    recording.name = 'rec'
+    protocol = ephys.protocols.SweepProtocol(
+        name='step1', stimuli=[stimulus], recordings=[recording])
+
+    timings = EvaluationTimings()
+    responses = protocol.run(
+        mock.Mock(), {'par': 1.0}, sim=mock.Mock(), isolate=False,
+        timings=timings)
+
+    nt.assert_equal(responses, {'rec': 'response'})
+    nt.assert_equal(
+        list(timings.as_dict()['step1'].keys()),
+        ['cell_instantiation', 'protocol_instantiation', 'simulation',
+         'response_conversion', 'protocol_destruction', 'cell_destruction'])
+
+    # Without timings the responses are returned as before
+    nt.assert_equal(
+        protocol.run(mock.Mock(), {'par': 1.0}, sim=mock.Mock(),
+                     isolate=False),
+        {'rec': 'response'})
+
+
+@attr('unit')
+def test_objectivescalculator_timings():
+    """ephys.timings: test timings of ObjectivesCalculator"""
+
+    objective = bluepyopt.objectives.Objective('obj1')
+    objective.calculate_score = lambda responses: responses['rec']
+    calculator = ephys.objectivescalculators.ObjectivesCalculator(
+        [objective])
+
+    timings = EvaluationTimings()
+    nt.assert_equal(
+        calculator.calculate_scores({'rec': 2.0}, timings=timings),
+        {'obj1': 2.0})
+    nt.assert_equal(timings.as_dict()['obj1']['scoring']['count'], 1)
+
+
+@attr('unit')
+def test_cellevaluator_timings():
+    """ephys.timings: test timings of CellEvaluator.evaluate_population"""
+
+    stimulus = mock.Mock(total_duration=100)
+    recording = mock.Mock(response=1.0)
+    recording.name = 'rec'
+    protocol = ephys.protocols.SweepProtocol(
+        name='step1', stimuli=[stimulus], recordings=[recording])
+
+    objective = bluepyopt.objectives.Objective('obj1')
+    objective.calculate_score = lambda responses: responses['rec']
+
+    cell_model = mock.Mock()
+    cell_model.params_by_names.return_value = [
+        bluepyopt.parameters.Parameter('par')]
+
+    timings = EvaluationTimings()
+    evaluator = ephys.evaluators.CellEvaluator(
+        cell_model=cell_model,
+        param_names=['par'],
+        fitness_protocols={'step1': protocol},
+        fitness_calculator=ephys.objectivescalculators.ObjectivesCalculator(
+            [objective]),
+        isolate_protocols=False,
+        sim=mock.Mock(),
+        population_chunk_size=2,
+        timings=timings)
+
+    nt.assert_equal(
+        evaluator.evaluate_population([[1.0], [2.0], [3.0]]),
+        [[1.0], [1.0], [1.0]])
+    nt.assert_equal(timings.as_dict()['step1']['simulation']['count'], 3)
+    nt.assert_equal(timings.as_dict()['obj1']['scoring']['count'], 3)
@@ -0,0 +1,229 @@
+"""bluepyopt.ephys.workers tests"""
+
+"""
+Copyright (c) 2016, EPFL/Blue Brain Project
+
+ This file is part of BluePyOpt <https://github.com/BlueBrain/BluePyOpt>
+
+ This library is free software; you can redistribute it and/or modify it under
+ the terms of the GNU Lesser General Public License version 3.0 as published
+ by the Free Software Foundation.
+
+ This library is distributed in the hope that it will be useful, but WITHOUT
+ ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+ details.
+
+ You should have received a copy of the GNU Lesser General Public License
+ along with this library; if not, write to the Free Software Foundation, Inc.,
+ 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+# pylint:disable=W0612
+
+import os
+import pickle
+
+import nose.tools as nt
+from nose.plugins.attrib import attr
+
+from bluepyopt.ephys.workers import PersistentWorker
+
+
+def _getpid():
+    """Return pid of the process running this function"""
+    return os.getpid()
+
+
+def _fail(message=None):
+    """Raise an exception"""
+    raise ValueError(message)
+
+
+@attr('unit')
+def test_persistentworker_reuse():
+    """ephys.workers: test if PersistentWorker reuses its process"""
+
+    worker = PersistentWorker()
+    pid1 = worker.apply(_getpid)
+    pid2 = worker.apply(_getpid)
+    nt.assert_not_equal(pid1, os.getpid())
+    nt.assert_equal(pid1, pid2)
+    worker.terminate()
+    nt.assert_false(worker.alive)
+
+
+@attr('unit')
+def test_persistentworker_recycle():
+    """ephys.workers: test if PersistentWorker recycles after max_tasks"""
+
+    worker = PersistentWorker(max_tasks=2)
+    pids = [worker.apply(_getpid) for _ in range(4)]
+    nt.assert_equal(pids[0], pids[1])
+    nt.assert_equal(pids[2], pids[3])
+    nt.assert_not_equal(pids[1], pids[2])
+    worker.terminate()
+
+
+@attr('unit')
+def test_persistentworker_exception():
+    """ephys.workers: test if PersistentWorker reraises exceptions"""
+
+    worker = PersistentWorker()
+    nt.assert_raises(
+        ValueError,
+        worker.apply,
+        _fail,
+        kwds={'message': 'test'})
+    nt.assert_true(worker.apply(_getpid) > 0)
+    worker.terminate()
+
+
+@attr('unit')
+def test_persistentworker_pickle():
+    """ephys.workers: test if PersistentWorker can be pickled"""
+
+    worker = PersistentWorker(max_tasks=5, max_memory=100)
+    pid = worker.apply(_getpid)
+    unpickled = pickle.loads(pickle.dumps(worker))
+    nt.assert_equal(unpickled.max_tasks, 5)
+    nt.assert_equal(unpickled.max_memory, 100)
+
+    # The unpickled worker uses the worker process of this process
+    nt.assert_true(unpickled.alive)
+    nt.assert_equal(unpickled.apply(_getpid), pid)
+    worker.terminate()
+    nt.assert_false(unpickled.alive)
+
+    # Workers with other limits have their own process
+    other = PersistentWorker(max_tasks=6, max_memory=100)
+    nt.assert_false(other.alive)
+    other.terminate()
+
+
+class _FakeHoc(object):
+
+    """Hoc interpreter with some globals"""
+
+    celsius = 6.3
+    v_init = -65.0
+    dt = 0.025
+    steps_per_ms = 40.0
+    gamma_CaDynamics = 0.05
+
+
+class _FakeNeuron(object):
+
+    """Neuron module"""
+
+    h = _FakeHoc()
+
+
+def _set_globals(celsius, gamma):
+    """Set hoc globals, return their previous values"""
+
+    from bluepyopt.ephys import simulators
+
+    h = simulators.session.neuron.h
+    previous = (h.celsius, h.gamma_CaDynamics)
+
+    h.celsius = celsius
+    simulators.session.record_global('gamma_CaDynamics')
+    h.gamma_CaDynamics = gamma
+
+    return previous
+
+
+@attr('unit')
+def test_persistentworker_globals():
+    """ephys.workers: test if PersistentWorker restores hoc globals"""
+
+    from bluepyopt.ephys import simulators
+
+    session = simulators.session
+    neuron, global_defaults = session._neuron, session.global_defaults
+    session._neuron = _FakeNeuron()
+    session.global_defaults = dict(
+        (name, getattr(_FakeHoc, name))
+        for name in session.RESTORED_GLOBALS)
+    try:
+        worker = PersistentWorker()
+        nt.assert_equal(
+            worker.apply(_set_globals, {'celsius': 34.0, 'gamma': 0.1}),
+            (6.3, 0.05))
+        nt.assert_equal(
+            worker.apply(_set_globals, {'celsius': 35.0, 'gamma': 0.2}),
+            (6.3, 0.05))
+        worker.terminate()
+    finally:
+        session._neuron, session.global_defaults = neuron, global_defaults
+
+
+def _sleep(duration):
+    """Sleep for duration seconds"""
+    import time
+    time.sleep(duration)
+    return duration
+
+
+@attr('unit')
+def test_timeout():
+    """ephys.workers: test killing tasks that exceed the time limit"""
+
+    from bluepyopt.ephys.workers import apply_isolated, EvaluationTimeout
+
+    worker = PersistentWorker()
+    pid = worker.apply(_getpid)
+    nt.assert_raises(
+        EvaluationTimeout,
+        worker.apply,
+        _sleep,
+        kwds={'duration': 10.0},
+        timeout=0.2)
+    nt.assert_false(worker.alive)
+    nt.assert_not_equal(worker.apply(_getpid), pid)
+    nt.assert_equal(worker.apply(_sleep, {'duration': 0.0}, timeout=5.0), 0.0)
+    worker.terminate()
+
+    nt.assert_raises(
+        EvaluationTimeout,
+        apply_isolated,
+        _sleep,
+        kwds={'duration': 10.0},
+        isolate=True,
+        timeout=0.2)
+    nt.assert_raises(
+        ValueError, apply_isolated, _sleep, kwds={'duration': 0.0},
+        isolate=False, timeout=1.0)
+
+
+@attr('unit')
+def test_resident_memory():
+    """ephys.workers: test current resident memory of the process"""
+
+    from bluepyopt.ephys.workers import _resident_memory
+
+    memory = _resident_memory()
+    data = bytearray(50 * 1024 * 1024)
+    nt.assert_true(_resident_memory() > memory + 40)
+    del data
+    nt.assert_true(_resident_memory() < memory + 10)
+
+
+@attr('unit')
+def test_simulator_is_clean():
+    """ephys.workers: test detection of Neuron objects left behind"""
+
+    from bluepyopt.ephys.workers import _simulator_is_clean
+
+    initial_objects = {'sections': 0, 'NetCon': 1, 'Vector': 2}
+
+    nt.assert_true(_simulator_is_clean(None, None))
+    nt.assert_true(_simulator_is_clean(initial_objects, initial_objects))
+    nt.assert_false(_simulator_is_clean(
+        {'sections': 0, 'NetCon': 1, 'Vector': 3}, initial_objects))
+    nt.assert_false(_simulator_is_clean(
+        {'sections': 0, 'NetCon': 1, 'Vector': 2, 'IClamp': 1},
+        initial_objects))
+    nt.assert_false(_simulator_is_clean(
+        {'sections': 4, 'NetCon': 1, 'Vector': 2}, initial_objects))
@@ -32,3 +32,20 @@ def test_evaluator_init():
 
     evaluator = bluepyopt.evaluators.Evaluator()
     nt.assert_is_instance(evaluator, bluepyopt.evaluators.Evaluator)
+
+
+@attr('unit')
+def test_evaluator_evaluate_population():
+    """bluepyopt.evaluators: test Evaluator evaluate_population"""
+
+    class SumEvaluator(bluepyopt.evaluators.Evaluator):
+
+        """Evaluator returning the sum of the parameters"""
+
+        def evaluate_with_lists(self, params):
+            return [sum(params)]
+
+    evaluator = SumEvaluator()
+    nt.assert_equal(
+        evaluator.evaluate_population([[1, 2], [3, 4], [5]]),
+        [[3], [7], [5]])
@@ -25,6 +25,7 @@ Copyright (c) 2016, EPFL/Blue Brain Project
 import os
 import pickle
 import numpy as np
+import bluepyopt
 import bluepyopt.ephys as ephys
 
 # Parameters in release circuit model
@@ -91,7 +92,7 @@ def analyse_cp(opt, cp_filename, responses_filename, figs):
     (model_fig, model_box), (objectives_fig, objectives_box), (
         evol_fig, evol_box) = figs
 
-    cp = pickle.load(open(cp_filename, "r"))
+    cp = bluepyopt.deapext.checkpoints.load(cp_filename)
     hof = cp['halloffame']
 
     responses = get_responses(opt.evaluator, hof, responses_filename)
@@ -555,7 +556,7 @@ def plot_diversity(opt, checkpoint_file, fig, param_names):
     from a unpickled checkpoint
     '''
     import matplotlib.pyplot as plt
-    checkpoint = pickle.load(open(checkpoint_file, "r"))
+    checkpoint = bluepyopt.deapext.checkpoints.load(checkpoint_file)
 
     ax = fig.add_subplot(1, 1, 1)
 